@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Incremental BM25 check: delta segments vs a full rebuild.
+
+Builds a base index over a synthetic in-memory collection, then adds, deletes
+and re-upserts chunks and applies them as a delta segment. Reports the time of
+the delta against a full rebuild, and compares base+delta search and the
+merged index with a fresh build of the live docs: the merged index must match
+exactly; base+delta keeps the epsilon idf floor of the last full build, so it is
+held to recall@k instead.
+
+Usage (from the project root):
+    python -m benchmarks.bm25_delta                       # whitespace tokenizer
+    python -m benchmarks.bm25_delta --docs 50000 --add 300 --okt   # Okt (needs a JVM)
+
+Exits with status 1 when the merged scores diverge or base+delta recall@k drops
+below --min-recall.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from utils import bm25_store, index_publish
+from utils.bm25_build import build_index, update_index, merge_index
+from utils.hybrid_retriever import bm25_from_index
+
+
+class _WhitespaceTokenizer:
+    def tokenize(self, text: str) -> List[str]:
+        return (text or "").lower().split()
+
+
+class _MemoryCollection:
+    """Just enough of the Chroma collection API for the builder (count/get)."""
+
+    name = "bench"
+
+    def __init__(self):
+        self.docs: Dict[str, str] = {}
+
+    def count(self) -> int:
+        return len(self.docs)
+
+    def get(self, ids=None, include=None, limit=None, offset=None):
+        keys = list(self.docs) if ids is None else [i for i in ids if i in self.docs]
+        if ids is None:
+            start = offset or 0
+            keys = keys[start:start + limit if limit else None]
+        out = {"ids": keys}
+        if include and "documents" in include:
+            out["documents"] = [self.docs[k] for k in keys]
+        if include and "metadatas" in include:
+            out["metadatas"] = [{"url": k} for k in keys]
+        return out
+
+
+def _random_doc(rng: np.random.Generator, vocab_size: int) -> str:
+    ids = np.minimum(rng.zipf(1.3, size=int(rng.integers(20, 200))) - 1, vocab_size - 1)
+    return " ".join(f"t{i}" for i in ids)
+
+
+def _compare(index_dir: Path, collection: _MemoryCollection, queries: List[List[str]], k: int, tmp: Path):
+    """(recall@k by chunk ID, max top-k score diff) of ``index_dir`` vs a fresh build of the live docs."""
+    fresh_dir = tmp / "fresh"
+    build_index(collection, fresh_dir, workers=1, tokenizer_factory=_WhitespaceTokenizer, progress=None)
+    got_index, ref_index = bm25_store.open_index(index_dir), bm25_store.open_index(fresh_dir)
+    got, ref = bm25_from_index(got_index), bm25_from_index(ref_index)
+    hits = total = 0
+    max_diff = 0.0
+    for q in queries:
+        gi, gs = got.top_k(q, k)
+        ri, rs = ref.top_k(q, k)
+        expected = {ref_index["ids"][i] for i in ri.tolist()}
+        hits += sum(1 for i in gi.tolist() if got_index["ids"][i] in expected)
+        total += len(expected)
+        if gs.shape == rs.shape and gs.size:
+            max_diff = max(max_diff, float(np.max(np.abs(gs - rs))))
+        elif gs.shape != rs.shape:
+            max_diff = float("inf")
+    index_publish.remove(fresh_dir)
+    return (hits / total if total else 1.0), max_diff
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--add", type=int, default=300)
+    ap.add_argument("--delete", type=int, default=50)
+    ap.add_argument("--upsert", type=int, default=50)
+    ap.add_argument("--vocab", type=int, default=30000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=24)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--min-recall", type=float, default=0.97)
+    ap.add_argument("--okt", action="store_true", help="Tokenize with Okt instead of whitespace (timings only)")
+    args = ap.parse_args()
+
+    if args.okt:
+        from utils.hybrid_retriever import KoreanTokenizer as tokenizer_factory
+    else:
+        tokenizer_factory = _WhitespaceTokenizer
+
+    rng = np.random.default_rng(args.seed)
+    collection = _MemoryCollection()
+    for i in range(args.docs):
+        collection.docs[f"doc{i}::c0"] = _random_doc(rng, args.vocab)
+
+    tmp = Path(tempfile.mkdtemp(prefix="bm25_delta_"))
+    index_dir = tmp / collection.name
+    try:
+        t0 = time.perf_counter()
+        build_index(collection, index_dir, workers=args.workers, tokenizer_factory=tokenizer_factory, progress=None)
+        full_time = time.perf_counter() - t0
+        print(f"[Full build] {args.docs:,} docs in {full_time:.2f}s")
+
+        rnd = random.Random(args.seed)
+        existing = list(collection.docs)
+        for key in rnd.sample(existing, args.delete):
+            del collection.docs[key]
+        upserts = rnd.sample(list(collection.docs), args.upsert)
+        for key in upserts:
+            collection.docs[key] = _random_doc(rng, args.vocab)
+        for i in range(args.add):
+            collection.docs[f"new{i}::c0"] = _random_doc(rng, args.vocab)
+
+        t0 = time.perf_counter()
+        summary = update_index(
+            collection, index_dir, upsert_ids=upserts,
+            workers=args.workers, tokenizer_factory=tokenizer_factory, progress=None,
+        )
+        delta_time = time.perf_counter() - t0
+        print(f"[Delta] {summary} in {delta_time:.2f}s (x{full_time / max(delta_time, 1e-9):.0f} vs full build)")
+
+        queries = []
+        docs = list(collection.docs.values())
+        for _ in range(args.queries):
+            tokens = rnd.choice(docs).split()
+            queries.append(rnd.sample(tokens, min(len(tokens), rnd.randint(1, 6))))
+
+        failed = False
+        if not args.okt:
+            recall, diff = _compare(index_dir, collection, queries, args.k, tmp)
+            print(f"[Score] base+delta vs fresh build: recall@{args.k} {recall:.4f}, max |diff| = {diff:.3e}")
+            failed |= recall < args.min_recall
+
+        t0 = time.perf_counter()
+        merge_index(index_dir, progress=None)
+        print(f"[Merge] {time.perf_counter() - t0:.2f}s")
+        if not args.okt:
+            recall, diff = _compare(index_dir, collection, queries, args.k, tmp)
+            print(f"[Score] merged vs fresh build: recall@{args.k} {recall:.4f}, max |diff| = {diff:.3e}")
+            failed |= not diff < 1e-6
+        return 1 if failed else 0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Recall-equivalence check: InvertedBM25 vs rank_bm25.BM25Okapi.
+
+Builds both engines over the same tokenized corpus, runs the same queries and
+reports recall@k of the inverted index against BM25Okapi's full-corpus scoring,
+the max absolute score difference and per-query latency.
+
+Usage (from the project root):
+    python -m benchmarks.bm25_equivalence                  # synthetic corpus
+    python -m benchmarks.bm25_equivalence --live --docs 5000   # live Chroma docs + Okt
+
+Exits with status 1 when recall@k drops below --min-recall.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from utils.hybrid_retriever import InvertedBM25
+
+
+def _synthetic_corpus(n_docs: int, vocab_size: int, seed: int) -> List[List[str]]:
+    rng = np.random.default_rng(seed)
+    vocab = [f"t{i}" for i in range(vocab_size)]
+    corpus = []
+    for _ in range(n_docs):
+        length = int(rng.integers(5, 120))
+        # Zipf-like term distribution (few very common terms, long tail)
+        ids = np.minimum(rng.zipf(1.3, size=length) - 1, vocab_size - 1)
+        corpus.append([vocab[i] for i in ids])
+    return corpus
+
+
+def _live_corpus(n_docs: int) -> List[List[str]]:
+    from utils.vectorstore import get_vectorstore
+    from utils.hybrid_retriever import KoreanTokenizer
+
+    collection = get_vectorstore()._collection
+    data = collection.get(include=["documents"], limit=n_docs)
+    tokenizer = KoreanTokenizer()
+    return [tokenizer.tokenize(d or "") for d in data.get("documents") or []]
+
+
+def _reference_top_k(scores: np.ndarray, k: int) -> tuple[set, float]:
+    positive = np.flatnonzero(scores > 0)
+    if positive.size == 0:
+        return set(), 0.0
+    ranked = positive[np.argsort(-scores[positive], kind="stable")]
+    top = ranked[:k]
+    return set(top.tolist()), float(scores[top[-1]])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=20000)
+    ap.add_argument("--vocab", type=int, default=30000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=24)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--live", action="store_true", help="Use documents from the live Chroma collection")
+    ap.add_argument("--min-recall", type=float, default=0.999)
+    args = ap.parse_args()
+
+    try:
+        from rank_bm25 import BM25Okapi
+    except ImportError:
+        print("rank_bm25 is required for the equivalence check: pip install rank-bm25")
+        return 2
+
+    corpus = _live_corpus(args.docs) if args.live else _synthetic_corpus(args.docs, args.vocab, args.seed)
+    print(f"[Corpus] {len(corpus):,} docs")
+
+    t0 = time.perf_counter()
+    ref = BM25Okapi(corpus)
+    t1 = time.perf_counter()
+    engine = InvertedBM25.from_corpus(corpus)
+    t2 = time.perf_counter()
+    print(f"[Build] BM25Okapi {t1 - t0:.2f}s | InvertedBM25 {t2 - t1:.2f}s ({engine.doc_ids.shape[0]:,} postings)")
+
+    rnd = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        doc = rnd.choice([d for d in corpus if d] or [["empty"]])
+        queries.append(rnd.sample(doc, min(len(doc), rnd.randint(1, 6))))
+
+    hits = total = 0
+    max_diff = 0.0
+    ref_time = new_time = 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        scores = ref.get_scores(q)
+        t1 = time.perf_counter()
+        idx, got = engine.top_k(q, args.k)
+        t2 = time.perf_counter()
+        ref_time += t1 - t0
+        new_time += t2 - t1
+
+        expected, kth = _reference_top_k(scores, args.k)
+        # Ties at the k-th score may legitimately resolve to a different doc
+        hits += sum(1 for i in idx.tolist() if i in expected or abs(scores[i] - kth) <= 1e-9)
+        total += len(expected)
+        if idx.size:
+            max_diff = max(max_diff, float(np.max(np.abs(scores[idx] - got))))
+
+    recall = hits / total if total else 1.0
+    n = max(1, len(queries))
+    print(f"[Recall@{args.k}] {recall:.4f} over {len(queries)} queries")
+    print(f"[Score] max |diff| = {max_diff:.3e}")
+    print(
+        f"[Latency] BM25Okapi {1000 * ref_time / n:.2f} ms/query | "
+        f"InvertedBM25 {1000 * new_time / n:.3f} ms/query "
+        f"(x{(ref_time / new_time) if new_time else float('inf'):.0f})"
+    )
+    return 0 if recall >= args.min_recall and max_diff < 1e-6 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
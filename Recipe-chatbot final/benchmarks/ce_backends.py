@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Cross-encoder backends: PyTorch (FlagReranker) vs ONNX Runtime fp32 vs ONNX Runtime int8.
+
+Scores the same synthetic (query, recipe passage) pairs with each backend and
+reports:
+
+- model load time (first ONNX run includes the one-off export);
+- throughput in pairs/sec at ``--batch`` (median of ``--repeat`` runs);
+- resident memory after load and peak (VmRSS / VmHWM);
+- score drift against PyTorch on the sigmoid score: max and mean |diff|,
+  agreement of the ``CE_SENT_T`` supported / unsupported decision and of the
+  per-query top-1 passage.
+
+Each backend runs in its own subprocess, so memory figures are not mixed up.
+Tolerances (``--atol-fp32`` 1e-3, ``--atol-int8`` 0.05 max |diff|) are the ones
+documented for ``CE_BACKEND=onnx``; the exit status is 1 when one is exceeded.
+
+Usage (from the project root; needs FlagEmbedding, transformers and onnxruntime):
+    python -m benchmarks.ce_backends
+    python -m benchmarks.ce_backends --queries 32 --docs 16 --batch 64 --threads 4
+    python -m benchmarks.ce_backends --backends torch onnx-int8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.verifier_ce_batching import _DISHES, _sentence
+from config.settings import CE_MODEL, CE_ONNX_THREADS, CE_SENT_T
+
+
+BACKENDS = ("torch", "onnx-fp32", "onnx-int8")
+_TOLERANCE = {"onnx-fp32": "atol_fp32", "onnx-int8": "atol_int8"}
+
+
+def _pairs(n_queries: int, n_docs: int, seed: int) -> List[List[str]]:
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(n_queries):
+        dish = rng.choice(_DISHES)
+        query = f"{dish} {rng.choice(['만드는 법', '레시피', '재료', '끓이는 시간'])}"
+        for _ in range(n_docs):
+            doc_dish = dish if rng.random() < 0.5 else rng.choice(_DISHES)
+            pairs.append([query, " ".join(_sentence(rng, doc_dish) for _ in range(rng.randint(2, 8)))])
+    return pairs
+
+
+def _memory_mb() -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                out[key] = int(value.split()[0]) / 1024.0
+    except OSError:
+        import resource
+
+        out["VmHWM"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return out
+
+
+def _worker(args) -> int:
+    pairs = _pairs(args.queries, args.docs, args.seed)
+    before = _memory_mb()
+    t0 = time.perf_counter()
+    if args.worker == "torch":
+        from utils.ce_service import _load_flag_reranker
+
+        model = _load_flag_reranker(args.model)
+        if model is None:
+            return 1
+    else:
+        from utils.ce_onnx import load_cross_encoder
+
+        model = load_cross_encoder(args.model, int8=args.worker == "onnx-int8", threads=args.threads)
+    load_s = time.perf_counter() - t0
+    loaded = _memory_mb()
+
+    model.compute_score(pairs[: args.batch], normalize=True, batch_size=args.batch)  # warm-up
+    times, scores = [], None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        scores = model.compute_score(pairs, normalize=True, batch_size=args.batch)
+        times.append(time.perf_counter() - t0)
+    np.save(args.out, np.asarray(scores, dtype=np.float64).reshape(-1))
+    print(json.dumps({
+        "load_s": load_s,
+        "pairs_per_s": len(pairs) / float(np.median(times)),
+        "rss_base_mb": before.get("VmRSS"),
+        "rss_loaded_mb": loaded.get("VmRSS"),
+        "rss_peak_mb": _memory_mb().get("VmHWM"),
+    }))
+    return 0
+
+
+def _run(backend: str, args, out: Path) -> Dict[str, Any]:
+    cmd = [
+        sys.executable, "-m", "benchmarks.ce_backends", "--worker", backend, "--out", str(out),
+        "--model", args.model, "--queries", str(args.queries), "--docs", str(args.docs),
+        "--batch", str(args.batch), "--repeat", str(args.repeat), "--seed", str(args.seed),
+        "--threads", str(args.threads),
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        print(f"[{backend}] failed (exit {proc.returncode})\n{proc.stdout}{proc.stderr}")
+        return {}
+    res = json.loads(lines[-1])
+    res["scores"] = np.load(out)
+    return res
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    ap.add_argument("--model", default=CE_MODEL)
+    ap.add_argument("--queries", type=int, default=16)
+    ap.add_argument("--docs", type=int, default=16)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=CE_ONNX_THREADS, help="ONNX Runtime intra-op threads")
+    ap.add_argument("--atol-fp32", type=float, default=1e-3)
+    ap.add_argument("--atol-int8", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker:
+        return _worker(args)
+
+    n_pairs = args.queries * args.docs
+    print(f"[Model] {args.model} | {n_pairs} pairs ({args.queries} queries x {args.docs} docs) | batch {args.batch}")
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            res = _run(backend, args, Path(tmp) / f"{backend}.npy")
+            if not res:
+                continue
+            results[backend] = res
+            print(
+                f"[{backend:<9}] load {res['load_s']:6.1f} s | {res['pairs_per_s']:8.1f} pairs/s | "
+                f"RSS loaded {res['rss_loaded_mb'] - res['rss_base_mb']:7.1f} MB | peak {res['rss_peak_mb']:7.1f} MB"
+            )
+
+    reference = results.get("torch")
+    if reference is None:
+        print("no PyTorch reference; score drift not checked")
+        return 1 if len(results) < len(args.backends) else 0
+    failed = len(results) < len(args.backends)
+    ref = reference["scores"]
+    ref_top1 = ref.reshape(args.queries, args.docs).argmax(axis=1)
+    for backend, res in results.items():
+        if backend == "torch":
+            continue
+        scores = res["scores"]
+        diff = np.abs(scores - ref)
+        atol = getattr(args, _TOLERANCE[backend])
+        decisions = np.mean((scores >= CE_SENT_T) == (ref >= CE_SENT_T))
+        top1 = np.mean(scores.reshape(args.queries, args.docs).argmax(axis=1) == ref_top1)
+        ok = float(diff.max()) <= atol
+        failed |= not ok
+        print(
+            f"[{backend:<9} vs torch] max |diff| {diff.max():.2e} (atol {atol:g}) | mean {diff.mean():.2e} | "
+            f"CE_SENT_T={CE_SENT_T} decisions {decisions:.3f} | top-1 {top1:.3f} | "
+            f"speedup {res['pairs_per_s'] / reference['pairs_per_s']:4.2f}x | {'ok' if ok else 'EXCEEDED'}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
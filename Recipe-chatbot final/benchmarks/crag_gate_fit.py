@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""CRAG gate: audit the logged predictions and refit the logistic weights.
+
+Reads the JSONL written by ``utils.crag_gate`` (``CRAG_GATE_LOG_PATH``). Each
+line holds the gate features, the predicted probability and the judge verdict,
+from the request path or a background audit. The script then:
+
+- reports the current weights at each ``--thresholds`` value: the skip rate
+  (share of checks at or above the threshold) and the disagreement rate (share
+  of those the judge did not call grounded);
+- fits new weights (L2-regularized logistic regression, gradient descent on
+  standardized features) on a random ``1 - --holdout`` split and reports the
+  same table on the held-out rows;
+- with ``--write``, saves the fitted weights to ``CRAG_GATE_WEIGHTS_PATH``.
+
+Collect data with ``CRAG_GATE_MODE=shadow`` first: in skip mode only audited
+skips carry a verdict above the threshold.
+
+Usage (from the project root):
+    python -m benchmarks.crag_gate_fit
+    python -m benchmarks.crag_gate_fit --log logs/crag_gate*.jsonl --thresholds 0.8 0.9 0.95 --write
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.settings import CRAG_GATE_LOG_PATH, CRAG_GATE_WEIGHTS_PATH
+from utils.crag_gate import FEATURES, load_weights, predict
+
+
+def _load(patterns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    X, y = [], []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            for line in Path(path).read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not rec.get("verdict") or not isinstance(rec.get("features"), dict):
+                    continue
+                X.append([float(rec["features"].get(name, 0.0)) for name in FEATURES])
+                y.append(1.0 if rec["verdict"] == "grounded" else 0.0)
+    return np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES)), np.asarray(y, dtype=np.float64)
+
+
+def _fit(X: np.ndarray, y: np.ndarray, l2: float, steps: int = 3000, lr: float = 0.5) -> Dict[str, object]:
+    mean, std = X.mean(axis=0), X.std(axis=0)
+    std[std == 0] = 1.0
+    Z = (X - mean) / std
+    w, b = np.zeros(Z.shape[1]), 0.0
+    for _ in range(steps):
+        p = 1.0 / (1.0 + np.exp(-(Z @ w + b)))
+        grad = p - y
+        w -= lr * (Z.T @ grad / len(y) + l2 * w)
+        b -= lr * float(grad.mean())
+    # 표준화를 풀어 원래 특징 스케일의 가중치로 저장 (utils.crag_gate.predict와 동일한 식)
+    weights = w / std
+    return {"bias": b - float(weights @ mean), "weights": {name: float(v) for name, v in zip(FEATURES, weights)}}
+
+
+def _table(tag: str, p: np.ndarray, y: np.ndarray, thresholds: List[float]) -> None:
+    print(f"[{tag}] {len(y)} checks | grounded {y.mean():.3f}")
+    for t in thresholds:
+        skip = p >= t
+        n = int(skip.sum())
+        disagree = float((y[skip] == 0).mean()) if n else float("nan")
+        print(f"  p >= {t:.2f}: skip rate {n / len(y):6.1%} | disagreement {disagree:6.1%} ({n} skipped)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log", nargs="+", default=[CRAG_GATE_LOG_PATH], help="gate log JSONL globs")
+    ap.add_argument("--weights", default=CRAG_GATE_WEIGHTS_PATH)
+    ap.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95, 0.98])
+    ap.add_argument("--holdout", type=float, default=0.3)
+    ap.add_argument("--l2", type=float, default=1e-3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--write", action="store_true", help="save the fitted weights to --weights")
+    args = ap.parse_args()
+
+    X, y = _load(args.log)
+    if len(y) < 20 or y.min() == y.max():
+        print(f"need at least 20 logged checks with both outcomes (have {len(y)})")
+        return 1
+
+    current = load_weights(Path(args.weights))
+    p_current = np.asarray([predict(current, dict(zip(FEATURES, row))) for row in X])
+    _table("current weights, all rows", p_current, y, args.thresholds)
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(y))
+    n_test = max(1, int(len(y) * args.holdout))
+    test, train = order[:n_test], order[n_test:]
+    fitted = _fit(X[train], y[train], args.l2)
+    p_fitted = np.asarray([predict(fitted, dict(zip(FEATURES, row))) for row in X[test]])
+    _table("current weights, held-out", p_current[test], y[test], args.thresholds)
+    _table("fitted weights, held-out", p_fitted, y[test], args.thresholds)
+    print(f"[Fitted] bias {fitted['bias']:.3f} | " + " | ".join(f"{k} {v:.3f}" for k, v in fitted["weights"].items()))
+
+    if args.write:
+        final = _fit(X, y, args.l2)  # 저장은 전체 데이터로 다시 학습
+        final["fitted_on"] = {"checks": int(len(y)), "at": datetime.now().isoformat(timespec="seconds")}
+        Path(args.weights).write_text(json.dumps(final, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"[Write] {args.weights}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
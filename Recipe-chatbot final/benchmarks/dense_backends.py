@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Dense read path: NumPy exact search vs Chroma HNSW.
+
+Live mode exports the configured collection (VECTOR_DIR / COLLECTION_NAME) to
+a NumPy store and replays stored embeddings as queries, so no embedding API
+calls are made:
+
+- latency per query: Chroma ``collection.query`` (client stack + HNSW) vs
+  the ``NumpyVectorStore`` exact top-k (GEMV + argpartition)
+- batched NumPy throughput (one GEMM per batch)
+- recall@k of HNSW against the exact NumPy result
+
+Synthetic mode (default without --live) only times the NumPy store over a
+random matrix of the given shape.
+
+Usage (from the project root):
+    python -m benchmarks.dense_backends --live --queries 200 --k 24
+    python -m benchmarks.dense_backends --docs 250000 --dim 3072
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from utils.numpy_store import NumpyVectorStore, export_collection
+
+
+def _percentiles(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1000.0
+    return f"p50 {np.percentile(arr, 50):.2f} ms | p95 {np.percentile(arr, 95):.2f} ms"
+
+
+class _RandomCollection:
+    name = "synthetic"
+    metadata = {"hnsw:space": "l2"}
+
+    def __init__(self, docs: int, dim: int, seed: int):
+        self.matrix = np.random.default_rng(seed).normal(size=(docs, dim)).astype(np.float32)
+
+    def count(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def get(self, include=None, limit=None, offset=None):
+        start = offset or 0
+        end = min(self.count(), start + (limit or self.count()))
+        out = {"ids": [f"doc{i}" for i in range(start, end)]}
+        if include and "embeddings" in include:
+            out["embeddings"] = self.matrix[start:end]
+        if include and "documents" in include:
+            out["documents"] = [""] * (end - start)
+        if include and "metadatas" in include:
+            out["metadatas"] = [{}] * (end - start)
+        return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--live", action="store_true", help="Compare against the configured Chroma collection")
+    ap.add_argument("--docs", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=3072)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--k", type=int, default=24)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    tmp = Path(tempfile.mkdtemp(prefix="dense_bench_"))
+
+    if args.live:
+        from utils.vectorstore import _real_chroma
+
+        collection = _real_chroma()._collection
+    else:
+        collection = _RandomCollection(args.docs, args.dim, args.seed)
+
+    t0 = time.perf_counter()
+    export_collection(collection, tmp / "store", progress=None)
+    store = NumpyVectorStore(tmp / "store", embedding_function=None)
+    print(f"[Export] {store.matrix.shape[0]:,} x {store.matrix.shape[1]} ({store.space}) in {time.perf_counter() - t0:.1f}s")
+
+    picks = rng.choice(store.matrix.shape[0], size=min(args.queries, store.matrix.shape[0]), replace=False)
+    queries = np.asarray(store.matrix[np.sort(picks)], dtype=np.float32)
+    queries += rng.normal(scale=0.01, size=queries.shape).astype(np.float32)  # not exact self-matches
+
+    exact_ids = []
+    numpy_times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        idx, _dist = store._top_k(q[None, :], args.k)[0]
+        numpy_times.append(time.perf_counter() - t0)
+        exact_ids.append({store.ids[i] for i in idx.tolist()})
+    print(f"[NumPy exact] {_percentiles(numpy_times)}")
+
+    t0 = time.perf_counter()
+    for start in range(0, len(queries), args.batch):
+        store._top_k(queries[start:start + args.batch], args.k)
+    per_query = (time.perf_counter() - t0) / max(1, len(queries))
+    print(f"[NumPy batched x{args.batch}] {per_query * 1000:.2f} ms/query")
+
+    if args.live:
+        chroma_times = []
+        hits = total = 0
+        for q, expected in zip(queries, exact_ids):
+            t0 = time.perf_counter()
+            res = collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=["distances"])
+            chroma_times.append(time.perf_counter() - t0)
+            got = set((res.get("ids") or [[]])[0])
+            hits += len(got & expected)
+            total += len(expected)
+        print(f"[Chroma HNSW] {_percentiles(chroma_times)}")
+        print(f"[Recall@{args.k}] HNSW vs exact: {hits / total if total else 1.0:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
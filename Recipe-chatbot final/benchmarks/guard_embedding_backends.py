@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Query-side embedding backends: OpenAI vs local CPU model for the OOD guard and router.
+
+For each backend (``EMBEDDING_MODEL`` over the API, ``LOCAL_EMBEDDING_MODEL`` on
+CPU), embeds the labeled queries one at a time, the way the guard sees them on
+the critical path, and reports:
+
+- query-embedding latency p50/p95, plus guard scoring time;
+- the guard verdict mix (in / out / borderline -> LLM) and in/out accuracy of
+  the decided queries (gold: ``out_of_domain`` -> out, anything else -> in);
+- the local intent router's top-1 accuracy;
+- agreement of the local backend with the OpenAI guard (verdicts and intents).
+
+Prototype matrices are loaded or built with ``utils.prototype_store`` under the
+same model keys the server uses. Scores from a 384-dim MiniLM are not on the
+same scale as text-embedding-3-large, so the local guard is also swept over
+``--local-thresholds`` to pick ``OOD_COS_THRESHOLD`` for
+``GUARD_EMBEDDING_BACKEND=local``. Caches are bypassed.
+
+Usage (from the project root; the OpenAI column needs OPENAI_API_KEY):
+    python -m benchmarks.guard_embedding_backends
+    python -m benchmarks.guard_embedding_backends --from-log autotest_results/qa_*.jsonl --onnx-file ""
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.intent_router_eval import DEFAULT_LABELED, _load_labeled, _load_logs
+from config.settings import (
+    EMBEDDING_MODEL,
+    INTENT_PROTOTYPES_PATH,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_ONNX_FILE,
+    OOD_COS_THRESHOLD,
+    OOD_PROTOTYPES_PATH,
+    OPENAI_API_KEY,
+    SUPPORTED_INTENTS,
+)
+from nodes import ood_guard_node as og
+from utils import prototype_store
+from utils.local_embeddings import LOCAL_PREFIX, LocalEmbeddings
+
+
+def _percentiles(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1000.0
+    return f"p50 {np.percentile(arr, 50):8.2f} ms | p95 {np.percentile(arr, 95):8.2f} ms"
+
+
+def _branch(verdict: Optional[Dict[str, Any]]) -> str:
+    return verdict["branch"] if verdict else "llm"
+
+
+def _run_backend(name: str, model_key: str, emb, queries: List[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    emb.embed_query("warm-up")
+    warm_ms = (time.perf_counter() - t0) * 1000.0
+
+    ood_labels, ood_texts = og._load_prototypes()
+    ood = prototype_store.PrototypeClassifier(
+        prototype_store.load_or_build(Path(OOD_PROTOTYPES_PATH), model_key, ood_labels, ood_texts, emb), ood_labels
+    )
+    labels, texts = prototype_store.load_labeled(Path(INTENT_PROTOTYPES_PATH), "intents")
+    keep = [i for i, label in enumerate(labels) if label in SUPPORTED_INTENTS]
+    labels, texts = [labels[i] for i in keep], [texts[i] for i in keep]
+    intents = prototype_store.PrototypeClassifier(
+        prototype_store.load_or_build(Path(INTENT_PROTOTYPES_PATH), model_key, labels, texts, emb), labels
+    )
+
+    embed_times, score_times, vectors, branches, intent_top1 = [], [], [], [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        vec = emb.embed_query(q)
+        t1 = time.perf_counter()
+        verdict = og._embed_verdict(vec, ood)
+        score_times.append(time.perf_counter() - t1)
+        embed_times.append(t1 - t0)
+        vectors.append(vec)
+        branches.append(_branch(verdict))
+        intent_top1.append(intents.classify(vec)["label"])
+    print(f"[{name}] {model_key} | first call {warm_ms:.0f} ms")
+    print(f"  embed  {_percentiles(embed_times)}")
+    print(f"  score  {_percentiles(score_times)}")
+    return {"ood": ood, "vectors": vectors, "branches": branches, "intents": intent_top1}
+
+
+def _verdict_report(tag: str, branches: List[str], gold_in: List[bool]) -> None:
+    decided = [i for i, b in enumerate(branches) if b != "llm"]
+    acc = np.mean([(branches[i] == "in") == gold_in[i] for i in decided]) if decided else float("nan")
+    counts = {b: branches.count(b) for b in ("in", "out", "llm")}
+    print(f"  {tag} verdicts {counts} | LLM rate {counts['llm'] / len(branches):6.1%} | decided accuracy {acc:.3f}")
+
+
+def _agreement(a: List[str], b: List[str]) -> str:
+    both = [i for i in range(len(a)) if a[i] != "llm" and b[i] != "llm"]
+    same = np.mean([a[i] == b[i] for i in range(len(a))])
+    decided = np.mean([a[i] == b[i] for i in both]) if both else float("nan")
+    return f"all {same:.3f} | both decided {decided:.3f} ({len(both)})"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--labeled", default=str(DEFAULT_LABELED), help="JSONL of {query, intent} ('' to skip)")
+    ap.add_argument("--from-log", nargs="*", default=[], help="auto-ask result JSONL globs (LLM router labels)")
+    ap.add_argument("--local-model", default=LOCAL_EMBEDDING_MODEL)
+    ap.add_argument("--onnx-file", default=LOCAL_EMBEDDING_ONNX_FILE, help="ONNX weights in the model repo ('' = PyTorch)")
+    ap.add_argument("--local-thresholds", type=float, nargs="+", default=[0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55])
+    args = ap.parse_args()
+
+    rows = (_load_labeled(Path(args.labeled)) if args.labeled else []) + _load_logs(args.from_log)
+    rows = [(q, y) for q, y in rows if y in SUPPORTED_INTENTS]
+    if not rows:
+        print("no labeled queries")
+        return 1
+    queries = [q for q, _ in rows]
+    gold_intent = [y for _, y in rows]
+    gold_in = [y != "out_of_domain" for y in gold_intent]
+    print(f"[Data] {len(rows)} queries ({sum(gold_in)} in-domain / {len(rows) - sum(gold_in)} out-of-domain)")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if OPENAI_API_KEY:
+        from langchain_openai import OpenAIEmbeddings
+
+        results["openai"] = _run_backend("openai", EMBEDDING_MODEL, OpenAIEmbeddings(model=EMBEDDING_MODEL), queries)
+    else:
+        print("[openai] skipped (no OPENAI_API_KEY)")
+    local_emb = LocalEmbeddings(args.local_model, onnx_file=args.onnx_file)
+    results["local"] = _run_backend("local", f"{LOCAL_PREFIX}{args.local_model}", local_emb, queries)
+    print(f"  backend {local_emb.backend}")
+
+    print(f"[Guard @ OOD_COS_THRESHOLD={OOD_COS_THRESHOLD}]")
+    for name, res in results.items():
+        _verdict_report(f"{name:<6}", res["branches"], gold_in)
+        acc = np.mean([p == y for p, y in zip(res["intents"], gold_intent)])
+        print(f"  {name:<6} intent top-1 accuracy {acc:.3f}")
+
+    reference = results.get("openai")
+    if reference is not None:
+        print(f"[Agreement local vs openai] guard {_agreement(results['local']['branches'], reference['branches'])}")
+        same = np.mean([a == b for a, b in zip(results["local"]["intents"], reference["intents"])])
+        print(f"[Agreement local vs openai] intent top-1 {same:.3f}")
+
+    print("[Local threshold sweep]")
+    local = results["local"]
+    for threshold in args.local_thresholds:
+        branches = [_branch(og._embed_verdict(v, local["ood"], threshold=threshold)) for v in local["vectors"]]
+        _verdict_report(f"threshold {threshold:.2f}:", branches, gold_in)
+        if reference is not None:
+            print(f"    agreement with openai: {_agreement(branches, reference['branches'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Local intent router: offline accuracy and LLM call rate against a labeled set.
+
+Embeds the labeled queries and the prototype set (``INTENT_PROTOTYPES_PATH``)
+with the query-side embedding model (``GUARD_EMBEDDING_MODEL``). Then, for
+each margin threshold, reports:
+
+- the share of queries decided locally (LLM call rate = 1 - that share);
+- the accuracy of those local decisions;
+- top-1 accuracy over all queries;
+- with ``--with-llm``: end-to-end accuracy, the LLM router answering the
+  low-margin queries.
+
+It also prints per-intent recall at the configured margin
+(``INTENT_ROUTER_MARGIN``) and the classifier latency (query embedding
+excluded).
+
+Labels come from a JSONL file of ``{"query", "intent"}`` lines and/or from
+auto-ask result logs (``autotest_results/qa_*.jsonl``). For the logs, the LLM
+router's intent is the label; locally routed entries are skipped. Queries that
+appear verbatim among the prototypes are dropped to avoid leakage.
+
+Usage (from the project root; needs OPENAI_API_KEY unless GUARD_EMBEDDING_BACKEND=local):
+    python -m benchmarks.intent_router_eval
+    python -m benchmarks.intent_router_eval --from-log autotest_results/qa_*.jsonl --margins 0 0.02 0.04 0.08 --with-llm
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from config.settings import (
+    GUARD_EMBEDDING_MODEL,
+    INTENT_PROTOTYPES_PATH,
+    INTENT_ROUTER_MARGIN,
+    INTENT_ROUTER_MIN_SCORE,
+    SUPPORTED_INTENTS,
+)
+from utils import prototype_store
+from utils.embedding_cache import get_cached_embeddings
+
+
+DEFAULT_LABELED = Path(__file__).parent / "data" / "intent_labeled.jsonl"
+
+
+def _load_labeled(path: Path) -> List[Tuple[str, str]]:
+    rows = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            item = json.loads(line)
+            rows.append((item["query"], item["intent"]))
+    return rows
+
+
+def _load_logs(patterns: List[str]) -> List[Tuple[str, str]]:
+    rows = []
+    for pattern in patterns:
+        for name in sorted(glob.glob(pattern)):
+            for line in Path(name).read_text(encoding="utf-8").splitlines():
+                try:
+                    record = json.loads(line)
+                    router = (record.get("response") or {}).get("router") or {}
+                except Exception:
+                    continue
+                if "local_router" in (router.get("notes") or ""):
+                    continue
+                if record.get("question") and router.get("intent"):
+                    rows.append((record["question"], router["intent"]))
+    return rows
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--labeled", default=str(DEFAULT_LABELED), help="JSONL of {query, intent} ('' to skip)")
+    ap.add_argument("--from-log", nargs="*", default=[], help="auto-ask result JSONL globs (LLM router labels)")
+    ap.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.02, 0.04, 0.06, 0.08, 0.12])
+    ap.add_argument("--with-llm", action="store_true", help="Call the LLM router for low-margin queries")
+    args = ap.parse_args()
+
+    rows = (_load_labeled(Path(args.labeled)) if args.labeled else []) + _load_logs(args.from_log)
+    proto_path = Path(INTENT_PROTOTYPES_PATH)
+    labels, texts = prototype_store.load_labeled(proto_path, "intents")
+    keep = [i for i, label in enumerate(labels) if label in SUPPORTED_INTENTS]
+    labels, texts = [labels[i] for i in keep], [texts[i] for i in keep]
+    seen = set(texts)
+    rows = [(q, y) for q, y in rows if q not in seen and y in SUPPORTED_INTENTS]
+    if not rows:
+        print("no labeled queries")
+        return 1
+
+    emb = get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+    matrix = prototype_store.load_or_build(proto_path, GUARD_EMBEDDING_MODEL, labels, texts, emb)
+    clf = prototype_store.PrototypeClassifier(matrix, labels)
+    queries = [q for q, _ in rows]
+    gold = [y for _, y in rows]
+    vectors = np.asarray(emb.embed_documents(queries), dtype=np.float32)
+
+    times, results = [], []
+    for vec in vectors:
+        t0 = time.perf_counter()
+        results.append(clf.classify(vec))
+        times.append(time.perf_counter() - t0)
+    lat = np.asarray(times) * 1e6
+    print(f"[Data] {len(rows)} labeled queries, {len(texts)} prototypes / {len(clf.classes)} intents, dim {matrix.shape[1]}")
+    print(f"[Latency] classify p50 {np.percentile(lat, 50):.1f} us | p95 {np.percentile(lat, 95):.1f} us")
+    print(f"[Gold] {dict(Counter(gold))}")
+
+    llm_pred = {}
+    if args.with_llm:
+        from nodes import router_node as rn
+
+        rn.LOCAL_INTENT_ROUTER = False  # force the LLM path
+        widest = max(args.margins + [INTENT_ROUTER_MARGIN])
+        for i, (q, res) in enumerate(zip(queries, results)):
+            if res["margin"] < widest or res["score"] < INTENT_ROUTER_MIN_SCORE:
+                llm_pred[i] = rn.router_node(q)["intent"]
+
+    top1 = np.mean([r["label"] == y for r, y in zip(results, gold)])
+    print(f"[Top-1] local classifier accuracy over all queries: {top1:.3f}")
+    for margin in args.margins:
+        local = [
+            i for i, r in enumerate(results)
+            if r["margin"] >= margin and r["score"] >= INTENT_ROUTER_MIN_SCORE
+        ]
+        acc_local = np.mean([results[i]["label"] == gold[i] for i in local]) if local else float("nan")
+        line = (
+            f"[margin {margin:.3f}] local {len(local) / len(rows):6.1%} | LLM call rate {1 - len(local) / len(rows):6.1%} | "
+            f"local accuracy {acc_local:.3f}"
+        )
+        if args.with_llm:
+            local_set = set(local)
+            final = [results[i]["label"] if i in local_set else llm_pred.get(i) for i in range(len(rows))]
+            line += f" | end-to-end accuracy {np.mean([p == y for p, y in zip(final, gold)]):.3f}"
+        print(line)
+
+    per_intent = defaultdict(lambda: [0, 0, 0])  # total, decided locally, correct local
+    for r, y in zip(results, gold):
+        stats = per_intent[y]
+        stats[0] += 1
+        if r["margin"] >= INTENT_ROUTER_MARGIN and r["score"] >= INTENT_ROUTER_MIN_SCORE:
+            stats[1] += 1
+            stats[2] += int(r["label"] == y)
+    print(f"[Per intent @ margin {INTENT_ROUTER_MARGIN}] intent: local / total, correct")
+    for intent in sorted(per_intent):
+        total, decided, correct = per_intent[intent]
+        print(f"  {intent:<14} {decided:>3} / {total:<3} correct {correct}")
+    mistakes = [
+        (q, y, r["label"], r["margin"]) for q, y, r in zip(queries, gold, results)
+        if r["label"] != y and r["margin"] >= INTENT_ROUTER_MARGIN
+    ]
+    for q, y, p, m in mistakes[:10]:
+        print(f"  ! {q!r}: gold {y}, local {p} (margin {m:.3f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Matryoshka two-stage search: latency / recall sweep over prefix sizes.
+
+For every prefix size x candidate count, reports the resident first-stage
+bytes, p50/p95 query latency and recall@k against exact full-dimension search
+(``NumpyVectorStore``, also timed as the baseline).
+
+Synthetic mode draws clustered vectors whose per-dimension energy decays with
+the index, the way Matryoshka-trained embeddings front-load information (plain
+Gaussian noise would make every prefix equally uninformative). Live mode
+exports the configured Chroma collection and replays stored vectors (plus a
+little noise) as queries, so no embedding API calls are made.
+
+Usage (from the project root):
+    python -m benchmarks.matryoshka_sweep --prefix 128 256 512 1024 --candidates 100 200 400
+    python -m benchmarks.matryoshka_sweep --live
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from utils.matryoshka_store import MatryoshkaVectorStore, build_prefix
+from utils.numpy_store import NumpyVectorStore, ensure_export, export_collection
+
+
+def _percentiles(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1000.0
+    return f"p50 {np.percentile(arr, 50):7.2f} ms | p95 {np.percentile(arr, 95):7.2f} ms"
+
+
+class _MatryoshkaLikeCollection:
+    name = "synthetic"
+    metadata = {"hnsw:space": "cosine"}
+
+    def __init__(self, docs: int, dim: int, clusters: int, noise: float, seed: int):
+        rng = np.random.default_rng(seed)
+        decay = (1.0 + np.arange(dim, dtype=np.float32) / 64.0) ** -1.0
+        centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+        labels = rng.integers(0, clusters, size=docs)
+        self.matrix = (centers[labels] + noise * rng.normal(size=(docs, dim)).astype(np.float32)) * decay
+        self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+
+    def count(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def get(self, include=None, limit=None, offset=None):
+        start = offset or 0
+        end = min(self.count(), start + (limit or self.count()))
+        return {
+            "ids": [f"doc{i}" for i in range(start, end)],
+            "embeddings": self.matrix[start:end],
+            "documents": [""] * (end - start),
+            "metadatas": [{}] * (end - start),
+        }
+
+
+def _timed_top_k(store, queries: np.ndarray, k: int):
+    times, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        idx, _dist = store._top_k(q[None, :], k)[0]
+        times.append(time.perf_counter() - t0)
+        results.append(set(idx.tolist()))
+    return times, results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--live", action="store_true", help="Use the configured Chroma collection")
+    ap.add_argument("--docs", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=3072)
+    ap.add_argument("--clusters", type=int, default=500)
+    ap.add_argument("--noise", type=float, default=1.5, help="Within-cluster spread (higher = harder)")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=24)
+    ap.add_argument("--prefix", type=int, nargs="+", default=[128, 256, 512, 1024])
+    ap.add_argument("--candidates", type=int, nargs="+", default=[100, 200, 400])
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="mrl_bench_"))
+    try:
+        if args.live:
+            from utils.vectorstore import _real_chroma
+
+            dense_dir = ensure_export(_real_chroma(), tmp, progress=None)
+        else:
+            collection = _MatryoshkaLikeCollection(args.docs, args.dim, args.clusters, args.noise, args.seed)
+            dense_dir = export_collection(collection, tmp / collection.name, progress=None)
+            del collection
+
+        exact = NumpyVectorStore(dense_dir, embedding_function=None)
+        n, dim = exact.matrix.shape
+        rng = np.random.default_rng(args.seed)
+        picks = np.sort(rng.choice(n, size=min(args.queries, n), replace=False))
+        queries = np.asarray(exact.matrix[picks], dtype=np.float32)
+        queries += rng.normal(scale=0.01 / np.sqrt(dim), size=queries.shape).astype(np.float32)
+
+        print(f"[Data] {n:,} x {dim} ({exact.space}), k={args.k}")
+        times, truth = _timed_top_k(exact, queries, args.k)
+        print(f"[full {dim:>5}] {exact.matrix.nbytes / 2**20:9.1f} MiB | {_percentiles(times)} | recall 1.0000")
+
+        for prefix_dim in args.prefix:
+            if not 0 < prefix_dim < dim:
+                print(f"[prefix {prefix_dim}] skipped (dim is {dim})")
+                continue
+            pdir = build_prefix(dense_dir, prefix_dim, progress=None)
+            for cand in args.candidates:
+                store = MatryoshkaVectorStore(dense_dir, pdir, embedding_function=None, candidates=cand)
+                times, got = _timed_top_k(store, queries, args.k)
+                recall = sum(len(g & t) for g, t in zip(got, truth)) / max(1, sum(len(t) for t in truth))
+                print(
+                    f"[prefix {prefix_dim:>4} cand={cand:<4}] {store.memory_bytes() / 2**20:9.1f} MiB | "
+                    f"{_percentiles(times)} | recall {recall:.4f}"
+                )
+        return 0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
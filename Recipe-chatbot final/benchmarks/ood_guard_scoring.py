@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""OOD guard scoring: pure-Python centroid cosine vs top-k prototype matmul.
+
+Times the per-query domain score the way the guard used to compute it (a
+Python loop for the centroid cosine, over list vectors) against the current
+``PrototypeClassifier.topk_mean`` over a memory-mapped prototype matrix, both
+from a float32 vector and from the list an embeddings client returns (the
+list -> array conversion is most of that cost). It also times loading the
+matrix from its ``.npy``. Vectors are synthetic, so no embedding API calls are
+made.
+
+Usage (from the project root):
+    python -m benchmarks.ood_guard_scoring
+    python -m benchmarks.ood_guard_scoring --dim 3072 --in-protos 17 --out-protos 12 --k 3
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from utils import prototype_store
+
+
+def _percentiles(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1e6
+    return f"p50 {np.percentile(arr, 50):9.1f} us | p95 {np.percentile(arr, 95):9.1f} us"
+
+
+def _python_cosine(a: List[float], b: List[float]) -> float:
+    # the guard's former per-query loop
+    dot = na = nb = 0.0
+    for x, y in zip(a, b):
+        dot += x * y
+        na += x * x
+        nb += y * y
+    return dot / ((na ** 0.5) * (nb ** 0.5))
+
+
+class _FixedEmbeddings:
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def embed_documents(self, texts):
+        return self.matrix[: len(texts)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dim", type=int, default=3072)
+    ap.add_argument("--in-protos", type=int, default=17)
+    ap.add_argument("--out-protos", type=int, default=12)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.in_protos + args.out_protos
+    labels = ["prototypes_in"] * args.in_protos + ["prototypes_out"] * args.out_protos
+    texts = [f"prototype {i}" for i in range(n)]
+    vectors = rng.normal(size=(n, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    tmp = Path(tempfile.mkdtemp(prefix="ood_bench_"))
+    try:
+        json_path = tmp / "ood_prototypes.json"
+        prototype_store.build_matrix(json_path, "bench", labels, texts, _FixedEmbeddings(vectors))
+        t0 = time.perf_counter()
+        matrix = prototype_store.load_matrix(json_path, "bench", labels, texts)
+        clf = prototype_store.PrototypeClassifier(matrix, labels)
+        load_ms = (time.perf_counter() - t0) * 1000.0
+
+        centroid = vectors[: args.in_protos].mean(axis=0).tolist()
+        loop_times, list_times, mat_times = [], [], []
+        for q in queries:
+            q_list = q.tolist()  # embeddings arrive as Python lists
+            t0 = time.perf_counter()
+            _python_cosine(q_list, centroid)
+            loop_times.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            clf.topk_mean(q_list, args.k)
+            list_times.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            clf.topk_mean(q, args.k)
+            mat_times.append(time.perf_counter() - t0)
+
+        print(f"[Data] {n} prototypes ({args.in_protos} in / {args.out_protos} out) x {args.dim}, k={args.k}")
+        print(f"[Load] mmap .npy + classifier init {load_ms:.2f} ms (no embedding calls)")
+        print(f"[Python centroid cosine] {_percentiles(loop_times)}")
+        print(f"[NumPy top-k, from list] {_percentiles(list_times)}")
+        print(f"[NumPy top-k, float32]   {_percentiles(mat_times)}")
+        print(f"[Speedup] {np.median(loop_times) / np.median(list_times):.1f}x from list, "
+              f"{np.median(loop_times) / np.median(mat_times):.1f}x float32 (p50)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Quantized dense stores (int8 / PQ + float32 re-rank) vs the exact NumPy store.
+
+For each mode reports the bytes the scan keeps resident, p50/p95 query latency
+and recall@k against exact float32 search (``NumpyVectorStore``), which is also
+timed as the baseline. Each line also gives p50 latency relative to float32:
+expect int8 near x1.0 (codes are widened to float32 for the GEMM, so it saves
+memory, not time) and PQ above it.
+
+Synthetic mode clusters random vectors around a few hundred centers so that
+neighbours are meaningful (pure Gaussian noise has no structure for PQ to
+learn). Live mode exports the configured Chroma collection and replays stored
+vectors (plus a little noise) as queries, so no embedding API calls are made.
+
+Usage (from the project root):
+    python -m benchmarks.quantized_store --docs 50000 --dim 3072
+    python -m benchmarks.quantized_store --live --rerank 100 200 400
+
+Exits with status 1 when int8 recall@k drops below --min-recall.
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from utils.numpy_store import NumpyVectorStore, ensure_export, export_collection
+from utils.quantized_store import MODES, QuantizedVectorStore, build_quantized
+
+
+def _percentiles(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1000.0
+    return f"p50 {np.percentile(arr, 50):7.2f} ms | p95 {np.percentile(arr, 95):7.2f} ms"
+
+
+class _ClusteredCollection:
+    name = "synthetic"
+
+    def __init__(self, docs: int, dim: int, clusters: int, space: str, seed: int):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+        labels = rng.integers(0, clusters, size=docs)
+        self.matrix = centers[labels] + 0.5 * rng.normal(size=(docs, dim)).astype(np.float32)
+        if space != "l2":
+            self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.metadata = {"hnsw:space": space}
+
+    def count(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def get(self, include=None, limit=None, offset=None):
+        start = offset or 0
+        end = min(self.count(), start + (limit or self.count()))
+        return {
+            "ids": [f"doc{i}" for i in range(start, end)],
+            "embeddings": self.matrix[start:end],
+            "documents": [""] * (end - start),
+            "metadatas": [{}] * (end - start),
+        }
+
+
+def _timed_top_k(store, queries: np.ndarray, k: int):
+    times, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        idx, _dist = store._top_k(q[None, :], k)[0]
+        times.append(time.perf_counter() - t0)
+        results.append(set(idx.tolist()))
+    return times, results
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--live", action="store_true", help="Use the configured Chroma collection")
+    ap.add_argument("--docs", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=3072)
+    ap.add_argument("--clusters", type=int, default=500)
+    ap.add_argument("--space", choices=("l2", "cosine", "ip"), default="l2")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=24)
+    ap.add_argument("--rerank", type=int, nargs="+", default=[200])
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--min-recall", type=float, default=0.95)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="quant_bench_"))
+    try:
+        if args.live:
+            from utils.vectorstore import _real_chroma
+
+            dense_dir = ensure_export(_real_chroma(), tmp, progress=None)
+        else:
+            collection = _ClusteredCollection(args.docs, args.dim, args.clusters, args.space, args.seed)
+            dense_dir = export_collection(collection, tmp / collection.name, progress=None)
+            del collection
+
+        exact = NumpyVectorStore(dense_dir, embedding_function=None)
+        n, dim = exact.matrix.shape
+        rng = np.random.default_rng(args.seed)
+        picks = np.sort(rng.choice(n, size=min(args.queries, n), replace=False))
+        queries = np.asarray(exact.matrix[picks], dtype=np.float32)
+        queries += rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+
+        print(f"[Data] {n:,} x {dim} ({exact.space}), k={args.k}")
+        times, truth = _timed_top_k(exact, queries, args.k)
+        base_p50 = float(np.median(times))
+        print(f"[float32 exact] {exact.matrix.nbytes / 2**20:9.1f} MiB | {_percentiles(times)} | recall 1.0000")
+
+        failed = False
+        for mode in args.modes:
+            t0 = time.perf_counter()
+            qdir = build_quantized(dense_dir, mode, progress=None)
+            print(f"[Build {mode}] {time.perf_counter() - t0:.1f}s")
+            for rerank in args.rerank:
+                store = QuantizedVectorStore(dense_dir, qdir, embedding_function=None, rerank=rerank)
+                times, got = _timed_top_k(store, queries, args.k)
+                recall = sum(len(g & t) for g, t in zip(got, truth)) / max(1, sum(len(t) for t in truth))
+                print(
+                    f"[{mode:>4} rerank={rerank:<4}] {store.memory_bytes() / 2**20:9.1f} MiB | "
+                    f"{_percentiles(times)} (x{float(np.median(times)) / base_p50:.2f} float32) | recall {recall:.4f}"
+                )
+                if mode == "int8" and recall < args.min_recall:
+                    failed = True
+        return 1 if failed else 0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""CE verifier: one forward pass per answer sentence vs one batched pass over all pairs.
+
+Builds synthetic recipe answers (``--sentences`` sentences) and retrieved docs,
+then times the verifier's batched scoring against the former per-sentence loop
+(re-normalizing every snippet for every sentence). Both use ``CE_MODEL`` on
+``CE_BACKEND`` loaded directly, not through the shared micro-batching service,
+whose wait window would penalize the many small calls. Checks that
+per-sentence max scores agree within ``--atol`` (padding differs between batch
+layouts) and that the judge branch is identical.
+
+Usage (from the project root, needs FlagEmbedding):
+    python -m benchmarks.verifier_ce_batching
+    python -m benchmarks.verifier_ce_batching --sentences 10 20 40 --docs 8 --repeat 5
+
+Exits with status 1 when scores or branches diverge.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from config.settings import CE_MAX_DOCS, CE_MODEL, CE_SNIPPETS_PER_DOC
+from utils import verifier_ce as vc
+from utils.ce_service import _load_model
+
+
+_DISHES = ["김치찌개", "된장찌개", "불고기", "잡채", "떡볶이", "닭볶음탕", "비빔밥", "미역국"]
+_INGREDIENTS = ["돼지고기", "두부", "양파", "대파", "마늘", "감자", "애호박", "당근", "고추장", "간장"]
+_STEPS = [
+    "{ing}를 {n}g 준비해 한입 크기로 썬다.",
+    "냄비에 물 {n}ml를 붓고 {ing}를 넣어 중불에서 끓인다.",
+    "{ing}는 {n}분 정도 볶아 향을 낸다.",
+    "{dish}에 {ing}를 넣고 {n}분 더 끓인다.",
+    "간은 {ing}로 맞추고 기호에 따라 {n}큰술을 더한다.",
+    "완성된 {dish}는 그릇에 담아 {ing}를 올려 낸다.",
+]
+
+
+def _sentence(rng: random.Random, dish: str) -> str:
+    return rng.choice(_STEPS).format(ing=rng.choice(_INGREDIENTS), n=rng.randint(1, 500), dish=dish)
+
+
+def _legacy_max_scores(reranker, sents: List[str], snippets: List[str]) -> List[float]:
+    # the former loop: one compute_score call and a fresh snippet normalization per sentence
+    out = []
+    for sent in sents:
+        q = vc._normalize_text(sent)
+        pairs = [[q, vc._normalize_text(sn)] for sn in snippets]
+        out.append(float(np.max(reranker.compute_score(pairs, normalize=True))))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sentences", type=int, nargs="+", default=[5, 10, 20, 40])
+    ap.add_argument("--docs", type=int, default=CE_MAX_DOCS)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--atol", type=float, default=1e-3)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    reranker = _load_model(CE_MODEL)
+    if reranker is None:
+        print(f"cross-encoder {CE_MODEL} unavailable")
+        return 1
+    rng = random.Random(args.seed)
+    print(f"[Model] {CE_MODEL}")
+
+    failed = False
+    for n_sents in args.sentences:
+        dish = rng.choice(_DISHES)
+        answer = " ".join(_sentence(rng, dish) for _ in range(n_sents))
+        docs = [" ".join(_sentence(rng, dish) for _ in range(12)) for _ in range(args.docs)]
+        sents = [s for s in vc._split_sentences(answer) if not vc._is_neutral_sentence(s)]
+        snippets = vc._extract_snippets(docs, CE_MAX_DOCS, CE_SNIPPETS_PER_DOC)
+
+        loop_t, batch_t = [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            legacy = _legacy_max_scores(reranker, sents, snippets)
+            loop_t.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            batched = vc._sentence_max_scores(reranker, sents, snippets)
+            batch_t.append(time.perf_counter() - t0)
+
+        diff = float(np.max(np.abs(np.asarray(legacy) - np.asarray(batched)))) if sents else 0.0
+        branch_new = vc.verify_answer_with_ce(answer, docs)["branch"]  # through the shared service
+        supported_old = sum(1 for s in legacy if s >= vc.CE_SENT_T)
+        supported_new = sum(1 for s in batched if s >= vc.CE_SENT_T)
+        ok = diff <= args.atol and supported_old == supported_new
+        failed |= not ok
+        loop_ms, batch_ms = np.median(loop_t) * 1000.0, np.median(batch_t) * 1000.0
+        print(
+            f"[{len(sents):>3} sents x {len(snippets):>2} snippets] loop {loop_ms:8.1f} ms | batched {batch_ms:8.1f} ms | "
+            f"{loop_ms / max(batch_ms, 1e-9):4.1f}x | max |diff| {diff:.2e} | supported {supported_old}/{supported_new} "
+            f"| branch {branch_new} | {'ok' if ok else 'MISMATCH'}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""CE verifier snippet choice: evenly sampled snippets vs lexical pre-selection.
+
+For synthetic recipe answers over retrieved docs, scores every answer sentence
+three ways with ``CE_MODEL``:
+
+- sampled:    ``CE_SNIPPETS_PER_DOC`` evenly spaced sentences per doc, all pairs
+              (the verifier without ``CE_PRESELECT``);
+- preselect:  top ``--top-m`` doc sentences per answer sentence by character
+              n-gram BM25 (``CE_PRESELECT=1``);
+- exhaustive: every doc sentence, the reference.
+
+Reports CE pairs and time per answer, and how often each method reaches the
+same ``CE_SENT_T`` decision and the same best score as the exhaustive run.
+Half of each answer's sentences are taken from the docs (with the quantities
+changed), the rest are written fresh.
+
+Usage (from the project root, needs FlagEmbedding):
+    python -m benchmarks.verifier_preselect
+    python -m benchmarks.verifier_preselect --answers 20 --sentences 12 --top-m 2 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.verifier_ce_batching import _DISHES, _sentence
+from config.settings import CE_MAX_DOCS, CE_MODEL, CE_PRESELECT_TOP_M, CE_SENT_T, CE_SNIPPETS_PER_DOC
+from utils import verifier_ce as vc
+from utils.ce_service import _load_model
+
+
+def _answer(rng: random.Random, dish: str, docs: List[str], n_sents: int) -> str:
+    doc_sents = [s for d in docs for s in vc._split_sentences(d)]
+    out = []
+    for _ in range(n_sents):
+        if rng.random() < 0.5:
+            out.append(re.sub(r"\d+", lambda _: str(rng.randint(1, 500)), rng.choice(doc_sents)))
+        else:
+            out.append(_sentence(rng, dish))
+    return " ".join(out)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--answers", type=int, default=10)
+    ap.add_argument("--sentences", type=int, default=10)
+    ap.add_argument("--docs", type=int, default=CE_MAX_DOCS)
+    ap.add_argument("--doc-sentences", type=int, default=12)
+    ap.add_argument("--top-m", type=int, nargs="+", default=[CE_PRESELECT_TOP_M])
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    reranker = _load_model(CE_MODEL)
+    if reranker is None:
+        print(f"cross-encoder {CE_MODEL} unavailable")
+        return 1
+    rng = random.Random(args.seed)
+    print(f"[Model] {CE_MODEL} | {args.answers} answers x {args.sentences} sentences | {args.docs} docs")
+
+    methods = ["sampled"] + [f"preselect m={m}" for m in args.top_m]
+    pairs: Dict[str, List[int]] = {k: [] for k in methods + ["exhaustive"]}
+    times: Dict[str, List[float]] = {k: [] for k in methods + ["exhaustive"]}
+    same_decision: Dict[str, List[bool]] = {k: [] for k in methods}
+    same_best: Dict[str, List[bool]] = {k: [] for k in methods}
+    for _ in range(args.answers):
+        dish = rng.choice(_DISHES)
+        docs = [" ".join(_sentence(rng, dish) for _ in range(args.doc_sentences)) for _ in range(args.docs)]
+        sents = [s for s in vc._split_sentences(_answer(rng, dish, docs, args.sentences)) if not vc._is_neutral_sentence(s)]
+        passages = vc._doc_sentences(docs, CE_MAX_DOCS)
+        snippets = vc._extract_snippets(docs, CE_MAX_DOCS, CE_SNIPPETS_PER_DOC)
+
+        t0 = time.perf_counter()
+        exhaustive = np.asarray(vc._sentence_max_scores(reranker, sents, passages))
+        times["exhaustive"].append(time.perf_counter() - t0)
+        pairs["exhaustive"].append(len(sents) * len(passages))
+
+        runs = {}
+        t0 = time.perf_counter()
+        runs["sampled"] = vc._sentence_max_scores(reranker, sents, snippets)
+        times["sampled"].append(time.perf_counter() - t0)
+        pairs["sampled"].append(len(sents) * len(snippets))
+        for m in args.top_m:
+            key = f"preselect m={m}"
+            t0 = time.perf_counter()
+            candidates = vc._preselect(sents, passages, m)
+            runs[key] = vc._sentence_max_scores(reranker, sents, passages, candidates)
+            times[key].append(time.perf_counter() - t0)
+            pairs[key].append(sum(len(c) for c in candidates))
+
+        for key, scores in runs.items():
+            scores = np.asarray(scores)
+            same_decision[key].extend(((scores >= CE_SENT_T) == (exhaustive >= CE_SENT_T)).tolist())
+            same_best[key].extend(np.isclose(scores, exhaustive, atol=1e-4).tolist())
+
+    for key in methods + ["exhaustive"]:
+        line = f"[{key:<15}] {np.mean(pairs[key]):7.1f} pairs/answer | {np.median(times[key]) * 1000.0:8.1f} ms"
+        if key in same_decision:
+            line += (
+                f" | CE_SENT_T decision = exhaustive {np.mean(same_decision[key]):.3f}"
+                f" | best score = exhaustive {np.mean(same_best[key]):.3f}"
+            )
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,9 +19,36 @@ except Exception:
 
 COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "recipes-v1")
 
+# Dense read path: "chroma" (HNSW via langchain_chroma) | "numpy" (exact search over a memory-mapped export)
+# | "int8" / "pq" (quantized scan over the same export + float32 re-rank, utils/quantized_store.py)
+# | "matryoshka" (truncated-prefix scan + full-dimension rescoring, utils/matryoshka_store.py)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma").strip().lower()
+NUMPY_STORE_DIR = os.environ.get("NUMPY_STORE_DIR", str(BASE_DIR / "dense_cache"))
+NUMPY_STORE_PAGE_SIZE = int(os.environ.get("NUMPY_STORE_PAGE_SIZE", "2000"))  # export 시 collection.get limit
+NUMPY_STORE_VERIFY_FINGERPRINT = os.environ.get("NUMPY_STORE_VERIFY_FINGERPRINT", "1") == "1"  # 0이면 이름+문서 수만 비교
+NUMPY_STORE_REFRESH_INTERVAL = float(os.environ.get("NUMPY_STORE_REFRESH_INTERVAL", "30"))  # 초, 실행 중 워커의 export 재검증 주기 (0이면 끔)
+QUANT_RERANK_CANDIDATES = int(os.environ.get("QUANT_RERANK_CANDIDATES", "200"))  # 양자화 점수 상위 후보 수 (float32로 재정렬)
+QUANT_PQ_SUBSPACES = int(os.environ.get("QUANT_PQ_SUBSPACES", "192"))  # PQ 부분공간 수 = 벡터당 바이트 (차원의 약수)
+QUANT_PQ_TRAIN_SIZE = int(os.environ.get("QUANT_PQ_TRAIN_SIZE", "20000"))  # 코드북 학습 샘플 수
+QUANT_PQ_ITERS = int(os.environ.get("QUANT_PQ_ITERS", "12"))  # k-means 반복 횟수
+
 # ✅ 수정: OpenAI 임베딩 기본값
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-large")
 
+# Query embedding cache (shared by OOD guard, retrieval and MMR backfill)
+EMBED_CACHE_ENABLED = os.environ.get("EMBED_CACHE_ENABLED", "1") == "1"
+EMBED_CACHE_MAX_ENTRIES = int(os.environ.get("EMBED_CACHE_MAX_ENTRIES", "2048"))  # 메모리 LRU 상한 (3072차원 float32 ≈ 12KB/개)
+EMBED_CACHE_DB = os.environ.get("EMBED_CACHE_DB", "")  # SQLite 경로 (비우면 메모리 캐시만, 재시작 시 유지 안 됨)
+EMBED_CACHE_DB_MAX_ROWS = int(os.environ.get("EMBED_CACHE_DB_MAX_ROWS", "200000"))  # 디스크 캐시 상한 (오래된 항목부터 삭제)
+
+# Query-side embeddings for the OOD guard, local intent router and answer cache (retrieval keeps EMBEDDING_MODEL)
+GUARD_EMBEDDING_BACKEND = os.environ.get("GUARD_EMBEDDING_BACKEND", "openai")  # openai | local (CPU, 네트워크 왕복 없음)
+LOCAL_EMBEDDING_MODEL = os.environ.get(
+    "LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+LOCAL_EMBEDDING_ONNX_FILE = os.environ.get("LOCAL_EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")  # 모델 repo 안의 ONNX 가중치 (비우면 PyTorch)
+GUARD_EMBEDDING_MODEL = f"local:{LOCAL_EMBEDDING_MODEL}" if GUARD_EMBEDDING_BACKEND == "local" else EMBEDDING_MODEL
+
 # Defaults
 # 검색 문서 개수 기본값 (Answer Relevancy 향상을 위해 12개로 증가)
 K_DEFAULT = int(os.environ.get("K_DEFAULT", "12"))
@@ -38,6 +65,15 @@ OOD_PROTOTYPES_PATH = os.environ.get(
     "GROUPA_OOD_PROTOTYPES_PATH", str(BASE_DIR / "config" / "ood_prototypes.json")
 )
 
+# Local intent router (nearest-centroid over embedded prototypes, LLM only when ambiguous)
+LOCAL_INTENT_ROUTER = os.environ.get("LOCAL_INTENT_ROUTER", "1") == "1"
+INTENT_PROTOTYPES_PATH = os.environ.get(
+    "INTENT_PROTOTYPES_PATH", str(BASE_DIR / "config" / "intent_prototypes.json")
+)
+INTENT_ROUTER_MARGIN = float(os.environ.get("INTENT_ROUTER_MARGIN", "0.04"))  # top1-top2 유사도 차이가 이보다 작으면 LLM 라우터
+INTENT_ROUTER_MIN_SCORE = float(os.environ.get("INTENT_ROUTER_MIN_SCORE", "0.3"))  # top1 유사도 하한
+PROTOTYPE_LOAD_RETRY_INTERVAL = float(os.environ.get("PROTOTYPE_LOAD_RETRY_INTERVAL", "60"))  # 초, 프로토타입 행렬 로드 실패 후 재시도 간격
+
 # Temperature settings (Faithfulness 개선)
 GENERATION_TEMPERATURE = float(os.environ.get("GENERATION_TEMPERATURE", "0.0"))
 ROUTER_TEMPERATURE = float(os.environ.get("ROUTER_TEMPERATURE", "0.0"))
@@ -47,6 +83,9 @@ JUDGE_TEMPERATURE = float(os.environ.get("JUDGE_TEMPERATURE", "0.0"))
 # ✅ 수정: prefix 제거
 OOD_COS_THRESHOLD = float(os.environ.get("OOD_COS_THRESHOLD", "0.35"))
 OOD_COS_MARGIN = float(os.environ.get("OOD_COS_MARGIN", "0.05"))
+OOD_TOP_K = int(os.environ.get("OOD_TOP_K", "3"))  # 도메인 점수 = 가장 가까운 k개 예문 유사도 평균
+OOD_USE_OUT_PROTOTYPES = os.environ.get("OOD_USE_OUT_PROTOTYPES", "1") == "1"  # prototypes_out(도메인 밖 예문)과 대비
+OOD_OUT_MARGIN = float(os.environ.get("OOD_OUT_MARGIN", "0.05"))  # out 점수가 in 점수보다 이만큼 높으면 out
 
 # Moderation (harmful content filtering)
 ENABLE_MODERATION = os.environ.get("ENABLE_MODERATION", "1") == "1"
@@ -56,11 +95,34 @@ MODERATION_MODEL = os.environ.get("MODERATION_MODEL", "omni-moderation-latest")
 ALLOW_NO_CONTEXT_ANSWER = os.environ.get("ALLOW_NO_CONTEXT_ANSWER", "0") == "1"
 ENABLE_QUERY_REWRITE = os.environ.get("ENABLE_QUERY_REWRITE", "1") == "1"
 ENABLE_CRAG = os.environ.get("ENABLE_CRAG", "1") == "1"
+CRAG_GATE_MODE = os.environ.get("CRAG_GATE_MODE", "shadow")  # off | shadow (judge 항상 실행, 예측만 기록) | skip (grounded 확률이 높으면 judge 생략; crag_gate_fit으로 가중치를 학습한 뒤에만)
+CRAG_GATE_SKIP_P = float(os.environ.get("CRAG_GATE_SKIP_P", "0.95"))  # judge를 생략할 최소 grounded 예측 확률
+CRAG_GATE_AUDIT_RATE = float(os.environ.get("CRAG_GATE_AUDIT_RATE", "0.1"))  # 생략한 판정 중 백그라운드로 judge를 돌려 감사할 비율
+CRAG_GATE_WEIGHTS_PATH = os.environ.get("CRAG_GATE_WEIGHTS_PATH", str(BASE_DIR / "config" / "crag_gate.json"))  # 로지스틱 가중치
+CRAG_GATE_LOG_PATH = os.environ.get("CRAG_GATE_LOG_PATH", str(BASE_DIR / "logs" / "crag_gate.jsonl"))  # 특징/판정 기록 (학습·감사용, ""이면 기록 안 함)
+SPECULATIVE_CRAG = os.environ.get("SPECULATIVE_CRAG", "1") == "1"  # 1차 검색이 약하면 보정 rewrite + 재검색을 1차 생성/판정과 동시에 시작
+SPECULATIVE_CRAG_MAX_SCORE = float(os.environ.get("SPECULATIVE_CRAG_MAX_SCORE", "0.6"))  # 0~1 정규화 최고 검색 점수가 이 값 미만이면 약한 검색 (hybrid: 1.0 = 두 leg 모두 1위, 약 0.5 = 한 leg에만 검색)
+SPECULATIVE_FRONT_STAGE = os.environ.get("SPECULATIVE_FRONT_STAGE", "1") == "1"  # OOD guard / router / rewrite 동시 실행
 DEBUG_RAW = os.environ.get("GROUPA_DEBUG_RAW", "1") == "1"  # ✅ 디버그 모드 활성화
 
 # CI/test mode (fake LLM / no vector)
 USE_FAKE_LLM = os.environ.get("USE_FAKE_LLM", "0") == "1"
 
+# Async pipeline executors (utils/async_runtime.py)
+ASYNC_CPU_WORKERS = int(os.environ.get("ASYNC_CPU_WORKERS", str(os.cpu_count() or 1)))  # Okt/BM25/로컬 임베딩 실행 스레드 수
+ASYNC_IO_WORKERS = int(os.environ.get("ASYNC_IO_WORKERS", "64"))  # async 클라이언트가 없는 블로킹 호출(Chroma 등) 스레드 수
+
+# LLM gateway (utils/llm_gateway.py): pooled clients, rate limits, retries
+LLM_RPM = int(os.environ.get("LLM_RPM", "500"))  # 모델별 분당 요청 수 상한 (0 = 제한 없음)
+LLM_TPM = int(os.environ.get("LLM_TPM", "200000"))  # 모델별 분당 토큰 수 상한 (0 = 제한 없음)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))  # 모델별 동시 호출 수
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))  # 429/5xx/연결 오류 재시도 횟수
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))  # 지수 백오프 시작값(초), full jitter
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "8.0"))  # 백오프 상한(초)
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))  # 요청 타임아웃(초)
+LLM_HTTP_MAX_CONNECTIONS = int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", "100"))  # 공유 HTTP 커넥션 풀 크기
+LLM_EST_COMPLETION_TOKENS = int(os.environ.get("LLM_EST_COMPLETION_TOKENS", "400"))  # TPM 선차감용 예상 출력 토큰 (호출 후 실제 사용량으로 정산)
+
 # Retrieval/Rerank configuration
 RERANK_MMR = os.environ.get("RERANK_MMR", "1") == "1"
 MMR_FETCH = int(os.environ.get("MMR_FETCH", "150"))  # ✅ 100 → 150 증가
@@ -79,17 +141,64 @@ USE_HYBRID_SEARCH = os.environ.get("USE_HYBRID_SEARCH", "1") == "1"
 HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", "0.5"))  # 0.5 = 동등 가중치
 HYBRID_K_RRF = int(os.environ.get("HYBRID_K_RRF", "60"))  # RRF 상수
 HYBRID_FETCH_K = int(os.environ.get("HYBRID_FETCH_K", "24"))  # Dense/Sparse 각각 fetch 수
+HYBRID_PARALLEL = os.environ.get("HYBRID_PARALLEL", "1") == "1"  # Dense/Sparse 동시 실행
+HYBRID_DENSE_TIMEOUT = float(os.environ.get("HYBRID_DENSE_TIMEOUT", "5.0"))  # 초, 임베딩+Chroma (0이면 무제한)
+HYBRID_SPARSE_TIMEOUT = float(os.environ.get("HYBRID_SPARSE_TIMEOUT", "2.0"))  # 초, 토크나이징+BM25 (0이면 무제한)
+HYBRID_LEG_WORKERS = int(os.environ.get("HYBRID_LEG_WORKERS", "16"))  # leg 실행 스레드 수 (시간 초과 leg 포함)
+
+# retrieve_node result cache (LRU + TTL, dropped when the collection / BM25 index changes)
+RETRIEVAL_CACHE_ENABLED = os.environ.get("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", "512"))  # 캐시할 검색 결과 수
+RETRIEVAL_CACHE_TTL = float(os.environ.get("RETRIEVAL_CACHE_TTL", "600"))  # 초, 항목 유효 시간 (0이면 무제한)
+RETRIEVAL_CACHE_VERSION_INTERVAL = float(os.environ.get("RETRIEVAL_CACHE_VERSION_INTERVAL", "2"))  # 초, 인덱스 버전 재확인 주기 (0이면 매 요청)
+
+# Semantic answer cache (utils/answer_cache.py)
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92"))  # 캐시된 질문과의 최소 코사인 유사도
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1024"))  # 캐시할 답변 수
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))  # 초, 항목 유효 시간 (0이면 무제한)
+
+# Two-stage Matryoshka dense search (VECTOR_BACKEND=matryoshka; dense leg of hybrid search and pure vector search)
+MATRYOSHKA_PREFIX_DIM = int(os.environ.get("MATRYOSHKA_PREFIX_DIM", "256"))  # 1단계 스캔 차원 (256 / 512 권장)
+MATRYOSHKA_CANDIDATES = int(os.environ.get("MATRYOSHKA_CANDIDATES", "200"))  # 전체 차원으로 재계산할 후보 수
+
+# BM25 on-disk index (memory-mapped; rebuilt when the collection no longer matches the manifest)
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", str(BASE_DIR / "bm25_cache"))
+BM25_VERIFY_FINGERPRINT = os.environ.get("BM25_VERIFY_FINGERPRINT", "1") == "1"  # 0이면 이름+문서 수만 비교
+BM25_BUILD_ON_STARTUP = os.environ.get("BM25_BUILD_ON_STARTUP", "1") == "1"  # 서버 시작 시 인덱스 준비
+BM25_BUILD_WORKERS = int(os.environ.get("BM25_BUILD_WORKERS", str(os.cpu_count() or 1)))  # 토크나이징 프로세스 수
+BM25_BUILD_PAGE_SIZE = int(os.environ.get("BM25_BUILD_PAGE_SIZE", "2000"))  # collection.get limit
+BM25_BUILD_BATCH_SIZE = int(os.environ.get("BM25_BUILD_BATCH_SIZE", "256"))  # 워커당 토크나이징 배치
+BM25_BUILD_LOCK_TIMEOUT = float(os.environ.get("BM25_BUILD_LOCK_TIMEOUT", "120"))  # 초, 보유 프로세스가 이 시간 동안 갱신(heartbeat)하지 않으면 잠금 인수 (PID가 사라지면 즉시)
+# Incremental BM25 (delta segments + background merge)
+BM25_DELTA_MAX_RATIO = float(os.environ.get("BM25_DELTA_MAX_RATIO", "0.2"))  # 변경 문서가 이 비율 이하면 delta, 넘으면 전체 재빌드
+BM25_MERGE_MAX_SEGMENTS = int(os.environ.get("BM25_MERGE_MAX_SEGMENTS", "8"))  # delta 세그먼트 수가 넘으면 merge
+BM25_MERGE_DELTA_RATIO = float(os.environ.get("BM25_MERGE_DELTA_RATIO", "0.1"))  # (delta 문서 + tombstone) / base 비율이 넘으면 merge
+BM25_REFRESH_INTERVAL = float(os.environ.get("BM25_REFRESH_INTERVAL", "30"))  # 초, manifest 변경 확인 주기 (0이면 끔)
 
 # Cross-Encoder reranker (optional)
 USE_CE_RERANK = os.environ.get("USE_CE_RERANK", "0") == "1"
 CE_MODEL = os.environ.get("CE_MODEL", "BAAI/bge-reranker-base")  # ✅ 수정
 CE_TOPN = int(os.environ.get("CE_TOPN", "30"))
+CE_BATCH_MAX_PAIRS = int(os.environ.get("CE_BATCH_MAX_PAIRS", "128"))  # 공유 CE 서비스: 요청들을 모아 한 번에 채점할 최대 쌍 수
+CE_BATCH_MAX_WAIT_MS = float(os.environ.get("CE_BATCH_MAX_WAIT_MS", "3"))  # 첫 요청 이후 다른 요청을 기다리는 최대 시간(ms)
+CE_BACKEND = os.environ.get("CE_BACKEND", "torch")  # torch (FlagEmbedding) | onnx (ONNX Runtime, CPU)
+CE_ONNX_DIR = os.environ.get("CE_ONNX_DIR", str(BASE_DIR / "ce_onnx"))  # 모델별 ONNX export 위치 (없으면 첫 로드 때 1회 export)
+CE_ONNX_INT8 = os.environ.get("CE_ONNX_INT8", "1") == "1"  # dynamic int8 양자화 가중치 사용 (0이면 fp32 ONNX)
+CE_ONNX_THREADS = int(os.environ.get("CE_ONNX_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))  # ONNX Runtime intra-op 스레드 수
+CE_MAX_LENGTH = int(os.environ.get("CE_MAX_LENGTH", "512"))  # 질의+문서 토큰 최대 길이 (FlagReranker 기본값과 동일)
 
 # ✅ 수정: Cross-Encoder 기본값 완화
 CE_SENT_T = float(os.environ.get("CE_SENT_T", "0.15"))      # 0.30 → 0.15
 CE_SUPPORT_P = float(os.environ.get("CE_SUPPORT_P", "0.15"))  # 0.60 → 0.15
 CE_MAX_DOCS = int(os.environ.get("CE_MAX_DOCS", "8"))
 CE_SNIPPETS_PER_DOC = int(os.environ.get("CE_SNIPPETS_PER_DOC", "3"))
+CE_PRESELECT = os.environ.get("CE_PRESELECT", "1") == "1"  # 답변 문장별로 문서 문장을 BM25(문자 n-gram)로 사전 선별 후 CE 채점
+CE_PRESELECT_TOP_M = int(os.environ.get("CE_PRESELECT_TOP_M", "4"))  # 문장당 CE로 보낼 후보 문장 수
+CE_PRESELECT_NGRAM = int(os.environ.get("CE_PRESELECT_NGRAM", "2"))  # 사전 선별용 문자 n-gram 크기
+STREAM_VERIFY = os.environ.get("STREAM_VERIFY", "1") == "1"  # 1차 답변 스트리밍 중 완성된 문장마다 CE 검증, 지지율이 낮으면 생성 중단 후 바로 보정
+STREAM_VERIFY_FLOOR = float(os.environ.get("STREAM_VERIFY_FLOOR", "0.10"))  # 중단 기준 지지율 (CE 판정의 notGrounded 경계 CE_SUPPORT_P - 0.05와 동일)
+STREAM_VERIFY_MIN_SENTENCES = int(os.environ.get("STREAM_VERIFY_MIN_SENTENCES", "4"))  # 최소 이만큼 채점한 뒤에만 중단
 
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
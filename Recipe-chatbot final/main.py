@@ -3,7 +3,7 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from config.settings import STATIC_DIR
+from config.settings import STATIC_DIR, USE_HYBRID_SEARCH, BM25_BUILD_ON_STARTUP
 
 from routes.health import router as health_router
 from routes.ask import router as ask_router
@@ -26,6 +26,31 @@ app.include_router(session_router)
 app.include_router(test_router)
 app.include_router(root_router)
 
+# Startup: map (or build once per host) the BM25 index before serving traffic
+@app.on_event("startup")
+def warm_bm25_index():
+    if not (USE_HYBRID_SEARCH and BM25_BUILD_ON_STARTUP):
+        return
+    try:
+        from utils.hybrid_retriever import get_hybrid_retriever
+
+        get_hybrid_retriever().warm_up()
+    except Exception as e:
+        print(f"BM25 warm-up skipped: {e}")
+
+
+# Startup: memory-map the persisted OOD prototype matrix (no API call; built offline)
+@app.on_event("startup")
+def warm_ood_prototypes():
+    try:
+        from nodes.ood_guard_node import warm_up
+
+        if not warm_up():
+            print("OOD prototypes not mapped at startup (python -m utils.prototype_store config/ood_prototypes.json)")
+    except Exception as e:
+        print(f"OOD prototype warm-up skipped: {e}")
+
+
 # Static files (if exists)
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
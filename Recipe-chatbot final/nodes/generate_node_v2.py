@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 import re
-from langchain_openai import ChatOpenAI
+from typing import Callable, Optional
+
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from config.settings import (
@@ -13,6 +14,7 @@ from config.settings import (
 )
 from prompts.templates import PROMPT_BY_INTENT, GENERAL_PROMPT
 from utils.text_formatter import clean_newlines
+from utils.llm_gateway import get_llm_gateway
 
 
 # --- Heuristics ---------------------------------------------------------------
@@ -43,14 +45,8 @@ def extract_target_dish(query: str) -> str:
 
 # --- Generation ---------------------------------------------------------------
 
-def generate_with_history(
-    query: str,
-    intent: str,
-    context: str,
-    conversation_history: list | None = None,
-    model: str = GENERATION_MODEL,
-) -> str:
-    """Generate answer, optionally using conversation history."""
+def _early_answer(query: str, context: str) -> str | None:
+    """LLM 호출 없이 정해지는 답변 (컨텍스트 없는 거절 / fake 모드), 해당 없으면 None"""
     # No-context refusal (clean Korean)
     if not context and not ALLOW_NO_CONTEXT_ANSWER:
         return (
@@ -69,26 +65,45 @@ def generate_with_history(
             )
         snippet = context.strip().split("\n", 1)[0][:180]
         return f"요약 기반 안내: {snippet} ..."
+    return None
+
 
-    llm = ChatOpenAI(model=model, temperature=GENERATION_TEMPERATURE)
+def _build_messages(query: str, intent: str, context: str, conversation_history: list | None) -> list:
     prompt_template = PROMPT_BY_INTENT.get(intent, GENERAL_PROMPT)
+    if not context:
+        context = "컨텍스트가 비어 있으므로 보편적인 요리 지식으로 보완합니다."
 
-    try:
-        if not context:
-            context = "컨텍스트가 비어 있으므로 보편적인 요리 지식으로 보완합니다."
+    formatted_messages = prompt_template.format_messages(context=context, question=query)
+    system_content = formatted_messages[0].content
+    # ✅ FIX: Use the formatted human message that includes context, not just the query
+    human_content = formatted_messages[1].content
+
+    messages = [SystemMessage(content=system_content)]
+    if conversation_history:
+        # recent 3 turns (user+assistant × 3) = 6 messages
+        messages.extend(conversation_history[-6:])
+    messages.append(HumanMessage(content=human_content))
+    return messages
 
-        formatted_messages = prompt_template.format_messages(context=context, question=query)
-        system_content = formatted_messages[0].content
-        # ✅ FIX: Use the formatted human message that includes context, not just the query
-        human_content = formatted_messages[1].content
 
-        messages = [SystemMessage(content=system_content)]
-        if conversation_history:
-            # recent 3 turns (user+assistant × 3) = 6 messages
-            messages.extend(conversation_history[-6:])
-        messages.append(HumanMessage(content=human_content))
+def generate_with_history(
+    query: str,
+    intent: str,
+    context: str,
+    conversation_history: list | None = None,
+    model: str = GENERATION_MODEL,
+) -> str:
+    """Generate answer, optionally using conversation history."""
+    early = _early_answer(query, context)
+    if early is not None:
+        return early
+
+    gw = get_llm_gateway()
+    llm = gw.chat(model, GENERATION_TEMPERATURE)
 
-        raw_ans = llm.invoke(messages).content
+    try:
+        messages = _build_messages(query, intent, context, conversation_history)
+        raw_ans = gw.invoke(llm, messages).content
         ans = clean_newlines((raw_ans or "").strip())
         return ans
     except Exception as e:
@@ -98,5 +113,46 @@ def generate_with_history(
         return f"응답 생성 중 오류가 발생했습니다: {str(e)}"
 
 
+async def agenerate_with_history(
+    query: str,
+    intent: str,
+    context: str,
+    conversation_history: list | None = None,
+    model: str = GENERATION_MODEL,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Async generate_with_history (ainvoke).
+
+    on_token이 주어지면 astream으로 생성하며 토큰 조각마다 호출 (반환값은 동일하게 정리된 전체 답변).
+    """
+    early = _early_answer(query, context)
+    if early is not None:
+        if on_token:
+            on_token(early)
+        return early
+
+    gw = get_llm_gateway()
+    llm = gw.chat(model, GENERATION_TEMPERATURE)
+
+    try:
+        messages = _build_messages(query, intent, context, conversation_history)
+        if on_token is None:
+            raw_ans = (await gw.ainvoke(llm, messages)).content
+        else:
+            parts = []
+            async for chunk in gw.astream(llm, messages):
+                piece = chunk.content or ""
+                if piece:
+                    parts.append(piece)
+                    on_token(piece)
+            raw_ans = "".join(parts)
+        return clean_newlines((raw_ans or "").strip())
+    except Exception as e:
+        from config.settings import DEBUG_RAW
+        if DEBUG_RAW:
+            print(f"generate_with_history_error: {e}")
+        return f"응답 생성 중 오류가 발생했습니다: {str(e)}"
+
+
 def generate_node(query: str, intent: str, context: str, model: str = GENERATION_MODEL) -> str:
     return generate_with_history(query, intent, context, None, model)
\ No newline at end of file
@@ -3,16 +3,17 @@ from __future__ import annotations
 """OOD Guard Node (pre-router, hybrid)
 
 Hybrid gating: Moderation -> embedding domain score -> LLM fallback near threshold.
+
+The domain score is the top-k mean similarity to the in-domain prototypes,
+contrasted with the out-of-domain ones, from one matrix product against the
+persisted prototype matrix (``utils/prototype_store.py``).
 """
 
-from typing import Dict, Any, Optional, List
-import json
+from typing import Dict, Any, Optional, List, Tuple
 from functools import lru_cache
 from pathlib import Path
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import PromptTemplate
-from openai import OpenAI
 
 from config.settings import (
     OOD_MODEL,
@@ -21,54 +22,71 @@ from config.settings import (
     OOD_PROTOTYPES_PATH,
     OOD_COS_THRESHOLD,
     OOD_COS_MARGIN,
-    EMBEDDING_MODEL,
+    OOD_TOP_K,
+    OOD_USE_OUT_PROTOTYPES,
+    OOD_OUT_MARGIN,
+    GUARD_EMBEDDING_BACKEND,
+    GUARD_EMBEDDING_MODEL,
     OPENAI_API_KEY,
     ENABLE_MODERATION,
     MODERATION_MODEL,
+    PROTOTYPE_LOAD_RETRY_INTERVAL,
+    DEBUG_RAW,
 )
+from utils import prototype_store
+from utils.embedding_cache import get_cached_embeddings, guard_embeddings_enabled
+from utils.async_runtime import run_blocking
+from utils.llm_gateway import get_llm_gateway
+
 
+def _moderation_enabled() -> bool:
+    return bool(ENABLE_MODERATION and OPENAI_API_KEY and not USE_FAKE_LLM)
 
-def _cosine(a: List[float], b: List[float]) -> float:
-    if not a or not b or len(a) != len(b):
-        return 0.0
-    dot = 0.0
-    na = 0.0
-    nb = 0.0
-    for x, y in zip(a, b):
-        dot += x * y
-        na += x * x
-        nb += y * y
-    if na <= 0 or nb <= 0:
-        return 0.0
-    return dot / ((na ** 0.5) * (nb ** 0.5))
+
+def _parse_moderation(resp) -> Optional[Dict[str, Any]]:
+    if not resp or not getattr(resp, "results", None):
+        return None
+    res = resp.results[0]
+    out = {
+        "flagged": bool(getattr(res, "flagged", False)),
+        "categories": dict(getattr(res, "categories", {}) or {}),
+    }
+    # Some SDKs expose category_scores; if present, include
+    if hasattr(res, "category_scores"):
+        try:
+            out["category_scores"] = dict(getattr(res, "category_scores", {}) or {})
+        except Exception:
+            pass
+    return out
 
 
 def get_moderation_report(q: str) -> Optional[Dict[str, Any]]:
     """Return raw moderation result {flagged, categories, category_scores} if available."""
-    if not ENABLE_MODERATION or not OPENAI_API_KEY or USE_FAKE_LLM:
+    if not _moderation_enabled():
         return None
     try:
-        client = OpenAI()
-        resp = client.moderations.create(model=MODERATION_MODEL, input=q)
-        if not resp or not getattr(resp, "results", None):
-            return None
-        res = resp.results[0]
-        out = {
-            "flagged": bool(getattr(res, "flagged", False)),
-            "categories": dict(getattr(res, "categories", {}) or {}),
-        }
-        # Some SDKs expose category_scores; if present, include
-        if hasattr(res, "category_scores"):
-            try:
-                out["category_scores"] = dict(getattr(res, "category_scores", {}) or {})
-            except Exception:
-                pass
-        return out
+        gw = get_llm_gateway()
+        client = gw.openai_client()
+        return _parse_moderation(gw.call(lambda: client.moderations.create(model=MODERATION_MODEL, input=q), MODERATION_MODEL))
     except Exception:
         return None
 
 
-def _moderate_text(q: str) -> Optional[Dict[str, Any]]:
+async def aget_moderation_report(q: str) -> Optional[Dict[str, Any]]:
+    """Async get_moderation_report (pooled AsyncOpenAI client)."""
+    if not _moderation_enabled():
+        return None
+    try:
+        gw = get_llm_gateway()
+        client = gw.async_openai_client()
+        return _parse_moderation(
+            await gw.acall(lambda: client.moderations.create(model=MODERATION_MODEL, input=q), MODERATION_MODEL)
+        )
+    except Exception:
+        return None
+
+
+def _moderation_verdict(rep: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     """Use OpenAI Moderation to detect harmful content in a maintainable, data-driven way.
 
     The moderation API evolves; avoid hard-coding logic in many if/elses.
@@ -76,7 +94,6 @@ def _moderate_text(q: str) -> Optional[Dict[str, Any]]:
     in a single mapping for easy maintenance.
     Docs: https://platform.openai.com/docs/guides/moderation
     """
-    rep = get_moderation_report(q)
     if not rep:
         return None
 
@@ -111,61 +128,96 @@ def _moderate_text(q: str) -> Optional[Dict[str, Any]]:
     return None
 
 
+def _moderate_text(q: str) -> Optional[Dict[str, Any]]:
+    return _moderation_verdict(get_moderation_report(q))
+
+
+_DEFAULT_PROTOTYPES_IN = [
+    "이 요리는 어떻게 만들지?",
+    "레시피 단계와 필요한 재료",
+    "조리 시간과 온도는 어떻게 조절하지?",
+    "남은 재료로 만들 수 있는 요리 추천",
+    "보관 방법과 유통기한",
+    "칼로리와 영양 성분 안내",
+    "How to cook this dish?",
+    "Recipe steps and ingredients list",
+    "Cooking time and oven temperature",
+    "Food storage and shelf life",
+    "Calories and nutrition facts",
+]
+
+
 @lru_cache(maxsize=1)
-def _load_prototypes() -> List[str]:
-    # Load from JSON if present, else fallback defaults
+def _load_prototypes() -> Tuple[List[str], List[str]]:
+    """(labels, texts), labeled by JSON key, in the order the offline CLI embeds them."""
+    labels: List[str] = []
+    texts: List[str] = []
     try:
         p = Path(OOD_PROTOTYPES_PATH)
         if p.exists():
-            data = json.loads(p.read_text(encoding="utf-8"))
-            pros = data.get("prototypes_in") or []
-            pros = [s for s in pros if isinstance(s, str) and s.strip()]
-            if pros:
-                return pros
+            keys = ["prototypes_in"] + (["prototypes_out"] if OOD_USE_OUT_PROTOTYPES else [])
+            for key in keys:
+                key_labels, key_texts = prototype_store.load_labeled(p, key)
+                labels += key_labels
+                texts += key_texts
     except Exception:
-        pass
-    # Defaults (compact, domain-representative)
-    return [
-        "이 요리는 어떻게 만들지?",
-        "레시피 단계와 필요한 재료",
-        "조리 시간과 온도는 어떻게 조절하지?",
-        "남은 재료로 만들 수 있는 요리 추천",
-        "보관 방법과 유통기한",
-        "칼로리와 영양 성분 안내",
-        "How to cook this dish?",
-        "Recipe steps and ingredients list",
-        "Cooking time and oven temperature",
-        "Food storage and shelf life",
-        "Calories and nutrition facts",
-    ]
+        labels, texts = [], []
+    if "prototypes_in" not in labels:
+        # Defaults (compact, domain-representative)
+        labels, texts = ["prototypes_in"] * len(_DEFAULT_PROTOTYPES_IN), list(_DEFAULT_PROTOTYPES_IN)
+    return labels, texts
 
 
-@lru_cache(maxsize=1)
-def _load_centroid() -> Optional[List[float]]:
-    # If no API key or fake mode, skip centroid
-    if USE_FAKE_LLM or not OPENAI_API_KEY:
+def _load_matrix(build: bool):
+    labels, texts = _load_prototypes()
+    path = Path(OOD_PROTOTYPES_PATH)
+    matrix = prototype_store.load_matrix(path, GUARD_EMBEDDING_MODEL, labels, texts)
+    if matrix is None and build:
+        print(
+            "[OOD] prototype matrix not built; embedding once "
+            f"(build offline: python -m utils.prototype_store {path})"
+        )
+        matrix = prototype_store.build_matrix(
+            path, GUARD_EMBEDDING_MODEL, labels, texts, get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+        )
+    return matrix, labels
+
+
+@prototype_store.cache_loaded(PROTOTYPE_LOAD_RETRY_INTERVAL)
+def _load_scorer() -> Optional[prototype_store.PrototypeClassifier]:
+    # Fake mode, or OpenAI backend without an API key: skip embedding scoring
+    # 실패(None)는 캐시하지 않음: PROTOTYPE_LOAD_RETRY_INTERVAL초 뒤 다시 시도, 그동안은 LLM 판정
+    if not guard_embeddings_enabled():
         return None
     try:
-        emb = OpenAIEmbeddings(model=EMBEDDING_MODEL)
-        texts = _load_prototypes()
-        vecs = emb.embed_documents(texts)
-        if not vecs:
-            return None
-        dim = len(vecs[0])
-        acc = [0.0] * dim
-        for v in vecs:
-            if not v or len(v) != dim:
-                continue
-            for i in range(dim):
-                acc[i] += float(v[i])
-        n = float(len(vecs))
-        if n <= 0:
-            return None
-        return [x / n for x in acc]
-    except Exception:
+        matrix, labels = _load_matrix(build=True)
+        return prototype_store.PrototypeClassifier(matrix, labels)
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"ood_prototypes_load_error: {e}")
         return None
 
 
+def warm_up() -> bool:
+    """Map the prototype matrix (and load the local model) before serving; no API call, False when not ready."""
+    if not guard_embeddings_enabled():
+        return False
+    local = GUARD_EMBEDDING_BACKEND == "local"
+    try:
+        # 로컬 모델이면 네트워크 없이 바로 생성 가능
+        matrix, _ = _load_matrix(build=local)
+        if matrix is None:
+            return False
+        if local:
+            emb = get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+            getattr(emb, "inner", emb).warm_up()
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"ood_warm_up_error: {e}")
+        return False
+    return _load_scorer() is not None
+
+
 _PROMPT = PromptTemplate.from_template(
     """너는 질문이 '요리/레시피/조리/재료/보관/영양' 주제인지 분류하는 분류기다.
 규칙: 해당하면 in, 아니면 out 만 출력(설명 금지).
@@ -174,15 +226,60 @@ _PROMPT = PromptTemplate.from_template(
 )
 
 
+_OUT_ANSWER = "죄송해요. 해당 문의는 요리·레시피·조리·보관·영양 주제에 한해 답변해 드려요."
+
+
+def _empty_query() -> Dict[str, Any]:
+    return {
+        "branch": "out",
+        "answer": "질문을 입력해 주세요. 요리·레시피·조리·재료·영양 주제에 맞춰 도와드릴게요.",
+        "method": "empty",
+    }
+
+
+def _embed_verdict(
+    q_vec: List[float],
+    scorer: prototype_store.PrototypeClassifier,
+    threshold: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Top-k prototype domain score (vs out-of-domain prototypes if any); None when borderline (LLM arbitrates)."""
+    threshold = OOD_COS_THRESHOLD if threshold is None else threshold
+    scores = scorer.topk_mean(q_vec, OOD_TOP_K)
+    score = scores.get("prototypes_in", 0.0)
+    out_score = scores.get("prototypes_out")
+    contrast = score - out_score if out_score is not None else None
+    extra = {"out_score": out_score} if out_score is not None else {}
+    # Two-sided margin for LLM arbitration near the threshold
+    lo = threshold - OOD_COS_MARGIN
+    hi = threshold + OOD_COS_MARGIN
+    if score <= lo or (contrast is not None and contrast <= -OOD_OUT_MARGIN):
+        return {
+            "branch": "out",
+            "answer": _OUT_ANSWER,
+            "score": score,
+            **extra,
+            "method": "embed",
+        }
+    if score >= hi and (contrast is None or contrast >= 0):
+        return {"branch": "in", "score": score, **extra, "method": "embed"}
+    return None
+
+
+def _llm_verdict(verdict: str) -> Dict[str, Any]:
+    if verdict == "in":
+        return {"branch": "in", "method": "llm"}
+    return {
+        "branch": "out",
+        "answer": _OUT_ANSWER,
+        "method": "llm",
+    }
+
+
 def ood_guard(query: str) -> Dict[str, Any]:
     """Return {branch: 'in'|'out', answer?: str, score?: float, method?: str}."""
     q = (query or "").strip()
     if not q:
-        return {
-            "branch": "out",
-            "answer": "질문을 입력해 주세요. 요리·레시피·조리·재료·영양 주제에 맞춰 도와드릴게요.",
-            "method": "empty",
-        }
+        return _empty_query()
 
     # Moderation first (safety)
     mod = _moderate_text(q)
@@ -190,24 +287,13 @@ def ood_guard(query: str) -> Dict[str, Any]:
         return mod
 
     # 1) Embedding-based domain score
-    centroid = _load_centroid()
-    if centroid is not None:
+    scorer = _load_scorer()
+    if scorer is not None:
         try:
-            emb = OpenAIEmbeddings(model=EMBEDDING_MODEL)
-            q_vec = emb.embed_query(q)
-            score = _cosine(q_vec, centroid)
-            # Two-sided margin for LLM arbitration near the threshold
-            lo = OOD_COS_THRESHOLD - OOD_COS_MARGIN
-            hi = OOD_COS_THRESHOLD + OOD_COS_MARGIN
-            if score >= hi:
-                return {"branch": "in", "score": float(score), "method": "embed"}
-            if score <= lo:
-                return {
-                    "branch": "out",
-                    "answer": "죄송해요. 해당 문의는 요리·레시피·조리·보관·영양 주제에 한해 답변해 드려요.",
-                    "score": float(score),
-                    "method": "embed",
-                }
+            emb = get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+            verdict = _embed_verdict(emb.embed_query(q), scorer)
+            if verdict is not None:
+                return verdict
             # fallthrough to LLM if borderline
         except Exception:
             pass
@@ -218,15 +304,41 @@ def ood_guard(query: str) -> Dict[str, Any]:
 
     # 3) LLM fallback
     try:
-        llm = ChatOpenAI(model=OOD_MODEL, temperature=OOD_TEMPERATURE)
-        verdict = (llm.invoke(_PROMPT.format_messages(q=q)).content or "").strip().lower()
-        if verdict == "in":
-            return {"branch": "in", "method": "llm"}
-        return {
-            "branch": "out",
-            "answer": "죄송해요. 해당 문의는 요리·레시피·조리·보관·영양 주제에 한해 답변해 드려요.",
-            "method": "llm",
-        }
+        gw = get_llm_gateway()
+        llm = gw.chat(OOD_MODEL, OOD_TEMPERATURE)
+        return _llm_verdict((gw.invoke(llm, _PROMPT.format_messages(q=q)).content or "").strip().lower())
     except Exception:
         # On error, be permissive
         return {"branch": "in", "method": "error-permissive"}
+
+
+async def aood_guard(query: str) -> Dict[str, Any]:
+    """Async ood_guard: moderation via the async client, query embedding via aembed_query, LLM via ainvoke."""
+    q = (query or "").strip()
+    if not q:
+        return _empty_query()
+
+    mod = _moderation_verdict(await aget_moderation_report(q))
+    if mod:
+        return mod
+
+    # 예문 행렬은 저장된 .npy를 mmap (없을 때만 1회 임베딩 후 저장)
+    scorer = await run_blocking(_load_scorer)
+    if scorer is not None:
+        try:
+            emb = get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+            verdict = _embed_verdict(await emb.aembed_query(q), scorer)
+            if verdict is not None:
+                return verdict
+        except Exception:
+            pass
+
+    if USE_FAKE_LLM:
+        return {"branch": "in", "method": "fake"}
+
+    try:
+        gw = get_llm_gateway()
+        llm = gw.chat(OOD_MODEL, OOD_TEMPERATURE)
+        return _llm_verdict(((await gw.ainvoke(llm, _PROMPT.format_messages(q=q))).content or "").strip().lower())
+    except Exception:
+        return {"branch": "in", "method": "error-permissive"}
@@ -4,28 +4,42 @@
 Grounding verifier that judges whether an answer is grounded in the retrieved
 documents. Returns a branch label among: 'grounded', 'notGrounded', 'notSure'.
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
 
 from config.settings import JUDGE_MODEL, USE_FAKE_LLM, DEBUG_RAW
 from utils.verifier_ce import verify_answer_with_ce
+from utils.async_runtime import run_blocking
+from utils.llm_gateway import get_llm_gateway
 
 
-def relevance_check_node(answer: str, docs: List[str]) -> Dict[str, Any]:
-    """Judge grounding of an answer against docs and return branch verdict.
+_JUDGE_PROMPT = PromptTemplate.from_template(
+    """당신은 '답변'의 근거성을 판단하는 평가자입니다.
 
-    Args:
-        answer: Generated answer string.
-        docs: List of retrieved context strings.
+아래 '답변' 내용이 '문서' 근거에 충실한지 구분하세요.
 
-    Returns:
-        Dict with keys: 'branch' in {'grounded','notGrounded','notSure'}
-    """
-    context = "\n\n".join(docs or [])
+답변:
+{answer}
+
+문서:
+{context}
+
+판정 기준:
+- grounded: 핵심 사실(재료, 분량, 조리 단계/시간, 온도 등)이 문서에 근거하고 있음. 상식 정리, 구조화, 표현 개선은 허용.
+- notGrounded: 핵심 재료/조리 관계가 문서에 없거나 문서와 다른 지시/지식/설명이 있음. 문서와 모순되는 내용 포함.
+- notSure: 문서가 불충분해 나머지를 추론해야 하거나, 문서가 질문과 간접적으로만 관련. 확신이 어려운 경우.
+
+아래 중 하나만 출력하세요: 'grounded' | 'notGrounded' | 'notSure'
+설명은 출력하지 마세요."""
+)
 
+
+_VERDICTS = {"grounded": "grounded", "notgrounded": "notGrounded", "notsure": "notSure"}
+
+
+def _precheck(answer: str, docs: List[str], context: str) -> Optional[Dict[str, Any]]:
+    """Verdicts that need no model (fake mode, empty docs); None otherwise."""
     # Fake/deterministic mode for tests/CI
     if USE_FAKE_LLM:
         if not docs or not context.strip() or not (answer or "").strip():
@@ -37,6 +51,29 @@ def relevance_check_node(answer: str, docs: List[str]) -> Dict[str, Any]:
     # If no docs, we cannot judge confidently
     if not docs or not context.strip():
         return {"branch": "notSure", "metrics": {"support_rate": 0.0, "supported": 0, "total": 0}}
+    return None
+
+
+def _map_verdict(verdict: str) -> Dict[str, Any]:
+    if verdict not in _VERDICTS:
+        verdict = "notsure"
+    return {"branch": _VERDICTS.get(verdict, "notSure"), "metrics": {}}
+
+
+def relevance_check_node(answer: str, docs: List[str]) -> Dict[str, Any]:
+    """Judge grounding of an answer against docs and return branch verdict.
+
+    Args:
+        answer: Generated answer string.
+        docs: List of retrieved context strings.
+
+    Returns:
+        Dict with keys: 'branch' in {'grounded','notGrounded','notSure'}
+    """
+    context = "\n\n".join(docs or [])
+    early = _precheck(answer, docs, context)
+    if early is not None:
+        return early
 
     # Try CE-based verifier first
     try:
@@ -47,41 +84,46 @@ def relevance_check_node(answer: str, docs: List[str]) -> Dict[str, Any]:
         if DEBUG_RAW:
             print(f"verifier_ce fallback to LLM: {_e}")
 
-    prompt = PromptTemplate.from_template(
-        """당신은 '답변'의 근거성을 판단하는 평가자입니다.
+    gw = get_llm_gateway()
+    llm = gw.chat(JUDGE_MODEL, 0)
 
-아래 '답변' 내용이 '문서' 근거에 충실한지 구분하세요.
+    try:
+        verdict = (gw.invoke(llm, _JUDGE_PROMPT.format(answer=answer, context=context)).content or "").strip().lower()
+        if DEBUG_RAW:
+            print(f"\n=== JUDGE DEBUG ===\nVerdict: {verdict}\nAns: {answer[:200]}...\nCtx: {context[:300]}...\n===================\n")
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"relevance_check_invoke_error: {e}")
+        verdict = "notsure"
 
-답변:
-{answer}
+    return _map_verdict(verdict)
 
-문서:
-{context}
 
-판정 기준:
-- grounded: 핵심 사실(재료, 분량, 조리 단계/시간, 온도 등)이 문서에 근거하고 있음. 상식 정리, 구조화, 표현 개선은 허용.
-- notGrounded: 핵심 재료/조리 관계가 문서에 없거나 문서와 다른 지시/지식/설명이 있음. 문서와 모순되는 내용 포함.
-- notSure: 문서가 불충분해 나머지를 추론해야 하거나, 문서가 질문과 간접적으로만 관련. 확신이 어려운 경우.
+async def arelevance_check_node(answer: str, docs: List[str]) -> Dict[str, Any]:
+    """Async relevance_check_node: the cross-encoder runs on the shared CE service, the LLM judge via ainvoke."""
+    context = "\n\n".join(docs or [])
+    early = _precheck(answer, docs, context)
+    if early is not None:
+        return early
 
-아래 중 하나만 출력하세요: 'grounded' | 'notGrounded' | 'notSure'
-설명은 출력하지 마세요."""
-    )
+    try:
+        # CE 채점은 공유 CE 서비스 스레드에서 micro-batch로 실행, 여기서는 대기만 → I/O 풀
+        ce_res = await run_blocking(verify_answer_with_ce, answer, docs)
+        if ce_res and isinstance(ce_res, dict):
+            return {"branch": ce_res.get("branch", "notSure"), "metrics": ce_res}
+    except Exception as _e:
+        if DEBUG_RAW:
+            print(f"verifier_ce fallback to LLM: {_e}")
 
-    llm = ChatOpenAI(model=JUDGE_MODEL, temperature=0)
-    judge_chain = prompt | llm | StrOutputParser()
+    gw = get_llm_gateway()
+    llm = gw.chat(JUDGE_MODEL, 0)
 
     try:
-        verdict = (judge_chain.invoke({"answer": answer, "context": context}) or "").strip().lower()
-        if DEBUG_RAW:
-            print(f"\n=== JUDGE DEBUG ===\nVerdict: {verdict}\nAns: {answer[:200]}...\nCtx: {context[:300]}...\n===================\n")
+        prompt = _JUDGE_PROMPT.format(answer=answer, context=context)
+        verdict = ((await gw.ainvoke(llm, prompt)).content or "").strip().lower()
     except Exception as e:
         if DEBUG_RAW:
             print(f"relevance_check_invoke_error: {e}")
         verdict = "notsure"
 
-    if verdict not in ("grounded", "notgrounded", "notsure"):
-        verdict = "notsure"
-
-    map_back = {"grounded": "grounded", "notgrounded": "notGrounded", "notsure": "notSure"}
-    return {"branch": map_back.get(verdict, "notSure"), "metrics": {}}
-
+    return _map_verdict(verdict)
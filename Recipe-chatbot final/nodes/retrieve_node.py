@@ -1,6 +1,8 @@
 """Retrieve Node - Hybrid Search (Vector + BM25) with MMR and basic filtering"""
 from typing import Dict, Any, List
 import re
+import threading
+import time
 from urllib.parse import urlparse
 
 from config.settings import (
@@ -15,10 +17,16 @@ from config.settings import (
     HYBRID_ALPHA,
     HYBRID_K_RRF,
     HYBRID_FETCH_K,
+    RETRIEVAL_CACHE_ENABLED,
+    RETRIEVAL_CACHE_VERSION_INTERVAL,
+    VECTOR_BACKEND,
     DEBUG_RAW,
 )
-from utils.vectorstore import get_vectorstore
+from utils.vectorstore import get_vectorstore, storage_stamp
 from utils.hybrid_retriever import get_hybrid_retriever
+from utils.embedding_cache import normalize_text
+from utils.retrieval_cache import get_retrieval_cache
+from utils.async_runtime import run_blocking
 
 
 def _extract_image_url_from_meta(meta: dict) -> str | None:
@@ -69,6 +77,74 @@ def _extract_url_from_meta(meta: dict) -> str | None:
     return None
 
 
+def _extract_parent_id(meta: dict) -> str:
+    # 같은 레시피에서 나온 청크 묶음 키: parent_id 메타데이터, 없으면 출처 URL / 제목
+    if not meta:
+        return ""
+    for key in ("parent_id", "recipe_id", "doc_id"):
+        val = meta.get(key)
+        if val not in (None, ""):
+            return str(val)
+    return _extract_url_from_meta(meta) or _extract_title_from_meta(meta) or ""
+
+
+_version_lock = threading.Lock()
+_version_memo = None  # (계산 시각, 버전)
+
+
+def index_version():
+    """컬렉션 이름/문서 수 + Chroma 저장소 stamp + 내보낸 dense store fingerprint + BM25 manifest stamp
+    (바뀌면 검색 결과/답변 캐시 전체 무효화)
+
+    count()와 stat 호출을 요청마다 하지 않도록 RETRIEVAL_CACHE_VERSION_INTERVAL초 동안 재사용
+    (ingest는 별도 프로세스이므로 그 시간만큼 늦게 반영될 수 있음)"""
+    global _version_memo
+    memo = _version_memo
+    if memo is not None and time.monotonic() - memo[0] < RETRIEVAL_CACHE_VERSION_INTERVAL:
+        return memo[1]
+    with _version_lock:
+        memo = _version_memo
+        if memo is not None and time.monotonic() - memo[0] < RETRIEVAL_CACHE_VERSION_INTERVAL:
+            return memo[1]
+        version = _index_version()
+        _version_memo = (time.monotonic(), version)
+        return version
+
+
+def _index_version():
+    vectorstore = get_vectorstore()
+    collection = getattr(vectorstore, "_collection", None)
+    name = getattr(collection, "name", None)
+    count = collection.count() if collection is not None else 0
+    # 문서 수가 같은 제자리 재임베딩/문서 수정도 SQLite 파일 mtime/크기로 감지
+    stored = storage_stamp() if collection is not None else None
+    export = (getattr(vectorstore, "manifest", None) or {}).get("fingerprint")
+    bm25 = get_hybrid_retriever().index_version() if USE_HYBRID_SEARCH else None
+    return (name, count, stored, export, bm25)
+
+
+def _cache_key(query: str, k: int) -> tuple:
+    return (
+        normalize_text(query), int(k), VECTOR_BACKEND,
+        USE_HYBRID_SEARCH, HYBRID_ALPHA, HYBRID_K_RRF, HYBRID_FETCH_K,
+        RERANK_MMR, MMR_FETCH, MMR_LAMBDA,
+        MIN_DOC_LEN, SIMILARITY_THRESHOLD, DOMAIN_CAP,
+    )
+
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+    """정상 검색 결과만 캐시 (빈 결과, hybrid 실패 후 vector fallback, leg 시간 초과/오류 제외)"""
+    if result.get("branch") != "has_docs":
+        return False
+    if USE_HYBRID_SEARCH and result.get("score_mode") != "hybrid_rrf":
+        return False
+    legs = result.get("hybrid_legs") or {}
+    return all(
+        (legs.get(name) or {}).get("status") in (None, "ok")
+        for name in ("dense", "sparse")
+    )
+
+
 def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
     """
     Retrieve Node: Hybrid Search (Vector + BM25) 또는 Vector Search
@@ -81,8 +157,41 @@ def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
         Dict containing:
             - retrieved_docs: 검색된 문서 리스트
             - retrieved_scores: 유사도 점수 리스트
+            - retrieved_meta: 문서별 title / url / parent_id (같은 레시피 청크 묶음 키)
             - branch: "has_docs" | "no_docs"
+            - hybrid_legs: Dense/Sparse leg별 상태와 소요시간 (hybrid 검색 시)
+            - cache_hit: 검색 결과 캐시에서 반환했는지 여부
     """
+    if not RETRIEVAL_CACHE_ENABLED or not query or not query.strip():
+        return _retrieve(query, k)
+
+    try:
+        version = index_version()
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"retrieve_cache_version_error: {e}")
+        return _retrieve(query, k)
+
+    cache = get_retrieval_cache()
+    key = _cache_key(query, k)
+    cached = cache.get(key, version)
+    if cached is not None:
+        cached["cache_hit"] = True
+        return cached
+
+    result = _retrieve(query, k)
+    if _cacheable(result):
+        cache.put(key, version, result)
+    return result
+
+
+async def aretrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
+    """Async retrieve_node: Chroma에는 async 클라이언트가 없으므로 검색 전체를 I/O 풀에서 실행"""
+    return await run_blocking(retrieve_node, query, k)
+
+
+def _retrieve(query: str, k: int) -> Dict[str, Any]:
+    """캐시를 거치지 않는 실제 검색 (retrieve_node 참고)"""
     # Local copy to avoid scope issues
     debug_mode = DEBUG_RAW
 
@@ -96,12 +205,13 @@ def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
 
     # Hybrid Search vs Pure Vector Search
     use_hybrid = USE_HYBRID_SEARCH  # Local copy to avoid reassignment issues
+    hybrid_legs = None  # leg별 상태/소요시간 (hybrid일 때만)
 
     if use_hybrid:
         # Hybrid Search (Dense + Sparse BM25)
         try:
             retriever = get_hybrid_retriever()
-            hybrid_results = retriever.hybrid_search(
+            hybrid_results, hybrid_legs = retriever.hybrid_search_detailed(
                 query=query,
                 k=k,
                 alpha=HYBRID_ALPHA,
@@ -161,7 +271,8 @@ def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
         return {
             "retrieved_docs": [],
             "retrieved_scores": [],
-            "branch": "no_docs"
+            "branch": "no_docs",
+            "hybrid_legs": hybrid_legs,
         }
 
     # 문서와 점수 분리
@@ -198,6 +309,7 @@ def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
         metas.append({
             "title": _extract_title_from_meta(meta) or "",
             "url": _extract_url_from_meta(meta) or "",
+            "parent_id": _extract_parent_id(meta),
         })
 
     # If some scores are missing (MMR path), try to backfill using a scored search
@@ -272,4 +384,6 @@ def retrieve_node(query: str, k: int = K_DEFAULT) -> Dict[str, Any]:
         "retrieved_images": images,
         "retrieved_meta": metas,
         "score_mode": score_mode,
+        "hybrid_legs": hybrid_legs,
+        "cache_hit": False,
     }
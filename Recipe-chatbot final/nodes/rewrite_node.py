@@ -1,15 +1,30 @@
 # -*- coding: utf-8 -*-
 """Rewrite Node - Query Rewriting"""
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
-
 from config.settings import REWRITE_MODEL, USE_FAKE_LLM
 from prompts.templates import REWRITE_PROMPT
 from utils.allergy import detect_triggers, extract_allergens, build_constraint_text
+from utils.llm_gateway import get_llm_gateway
+
+
+REWRITE_TEMPERATURE = 0.5
 
 
-# Rewrite Chain
-rewrite_chain = REWRITE_PROMPT | ChatOpenAI(model=REWRITE_MODEL, temperature=0.5) | StrOutputParser()
+def _augment_constraints(query: str, recent_context: str = "") -> str:
+    """최근 맥락에서 추론한 알레르기/대체 제약 문구를 질의 뒤에 덧붙임"""
+    combined = (recent_context or "").strip()
+    augment = ""
+    if combined:
+        if detect_triggers(query + "\n" + combined):
+            allergens = extract_allergens(query + "\n" + combined)
+            ctext = build_constraint_text(allergens)
+            if ctext:
+                augment = f"\n\n{ctext}"
+    elif detect_triggers(query):
+        allergens = extract_allergens(query)
+        ctext = build_constraint_text(allergens)
+        if ctext:
+            augment = f"\n\n{ctext}"
+    return f"{query}{augment}"
 
 
 def rewrite_node(query: str, recent_context: str = "") -> str:
@@ -24,39 +39,32 @@ def rewrite_node(query: str, recent_context: str = "") -> str:
     """
     # Fake mode: just return the original (with optional constraints)
     if USE_FAKE_LLM:
-        combined = (recent_context or "").strip()
-        augment = ""
-        if combined:
-            if detect_triggers(query + "\n" + combined):
-                allergens = extract_allergens(query + "\n" + combined)
-                ctext = build_constraint_text(allergens)
-                if ctext:
-                    augment = f"\n\n{ctext}"
-        elif detect_triggers(query):
-            allergens = extract_allergens(query)
-            ctext = build_constraint_text(allergens)
-            if ctext:
-                augment = f"\n\n{ctext}"
-        return f"{query}{augment}".strip()
+        return _augment_constraints(query, recent_context).strip()
 
     try:
         # Augment with allergy/substitution constraints inferred from recent context
-        combined = (recent_context or "").strip()
-        augment = ""
-        if combined:
-            if detect_triggers(query + "\n" + combined):
-                allergens = extract_allergens(query + "\n" + combined)
-                ctext = build_constraint_text(allergens)
-                if ctext:
-                    augment = f"\n\n{ctext}"
-        elif detect_triggers(query):
-            allergens = extract_allergens(query)
-            ctext = build_constraint_text(allergens)
-            if ctext:
-                augment = f"\n\n{ctext}"
+        final_query = _augment_constraints(query, recent_context)
+        gw = get_llm_gateway()
+        llm = gw.chat(REWRITE_MODEL, REWRITE_TEMPERATURE)
+        rewritten = (gw.invoke(llm, REWRITE_PROMPT.format(query=final_query)).content or "").strip()
+        return rewritten if rewritten else query
+    except Exception as e:
+        from config.settings import DEBUG_RAW
+        if DEBUG_RAW:
+            print(f"rewrite_error: {e}")
+        return query
+
 
-        final_query = f"{query}{augment}"
-        rewritten = rewrite_chain.invoke({"query": final_query}).strip()
+async def arewrite_node(query: str, recent_context: str = "") -> str:
+    """rewrite_node의 async 버전 (ainvoke)"""
+    if USE_FAKE_LLM:
+        return _augment_constraints(query, recent_context).strip()
+
+    try:
+        final_query = _augment_constraints(query, recent_context)
+        gw = get_llm_gateway()
+        llm = gw.chat(REWRITE_MODEL, REWRITE_TEMPERATURE)
+        rewritten = ((await gw.ainvoke(llm, REWRITE_PROMPT.format(query=final_query))).content or "").strip()
         return rewritten if rewritten else query
     except Exception as e:
         from config.settings import DEBUG_RAW
@@ -3,13 +3,28 @@ from __future__ import annotations
 
 import json
 import re
+from pathlib import Path
 from typing import Dict, Any, Optional
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-
-from config.settings import ROUTER_MODEL, SUPPORTED_INTENTS, USE_FAKE_LLM
+from utils.llm_gateway import get_llm_gateway
+
+from config.settings import (
+    ROUTER_MODEL,
+    SUPPORTED_INTENTS,
+    USE_FAKE_LLM,
+    GUARD_EMBEDDING_MODEL,
+    LOCAL_INTENT_ROUTER,
+    INTENT_PROTOTYPES_PATH,
+    INTENT_ROUTER_MARGIN,
+    INTENT_ROUTER_MIN_SCORE,
+    PROTOTYPE_LOAD_RETRY_INTERVAL,
+    DEBUG_RAW,
+)
 from prompts.templates import ROUTER_PROMPT
+from utils import prototype_store
+from utils.async_runtime import run_blocking
+from utils.embedding_cache import get_cached_embeddings, guard_embeddings_enabled
 
 
 class _RouteSchema(BaseModel):
@@ -57,6 +72,88 @@ def _semantic_router_fallback(q: str) -> tuple[str, bool, str]:
     return intent, (intent != "out_of_domain"), "semantic_default"
 
 
+def _fake_route(query: str) -> Dict[str, Any]:
+    intent = "recipe" if _looks_in_domain(query) else "out_of_domain"
+    needs_retrieval = intent != "out_of_domain"
+    return {
+        "intent": intent,
+        "needs_retrieval": needs_retrieval,
+        "notes": "fake_router",
+    }
+
+
+def _finalize_route(query: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM 출력 검증/정규화 (지원하지 않는 intent는 키워드 fallback, OOD 오판은 휴리스틱으로 보정)"""
+    intent = (data.get("intent") or "").strip() if isinstance(data, dict) else ""
+    if intent not in SUPPORTED_INTENTS:
+        # apply semantic fallback when intent invalid or missing
+        s_intent, s_need, s_note = _semantic_router_fallback(query)
+        intent = s_intent
+        needs_retrieval = s_need
+        notes = (data.get("notes", "") if isinstance(data, dict) else "").strip()
+        notes = (notes + (" | " if notes else "") + s_note).strip()
+        return {"intent": intent, "needs_retrieval": needs_retrieval, "notes": notes}
+
+    needs_retrieval = bool(data.get("needs_retrieval", True))
+    notes = (data.get("notes", "") or "").strip()
+
+    # Heuristic override if LLM says out_of_domain but looks like cooking
+    if intent == "out_of_domain" and _looks_in_domain(query):
+        s_intent, s_need, s_note = _semantic_router_fallback(query)
+        intent = s_intent if s_intent in SUPPORTED_INTENTS else "recipe"
+        needs_retrieval = s_need
+        notes = (notes + " | overridden_from_ood_by_heuristic").strip()
+
+    return {"intent": intent, "needs_retrieval": needs_retrieval, "notes": notes}
+
+
+@prototype_store.cache_loaded(PROTOTYPE_LOAD_RETRY_INTERVAL)
+def _intent_classifier() -> Optional[prototype_store.PrototypeClassifier]:
+    """intent_prototypes.json 임베딩 행렬 (버전별 .npy가 없으면 1회 임베딩 후 저장)
+    실패(임베딩 API 일시 오류 등)는 캐시하지 않고 PROTOTYPE_LOAD_RETRY_INTERVAL초 뒤 다시 시도"""
+    if not guard_embeddings_enabled():
+        return None
+    try:
+        path = Path(INTENT_PROTOTYPES_PATH)
+        labels, texts = prototype_store.load_labeled(path, "intents")
+        keep = [i for i, label in enumerate(labels) if label in SUPPORTED_INTENTS]
+        if not keep:
+            return None
+        labels, texts = [labels[i] for i in keep], [texts[i] for i in keep]
+        matrix = prototype_store.load_or_build(
+            path, GUARD_EMBEDDING_MODEL, labels, texts, get_cached_embeddings(GUARD_EMBEDDING_MODEL)
+        )
+        return prototype_store.PrototypeClassifier(matrix, labels)
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"intent_classifier_load_error: {e}")
+        return None
+
+
+def _local_route(q_vec) -> Optional[Dict[str, Any]]:
+    """확신(top1-top2 margin)이 충분하면 로컬 분류 결과, 아니면 None (→ LLM 라우터)"""
+    clf = _intent_classifier()
+    if clf is None or q_vec is None:
+        return None
+    res = clf.classify(q_vec)
+    if res["margin"] < INTENT_ROUTER_MARGIN or res["score"] < INTENT_ROUTER_MIN_SCORE:
+        return None
+    intent = res["label"]
+    return {
+        "intent": intent,
+        "needs_retrieval": intent != "out_of_domain",
+        "notes": f"local_router(score={res['score']:.3f}, margin={res['margin']:.3f})",
+    }
+
+
+def _parsed_route(result: Dict[str, Any]) -> Dict[str, Any]:
+    """include_raw=True 결과에서 파싱된 스키마 추출 (실패 시 예외 → JSON fallback)"""
+    parsed = result.get("parsed")
+    if parsed is None:
+        raise ValueError(result.get("parsing_error") or "router: no structured output")
+    return parsed.dict()
+
+
 def router_node(query: str, context: str = "") -> Dict[str, Any]:
     """
     Router Node: 질의 의도 분류 (구조화 출력 기반)
@@ -65,32 +162,33 @@ def router_node(query: str, context: str = "") -> Dict[str, Any]:
     """
     # Fake/deterministic mode for tests/CI
     if USE_FAKE_LLM:
-        intent = "recipe" if _looks_in_domain(query) else "out_of_domain"
-        needs_retrieval = intent != "out_of_domain"
-        return {
-            "intent": intent,
-            "needs_retrieval": needs_retrieval,
-            "notes": "fake_router",
-        }
+        return _fake_route(query)
+
+    # Try 0) Local prototype classifier (맥락이 붙은 질의는 LLM이 판단)
+    if LOCAL_INTENT_ROUTER and not context:
+        try:
+            if _intent_classifier() is not None:
+                local = _local_route(get_cached_embeddings(GUARD_EMBEDDING_MODEL).embed_query(query))
+                if local is not None:
+                    return _finalize_route(query, local)
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"local_router_error: {e}")
 
     q_for_router = query if not context else f"{query}\n\n[참고맥락]\n{context}"
 
     # Try 1) Pydantic-structured output
     data: Dict[str, Any] = {}
+    gw = get_llm_gateway()
+    messages = ROUTER_PROMPT.format_messages(q=q_for_router)
     try:
-        llm_struct = ChatOpenAI(model=ROUTER_MODEL, temperature=0)
-        parser_llm = llm_struct.with_structured_output(_RouteSchema)
-        res: _RouteSchema = parser_llm.invoke(ROUTER_PROMPT.format_messages(q=q_for_router))
-        data = res.dict()
+        parser_llm = gw.chat(ROUTER_MODEL, 0).with_structured_output(_RouteSchema, include_raw=True)
+        data = _parsed_route(gw.invoke(parser_llm, messages, model=ROUTER_MODEL))
     except Exception:
         # Try 2) JSON object forced response_format
         try:
-            llm_json = ChatOpenAI(
-                model=ROUTER_MODEL,
-                temperature=0,
-                model_kwargs={"response_format": {"type": "json_object"}},
-            )
-            raw = llm_json.invoke(ROUTER_PROMPT.format_messages(q=q_for_router)).content or "{}"
+            llm_json = gw.chat(ROUTER_MODEL, 0, model_kwargs={"response_format": {"type": "json_object"}})
+            raw = gw.invoke(llm_json, messages).content or "{}"
             data = json.loads(raw)
         except Exception as e:
             from config.settings import DEBUG_RAW
@@ -98,26 +196,42 @@ def router_node(query: str, context: str = "") -> Dict[str, Any]:
                 print(f"router_structured_error: {e}")
             data = {}
 
-    # Validate and normalize
-    intent = (data.get("intent") or "").strip() if isinstance(data, dict) else ""
-    if intent not in SUPPORTED_INTENTS:
-        # apply semantic fallback when intent invalid or missing
-        s_intent, s_need, s_note = _semantic_router_fallback(query)
-        intent = s_intent
-        needs_retrieval = s_need
-        notes = (data.get("notes", "") if isinstance(data, dict) else "").strip()
-        notes = (notes + (" | " if notes else "") + s_note).strip()
-        return {"intent": intent, "needs_retrieval": needs_retrieval, "notes": notes}
+    return _finalize_route(query, data)
 
-    needs_retrieval = bool(data.get("needs_retrieval", True))
-    notes = (data.get("notes", "") or "").strip()
 
-    # Heuristic override if LLM says out_of_domain but looks like cooking
-    if intent == "out_of_domain" and _looks_in_domain(query):
-        s_intent, s_need, s_note = _semantic_router_fallback(query)
-        intent = s_intent if s_intent in SUPPORTED_INTENTS else "recipe"
-        needs_retrieval = s_need
-        notes = (notes + " | overridden_from_ood_by_heuristic").strip()
+async def arouter_node(query: str, context: str = "") -> Dict[str, Any]:
+    """router_node의 async 버전 (ainvoke, 이벤트 루프를 막지 않음)"""
+    if USE_FAKE_LLM:
+        return _fake_route(query)
 
-    return {"intent": intent, "needs_retrieval": needs_retrieval, "notes": notes}
+    if LOCAL_INTENT_ROUTER and not context:
+        try:
+            # 첫 호출은 프로토타입 로드/임베딩 → 블로킹 풀에서
+            if await run_blocking(_intent_classifier) is not None:
+                local = _local_route(await get_cached_embeddings(GUARD_EMBEDDING_MODEL).aembed_query(query))
+                if local is not None:
+                    return _finalize_route(query, local)
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"local_router_error: {e}")
+
+    q_for_router = query if not context else f"{query}\n\n[참고맥락]\n{context}"
+
+    data: Dict[str, Any] = {}
+    gw = get_llm_gateway()
+    messages = ROUTER_PROMPT.format_messages(q=q_for_router)
+    try:
+        parser_llm = gw.chat(ROUTER_MODEL, 0).with_structured_output(_RouteSchema, include_raw=True)
+        data = _parsed_route(await gw.ainvoke(parser_llm, messages, model=ROUTER_MODEL))
+    except Exception:
+        try:
+            llm_json = gw.chat(ROUTER_MODEL, 0, model_kwargs={"response_format": {"type": "json_object"}})
+            raw = (await gw.ainvoke(llm_json, messages)).content or "{}"
+            data = json.loads(raw)
+        except Exception as e:
+            from config.settings import DEBUG_RAW
+            if DEBUG_RAW:
+                print(f"router_structured_error: {e}")
+            data = {}
 
+    return _finalize_route(query, data)
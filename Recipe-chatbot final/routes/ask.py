@@ -1,18 +1,37 @@
+import json
+
 from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from config.schemas import AskRequest
-from services.pipeline import run_pipeline
+from services.pipeline import iter_pipeline_events, run_pipeline_async
 
 
 router = APIRouter()
 
 
 @router.post("/ask")
-def ask(req: AskRequest):
-    return run_pipeline(req)
+async def ask(req: AskRequest):
+    return await run_pipeline_async(req)
+
+
+@router.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """Server-sent events: stage -> sources -> token ... -> final (same payload as /ask)."""
+
+    async def _events():
+        async for event, data in iter_pipeline_events(req):
+            payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+            yield f"event: {event}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/query")
-def query(req: AskRequest):
+async def query(req: AskRequest):
     # frontend helper route mapping to the same pipeline
-    return run_pipeline(req)
-
+    return await run_pipeline_async(req)
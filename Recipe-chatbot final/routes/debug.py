@@ -6,6 +6,12 @@ from nodes.retrieve_node import retrieve_node
 from nodes.context_builder_node import build_context_node
 from utils.auto_ask_runner import start_background_job, load_questions
 from nodes.ood_guard_node import get_moderation_report
+from utils.embedding_cache import embedding_cache_stats
+from utils.retrieval_cache import get_retrieval_cache
+from utils.llm_gateway import get_llm_gateway
+from utils.answer_cache import get_answer_cache
+from utils.ce_service import ce_service_stats
+from utils.crag_gate import get_crag_gate
 
 
 router = APIRouter()
@@ -116,3 +122,39 @@ def debug_auto_ask_run():
 def debug_moderation(query: str):
     rep = get_moderation_report(query)
     return rep or {"flagged": False, "categories": {}, "category_scores": {}}
+
+
+@router.get("/debug/embedding_cache")
+def debug_embedding_cache():
+    """Embedding cache hit/miss counters (api_calls = embedding round trips actually made)."""
+    return embedding_cache_stats()
+
+
+@router.get("/debug/retrieval_cache")
+def debug_retrieval_cache():
+    """retrieve_node result cache counters (invalidations = drops after a collection / BM25 index change)."""
+    return get_retrieval_cache().stats()
+
+
+@router.get("/debug/answer_cache")
+def debug_answer_cache():
+    """Semantic answer cache counters (invalidations = drops after an index / prompt template change)."""
+    return get_answer_cache().stats()
+
+
+@router.get("/debug/llm_gateway")
+def debug_llm_gateway():
+    """Per-model LLM call counters: latency percentiles, token usage, retries, throttle wait."""
+    return get_llm_gateway().stats()
+
+
+@router.get("/debug/ce_service")
+def debug_ce_service():
+    """Shared cross-encoder micro-batching counters (queue depth, batch sizes, wait / inference time)."""
+    return ce_service_stats()
+
+
+@router.get("/debug/crag_gate")
+def debug_crag_gate():
+    """CRAG confidence gate counters (skip rate, audited skips, disagreement rate vs the judge)."""
+    return get_crag_gate().stats()
@@ -1,8 +1,10 @@
 """Pipeline service for the main RAG flow."""
 from __future__ import annotations
 
+import asyncio
+import functools
 import re
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
 from config.settings import (
     SCORE_THRESHOLD,
     ALLOW_NO_CONTEXT_ANSWER,
@@ -12,19 +14,30 @@ from config.settings import (
     MMR_LAMBDA,
     SIMILARITY_THRESHOLD,
     DOMAIN_CAP,
+    SPECULATIVE_FRONT_STAGE,
+    SPECULATIVE_CRAG,
+    SPECULATIVE_CRAG_MAX_SCORE,
+    STREAM_VERIFY,
+    ANSWER_CACHE_ENABLED,
+    GUARD_EMBEDDING_MODEL,
 )
 from config.schemas import AskRequest
 from utils.conversation_memory import memory_manager
 
-from nodes.router_node import router_node
-from nodes.rewrite_node import rewrite_node
-from nodes.retrieve_node import retrieve_node
+from nodes.router_node import arouter_node
+from nodes.rewrite_node import arewrite_node
+from nodes.retrieve_node import aretrieve_node, index_version
 from nodes.context_builder_node import build_context_with_images
-from nodes.generate_node_v2 import generate_with_history, extract_target_dish
-from nodes.relevance_check_node import relevance_check_node
-from nodes.ood_guard_node import ood_guard
+from nodes.generate_node_v2 import agenerate_with_history, extract_target_dish
+from nodes.relevance_check_node import arelevance_check_node
+from nodes.ood_guard_node import aood_guard
 from config.settings import USE_CE_RERANK, CE_MODEL, CE_TOPN, DEBUG_RAW, LOWCONF_MODE, MIN_CONF_DOCS
 from utils.reranker import rerank_pairs
+from utils.async_runtime import run_blocking, run_sync
+from utils.answer_cache import get_answer_cache, prompt_version
+from utils.embedding_cache import get_cached_embeddings
+from utils.crag_gate import get_crag_gate, normalized_scores
+from utils.verifier_ce import start_stream_check
 
 
 def _sanitize_answer_links(answer: str, sources: list[dict]) -> tuple[str, list[str]]:
@@ -137,10 +150,77 @@ def _should_skip_ood_short_followup(query: str, session_id: str) -> bool:
         return False
 
 
+def _discard(task: Optional[asyncio.Future]) -> bool:
+    """Cancel a speculative task whose result is no longer needed; True if it was in flight or finished unused."""
+    if task is None:
+        return False
+    if not task.done():
+        task.cancel()
+    # 취소/실패 결과를 소비해 'exception was never retrieved' 경고 방지
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return True
+
+
+async def _corrective_retrieve(query: str, context_text: str, k: int) -> Tuple[str, dict]:
+    """CRAG 2차 패스의 앞부분 (1차 context 기반 rewrite → 재검색)."""
+    rewritten = await arewrite_node(query, context_text)
+    return rewritten, await aretrieve_node(rewritten, k)
+
+
 def run_pipeline(req: AskRequest) -> dict:
-    """Execute the end-to-end RAG pipeline and return the API response payload."""
+    """Synchronous entry point (background runners, scripts); drives run_pipeline_async."""
+    return run_sync(run_pipeline_async(req))
+
+
+async def iter_pipeline_events(req: AskRequest) -> AsyncIterator[Tuple[str, Any]]:
+    """Run the pipeline and yield (event, data) as it progresses.
+
+    Events: ``stage`` ({stage, ...}), ``sources`` ({sources, image_urls}) once the
+    context is selected, ``token`` ({text}) while the main answer is generated,
+    then ``final`` with the full response payload (or ``error``).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(
+        run_pipeline_async(req, emit=lambda event, data: queue.put_nowait((event, data)))
+    )
+    task.add_done_callback(lambda _t: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+        try:
+            yield "final", task.result()
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"pipeline_stream_error: {e}")
+            yield "error", {"message": "응답 생성 중 오류가 발생했습니다."}
+    finally:
+        # client disconnected mid-stream
+        _discard(task)
+
+
+async def run_pipeline_async(
+    req: AskRequest,
+    emit: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
+    """Execute the end-to-end RAG pipeline and return the API response payload.
+
+    ``emit(event, data)`` (optional) receives progress events for streaming;
+    see iter_pipeline_events.
+    """
     original_query = req.query
     pipeline_steps: list[str] = []
+
+    def _emit(event: str, **data) -> None:
+        if emit is None:
+            return
+        try:
+            emit(event, data)
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"pipeline_emit_error: {e}")
     # Image controls
     include_images: bool = getattr(req, "include_images", True)
     image_policy: str = getattr(req, "image_policy", "strict")  # strict | lenient | always
@@ -194,7 +274,7 @@ def run_pipeline(req: AskRequest) -> dict:
             allow_low_override = True
             _clear_pending_decision()
         elif user_decision == "clarify":
-            clarify_text = generate_with_history(
+            clarify_text = await agenerate_with_history(
                 query=req.query,
                 intent="clarify",
                 context="clarify_mode",
@@ -258,10 +338,25 @@ def run_pipeline(req: AskRequest) -> dict:
                 "suggested_actions": ["proceed_with_low_confidence", "clarify"],
             }
 
+    # 0~2) Speculative front stage: OOD guard, router, rewrite는 모두 원문 질문에만 의존하므로 동시에 시작.
+    # 가드가 out이거나 라우터가 clarify-first/out_of_domain/검색 불필요로 판단하면 rewrite 결과는 버림.
+    ood_task = asyncio.ensure_future(aood_guard(original_query))
+    route_task = rewrite_task = None
+    if SPECULATIVE_FRONT_STAGE:
+        route_task = asyncio.ensure_future(arouter_node(original_query))
+        if req.enable_rewrite:
+            rewrite_task = asyncio.ensure_future(arewrite_node(original_query))
+
+    def _speculation_wasted() -> None:
+        wasted = [_discard(route_task), _discard(rewrite_task)]
+        if any(wasted):
+            pipeline_steps.append("speculation_wasted")
+
     # 0) Pre-router OOD guard (fast keyword + small LLM)
     try:
-        ood = ood_guard(original_query)
+        ood = await ood_task
         pipeline_steps.append("ood_guard")
+        _emit("stage", stage="ood_guard", branch=ood.get("branch"))
         if (not _should_skip_ood_short_followup(original_query, session_id)) and ood.get("branch") == "out":
             answer = ood.get(
                 "answer",
@@ -289,18 +384,28 @@ def run_pipeline(req: AskRequest) -> dict:
                 "conversation_turns": len(conversation_history) // 2,
                 "sources": [],
             }
+            _speculation_wasted()
             memory_manager.add_message(session_id, "user", original_query)
             memory_manager.add_message(session_id, "assistant", answer, {"intent": "out_of_domain"})
             return response
     except Exception:
         # best-effort; continue to router on any error
         pass
+    except BaseException:
+        # 요청 취소(CancelledError) 등: 미리 시작한 router/rewrite 태스크도 정리
+        _speculation_wasted()
+        raise
 
     # 1) Router
-    route = router_node(original_query)
+    try:
+        route = await route_task if route_task is not None else await arouter_node(original_query)
+    except BaseException:
+        _discard(rewrite_task)
+        raise
     intent = route["intent"]
     needs_retrieval = route["needs_retrieval"]
     pipeline_steps.append("router")
+    _emit("stage", stage="router", intent=intent, needs_retrieval=needs_retrieval)
 
     # 1.5) Clarify-First branch for short/ambiguous queries
     def _needs_clarify_first(q: str, intent_label: str) -> bool:
@@ -325,7 +430,9 @@ def run_pipeline(req: AskRequest) -> dict:
         return False
 
     if _needs_clarify_first(original_query, intent):
-        clarify_text = generate_with_history(
+        if _discard(rewrite_task):
+            pipeline_steps.append("speculation_wasted")
+        clarify_text = await agenerate_with_history(
             query=original_query,
             intent="clarify",
             context="clarify_mode",
@@ -366,6 +473,8 @@ def run_pipeline(req: AskRequest) -> dict:
 
     # OOD
     if intent == "out_of_domain":
+        if _discard(rewrite_task):
+            pipeline_steps.append("speculation_wasted")
         response = {
             "answer": "죄송해요. 요리·레시피·조리·재료·보관·영양 관련 질문에만 답할 수 있어요.",
             "retrieved_count": 0,
@@ -387,11 +496,61 @@ def run_pipeline(req: AskRequest) -> dict:
         )
         return response
 
+    # 1.8) Semantic answer cache: 대화 이력 없는 질문만 조회/저장 (이력이 있으면 답변이 맥락에 따라 달라짐)
+    # 쿼리 임베딩은 OOD guard가 방금 계산한 값이 임베딩 캐시에서 재사용됨
+    cache_vec = None
+    cache_scope = None
+    # k / enable_rewrite는 검색 문서(→ 답변)를 바꾸므로 키에 포함
+    cache_variant = (req.model, req.k, bool(req.enable_rewrite), include_images, image_policy, max_images)
+    cache_dish = ""
+    if ANSWER_CACHE_ENABLED and needs_retrieval and not conversation_history and not allow_low_override:
+        hit = None
+        try:
+            cache_vec = await get_cached_embeddings(GUARD_EMBEDDING_MODEL).aembed_query(original_query)
+            cache_scope = (await run_blocking(index_version), prompt_version(), GUARD_EMBEDDING_MODEL)
+            cache_dish = extract_target_dish(original_query)
+            hit = get_answer_cache().get(cache_vec, intent, cache_variant, cache_dish, cache_scope)
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"answer_cache_lookup_error: {e}")
+            cache_vec = None
+        if hit is not None:
+            response, similarity, cached_query = hit
+            if _discard(rewrite_task):
+                pipeline_steps.append("speculation_wasted")
+            pipeline_steps.append("answer_cache")
+            _emit("stage", stage="answer_cache", similarity=similarity)
+            _emit("sources", sources=response.get("sources", []), image_urls=response.get("image_urls", []))
+            response.update({
+                "router": route,
+                "original_query": original_query,
+                "pipeline": pipeline_steps,
+                "session_id": session_id,
+                "is_new_session": is_new_session,
+                "history_used": False,
+                "conversation_turns": len(conversation_history) // 2,
+                "answer_cache": {"hit": True, "similarity": similarity, "cached_query": cached_query},
+            })
+            memory_manager.add_message(session_id, "user", original_query)
+            memory_manager.add_message(
+                session_id,
+                "assistant",
+                response.get("answer", ""),
+                {"intent": intent, "context_found": True, "used_docs": response.get("used_docs", 0), "answer_cache": True},
+            )
+            return response
+
     # 2) (optional) Rewrite
     query_for_search = original_query
     if req.enable_rewrite and needs_retrieval:
-        query_for_search = rewrite_node(original_query)
-        pipeline_steps.append("rewrite")
+        if rewrite_task is not None:
+            query_for_search = await rewrite_task
+            pipeline_steps.extend(["rewrite", "speculation_used"])
+        else:
+            query_for_search = await arewrite_node(original_query)
+            pipeline_steps.append("rewrite")
+    elif _discard(rewrite_task):
+        pipeline_steps.append("speculation_wasted")
 
     # 3) Retrieve
     retrieve_result = {
@@ -401,8 +560,9 @@ def run_pipeline(req: AskRequest) -> dict:
         "branch": "no_docs",
     }
     if needs_retrieval:
-        retrieve_result = retrieve_node(query_for_search, req.k)
+        retrieve_result = await aretrieve_node(query_for_search, req.k)
         pipeline_steps.append("retrieve")
+        _emit("stage", stage="retrieve", count=len(retrieve_result.get("retrieved_docs") or []))
 
     docs = retrieve_result["retrieved_docs"]
     scores = retrieve_result["retrieved_scores"]
@@ -415,7 +575,8 @@ def run_pipeline(req: AskRequest) -> dict:
     if USE_CE_RERANK and docs:
         try:
             topn = min(len(docs), max(1, int(CE_TOPN)))
-            order = rerank_pairs(original_query, docs[:topn], topn=topn, model_name=CE_MODEL)
+            # CE 연산은 공유 CE 서비스 스레드에서 → 여기서는 결과 대기만 (I/O 풀, 요청 간 micro-batching)
+            order = await run_blocking(rerank_pairs, original_query, docs[:topn], topn=topn, model_name=CE_MODEL)
 
             # Reorder docs/images/scores/metas for topn chunk, then append the rest
             def _reorder(lst, default_val=None):
@@ -433,12 +594,18 @@ def run_pipeline(req: AskRequest) -> dict:
             if DEBUG_RAW: 
                 print(f"where hint: {e}")
 
+    # CRAG gate 특징용: 문서 텍스트 → (검색 점수, parent_id) (이후 SCORE_THRESHOLD 필터는 metas를 함께 거르지 않음)
+    doc_signals = {
+        d: (s, m.get("parent_id") if isinstance(m, dict) else None)
+        for d, s, m in zip(docs, scores, list(metas) + [None] * (len(docs) - len(metas)))
+    }
+
     # 3.5) Clarify branch when no documents found
     if needs_retrieval and not docs:
         pipeline_steps.append("clarify")
 
         # Generate concise clarification questions
-        answer = generate_with_history(
+        answer = await agenerate_with_history(
             query=original_query,
             intent="clarify",
             context="clarify_mode",  # non-empty to avoid no-context refusal
@@ -530,184 +697,294 @@ def run_pipeline(req: AskRequest) -> dict:
         except Exception as e:
             if DEBUG_RAW:
                 print(f"source_align_error: {e}")
-            
-
-    # 5) Generate with history
-    answer = generate_with_history(
-        query=original_query,
-        intent=intent,
-        context=context_text,
-        conversation_history=conversation_history,
-        model=req.model,
-    )
-    pipeline_steps.append("generate")
 
-    # Heuristic image gating pre-judge
+        # 미리보기용: 답변 기반 이미지 게이팅 전이므로 final 이벤트의 image_urls가 최종값
+        _emit(
+            "sources",
+            sources=sources,
+            image_urls=[u for u in images if u][:max_images] if include_images else [],
+        )
+
+    # 4.5) Speculative CRAG: 2차 패스의 rewrite + 재검색은 원문 질문과 1차 context만 필요하므로,
+    # 1차 검색이 약해 보이면 1차 생성/판정과 동시에 시작. judge1이 notGrounded가 아니면 버림.
+    crag_task = None
     try:
-        from nodes.generate_node_v2 import extract_target_dish as _extract
+        if ENABLE_CRAG and SPECULATIVE_CRAG and docs:
+            try:
+                context_docs = 'selected_docs_texts' in locals() and selected_docs_texts or docs
+                top = normalized_scores([doc_signals.get(d, (None, None))[0] for d in context_docs], score_mode)
+                if not top or top[0] < SPECULATIVE_CRAG_MAX_SCORE:
+                    crag_task = asyncio.ensure_future(_corrective_retrieve(original_query, context_text, req.k))
+                    pipeline_steps.append("crag_speculation_started")
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"crag_speculation_error: {e}")
+
+        # 5) Generate with history
+        # Streaming grounding check: 생성 중 완성된 문장마다 CE 채점, 지지율이 바닥 아래면 생성을 취소하고 바로 보정 루프로
+        gen_task = None
+        stream_check = None
+        if ENABLE_CRAG and STREAM_VERIFY and docs:
+            try:
+                stream_check = await run_blocking(
+                    start_stream_check,
+                    'selected_docs_texts' in locals() and selected_docs_texts or docs,
+                    lambda: gen_task is not None and gen_task.cancel(),
+                )
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"stream_verify_error: {e}")
 
-        # Early exit if images disabled
-        if not include_images:
-            images = []
+        streamed: list[str] = []
+
+        def _on_token(piece: str) -> None:
+            streamed.append(piece)
+            _emit("token", text=piece)
+            stream_check.feed(piece)
+
+        if stream_check is not None:
+            on_token = _on_token
         else:
-            # Allowed intents gating (applies to strict and lenient)
-            allowed_image_intents = {"recipe", "dish_overview", "substitution", "storage"}
-            if image_policy in ("strict", "lenient") and intent not in allowed_image_intents:
+            on_token = (lambda piece: _emit("token", text=piece)) if emit else None
+        gen_task = asyncio.ensure_future(agenerate_with_history(
+            query=original_query,
+            intent=intent,
+            context=context_text,
+            conversation_history=conversation_history,
+            model=req.model,
+            on_token=on_token,
+        ))
+        try:
+            answer = await gen_task
+        except asyncio.CancelledError:
+            # on_abort가 gen_task만 취소한 경우가 아니면 (요청 자체 취소) 그대로 전파
+            if stream_check is None or not stream_check.aborted or not gen_task.cancelled():
+                raise
+            answer = "".join(streamed).strip()
+        finally:
+            # 요청 취소/예외로 빠져나갈 때 LLM 스트림이 남아 토큰을 계속 보내지 않도록
+            if not gen_task.done():
+                gen_task.cancel()
+            if stream_check is not None:
+                await stream_check.aclose()
+        stream_aborted = stream_check is not None and stream_check.aborted
+        pipeline_steps.append("generate_aborted" if stream_aborted else "generate")
+        _emit("stage", stage="generate", aborted=stream_aborted)
+
+        # Heuristic image gating pre-judge
+        try:
+            from nodes.generate_node_v2 import extract_target_dish as _extract
+
+            # Early exit if images disabled
+            if not include_images:
                 images = []
             else:
-                # dish-based and CRAG gating only for strict
-                if image_policy == "strict":
-                    dish = _extract(answer) or _extract(original_query)
-                    if dish and 'selected_docs_texts' in locals() and images:
-                        filtered = [
-                            url
-                            for doc_text, url in zip(selected_docs_texts, images)
-                            if url and isinstance(doc_text, str) and dish in doc_text
-                        ]
-                        if filtered:
-                            images = filtered
-
-                    final_verdict = None
-                    if 'judge_verdict_2' in locals() and judge_verdict_2:
-                        final_verdict = judge_verdict_2
-                    elif 'judge_verdict_1' in locals() and judge_verdict_1:
-                        final_verdict = judge_verdict_1
-
-                    if ENABLE_CRAG and final_verdict and final_verdict != "grounded":
-                        images = []
-                    elif not dish:
-                        images = []
-    except Exception as e:
-        if DEBUG_RAW:
-            print(f"where hint: {e}")
-
-    # CRAG verifier + corrective loop
-    judge_verdict_1 = None
-    judge_verdict_2 = None
-    corrected = False
-    final_pass = 1
-    # Ensure verifier metrics always defined for response payload
-    verifier_metrics_1 = {}
-    verifier_metrics_2 = {}
-
-    if ENABLE_CRAG and docs:
-        # Prefer the exact texts used to build context for judging if available
-        # CRAG 판정 후 처리
-        judge_inputs = 'selected_docs_texts' in locals() and selected_docs_texts or docs
-        judge_result_1 = relevance_check_node(answer, judge_inputs)
-        judge_verdict_1 = judge_result_1.get("branch")
-        verifier_metrics_1 = judge_result_1.get("metrics", {})
-        # 문서 조회 속도
-        support_rate = verifier_metrics_1.get("support_rate", 0)
-        # 신뢰도 수준
-        confidence_level = verifier_metrics_1.get("confidence_level", "unknown")
-        pipeline_steps.append("judge1")
-
-        # Not Sure 확장 (세분화)
-        should_correct = (
-            judge_verdict_1 == "notGrounded" 
-            or (judge_verdict_1 == "notSure" and confidence_level in ("very_weak", "weak")) 
-            or (judge_verdict_1 == "notSure" and support_rate < 0.30))
-        correction_reason = ""
-
-        if judge_verdict_1 == "notGrounded":
-            rewritten2 = rewrite_node(original_query, context_text)
-            pipeline_steps.append("rewrite2")
-
-            retrieve_result2 = retrieve_node(rewritten2, req.k)
-            pipeline_steps.append("retrieve2")
-
-            docs2 = retrieve_result2.get("retrieved_docs", [])
-            scores2 = retrieve_result2.get("retrieved_scores", [])
-            images2 = retrieve_result2.get("retrieved_images", [])
-            branch2 = retrieve_result2.get("branch", "no_docs")
-
-            context_text2 = ""
-            if docs2:
-                try:
-                    if (
-                        scores2
-                        and len(scores2) == len(docs2)
-                        and SCORE_THRESHOLD
-                        and SCORE_THRESHOLD > 0
-                    ):
-                        paired2 = [
-                            (d, i, s)
-                            for d, i, s in zip(docs2, images2, scores2)
-                            if (s is not None and s >= SCORE_THRESHOLD)
-                        ]
-                        if paired2:
-                            docs2, images2, scores2 = [list(x) for x in zip(*paired2)]
-                except Exception as e:
-                    if DEBUG_RAW:
-                        print(f"where hint: {e}")
-
-                context_text2, selected_images2, selected_docs_texts2 = build_context_with_images(
-                    docs2, images2
-                )
-                images2 = selected_images2
-                pipeline_steps.append("context_builder2")
-
-            answer2 = generate_with_history(
-                query=original_query,
-                intent=intent,
-                context=context_text2,
-                conversation_history=conversation_history,
-                model=req.model,
-            )
-            pipeline_steps.append("generate2")
+                # Allowed intents gating (applies to strict and lenient)
+                allowed_image_intents = {"recipe", "dish_overview", "substitution", "storage"}
+                if image_policy in ("strict", "lenient") and intent not in allowed_image_intents:
+                    images = []
+                else:
+                    # dish-based and CRAG gating only for strict
+                    if image_policy == "strict":
+                        dish = _extract(answer) or _extract(original_query)
+                        if dish and 'selected_docs_texts' in locals() and images:
+                            filtered = [
+                                url
+                                for doc_text, url in zip(selected_docs_texts, images)
+                                if url and isinstance(doc_text, str) and dish in doc_text
+                            ]
+                            if filtered:
+                                images = filtered
+
+                        final_verdict = None
+                        if 'judge_verdict_2' in locals() and judge_verdict_2:
+                            final_verdict = judge_verdict_2
+                        elif 'judge_verdict_1' in locals() and judge_verdict_1:
+                            final_verdict = judge_verdict_1
+
+                        if ENABLE_CRAG and final_verdict and final_verdict != "grounded":
+                            images = []
+                        elif not dish:
+                            images = []
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"where hint: {e}")
 
+        # CRAG verifier + corrective loop
+        judge_verdict_1 = None
+        judge_verdict_2 = None
+        corrected = False
+        final_pass = 1
+        # Ensure verifier metrics always defined for response payload
+        verifier_metrics_1 = {}
+        verifier_metrics_2 = {}
+
+        if ENABLE_CRAG and docs:
+            # Prefer the exact texts used to build context for judging if available
+            # CRAG 판정 후 처리
+            judge_inputs = 'selected_docs_texts' in locals() and selected_docs_texts or docs
+            # Confidence gate: 검색 점수 / 같은 레시피 청크 수 / 답변-문서 n-gram 겹침으로 grounded 확률 예측
+            gate = get_crag_gate()
+            gate_decision = None
             try:
-                from nodes.generate_node_v2 import extract_target_dish as _extract
-                # Apply policy again for pass2
-                if not include_images:
-                    images2 = []
+                if not stream_aborted:
+                    signals = [doc_signals.get(d, (None, None)) for d in judge_inputs]
+                    gate_decision = gate.evaluate(
+                        answer, judge_inputs, [sg[0] for sg in signals], [sg[1] for sg in signals], score_mode
+                    )
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"crag_gate_error: {e}")
+            if stream_aborted:
+                # 생성 중 이미 notGrounded로 판정 (채점한 문장 기준), judge 생략
+                judge_result_1 = {"branch": "notGrounded", "metrics": stream_check.metrics()}
+            elif gate_decision and gate_decision["skip"]:
+                judge_result_1 = {
+                    "branch": "grounded",
+                    "metrics": {
+                        "gated": True,
+                        "gate_p": gate_decision["p"],
+                        "gate_features": gate_decision["features"],
+                        "confidence_level": "high",
+                    },
+                }
+                # 생략한 판정 일부는 응답과 무관하게 백그라운드에서 judge 실행 (오프라인 감사)
+                gate.record_skipped(gate_decision, functools.partial(arelevance_check_node, answer, judge_inputs))
+            else:
+                judge_result_1 = await arelevance_check_node(answer, judge_inputs)
+                gate.record_judged(gate_decision, judge_result_1.get("branch"))
+                if gate_decision:
+                    judge_result_1.setdefault("metrics", {})["gate_p"] = gate_decision["p"]
+            judge_verdict_1 = judge_result_1.get("branch")
+            verifier_metrics_1 = judge_result_1.get("metrics", {})
+            # 문서 조회 속도
+            support_rate = verifier_metrics_1.get("support_rate", 0)
+            # 신뢰도 수준
+            confidence_level = verifier_metrics_1.get("confidence_level", "unknown")
+            gated = bool(verifier_metrics_1.get("gated"))
+            pipeline_steps.append("judge1_skipped" if gated or stream_aborted else "judge1")
+            _emit("stage", stage="judge1", verdict=judge_verdict_1, gated=gated)
+
+            # Not Sure 확장 (세분화)
+            should_correct = (
+                judge_verdict_1 == "notGrounded" 
+                or (judge_verdict_1 == "notSure" and confidence_level in ("very_weak", "weak")) 
+                or (judge_verdict_1 == "notSure" and support_rate < 0.30))
+            correction_reason = ""
+
+            if judge_verdict_1 == "notGrounded":
+                # 스트리밍된 1차 답변은 final 이벤트의 2차 답변으로 교체됨
+                _emit("stage", stage="correcting")
+                if crag_task is not None:
+                    # 1차 생성/판정 동안 미리 실행한 rewrite + 재검색 결과 사용
+                    rewritten2, retrieve_result2 = await crag_task
+                    crag_task = None
+                    pipeline_steps.extend(["rewrite2", "retrieve2", "crag_speculation_used"])
                 else:
-                    allowed_image_intents = {"recipe", "dish_overview", "substitution", "storage"}
-                    if image_policy in ("strict", "lenient") and intent not in allowed_image_intents:
+                    rewritten2 = await arewrite_node(original_query, context_text)
+                    pipeline_steps.append("rewrite2")
+
+                    retrieve_result2 = await aretrieve_node(rewritten2, req.k)
+                    pipeline_steps.append("retrieve2")
+
+                docs2 = retrieve_result2.get("retrieved_docs", [])
+                scores2 = retrieve_result2.get("retrieved_scores", [])
+                images2 = retrieve_result2.get("retrieved_images", [])
+                branch2 = retrieve_result2.get("branch", "no_docs")
+
+                context_text2 = ""
+                if docs2:
+                    try:
+                        if (
+                            scores2
+                            and len(scores2) == len(docs2)
+                            and SCORE_THRESHOLD
+                            and SCORE_THRESHOLD > 0
+                        ):
+                            paired2 = [
+                                (d, i, s)
+                                for d, i, s in zip(docs2, images2, scores2)
+                                if (s is not None and s >= SCORE_THRESHOLD)
+                            ]
+                            if paired2:
+                                docs2, images2, scores2 = [list(x) for x in zip(*paired2)]
+                    except Exception as e:
+                        if DEBUG_RAW:
+                            print(f"where hint: {e}")
+
+                    context_text2, selected_images2, selected_docs_texts2 = build_context_with_images(
+                        docs2, images2
+                    )
+                    images2 = selected_images2
+                    pipeline_steps.append("context_builder2")
+
+                answer2 = await agenerate_with_history(
+                    query=original_query,
+                    intent=intent,
+                    context=context_text2,
+                    conversation_history=conversation_history,
+                    model=req.model,
+                )
+                pipeline_steps.append("generate2")
+
+                try:
+                    from nodes.generate_node_v2 import extract_target_dish as _extract
+                    # Apply policy again for pass2
+                    if not include_images:
                         images2 = []
                     else:
-                        if image_policy == "strict":
-                            dish2 = _extract(answer2) or _extract(original_query)
-                            if dish2 and 'selected_docs_texts2' in locals() and images2:
-                                filtered2 = [
-                                    url
-                                    for doc_text, url in zip(selected_docs_texts2, images2)
-                                    if url and isinstance(doc_text, str) and dish2 in doc_text
-                                ]
-                                if filtered2:
-                                    images2 = filtered2
-
-                            final_verdict2 = None
-                            if 'judge_verdict_2' in locals() and judge_verdict_2:
-                                final_verdict2 = judge_verdict_2
-                            elif 'judge_verdict_1' in locals() and judge_verdict_1:
-                                final_verdict2 = judge_verdict_1
-
-                            if ENABLE_CRAG and final_verdict2 and final_verdict2 != "grounded":
-                                images2 = []
-                            elif not dish2:
-                                images2 = []
-            except Exception as e:
-                if DEBUG_RAW:
-                    print(f"where hint: {e}")
-
-            if docs2:
-                judge_inputs2 = 'selected_docs_texts2' in locals() and selected_docs_texts2 or docs2
-                judge_result_2 = relevance_check_node(answer2, judge_inputs2)
-                judge_verdict_2 = judge_result_2.get("branch")
-                verifier_metrics_2 = judge_result_2.get("metrics", {})
-                pipeline_steps.append("judge2")
-
-            # adopt pass 2
-            answer = answer2
-            docs = docs2
-            scores = scores2
-            images = images2
-            branch = branch2
-            context_text = context_text2
-            corrected = True
-            final_pass = 2
+                        allowed_image_intents = {"recipe", "dish_overview", "substitution", "storage"}
+                        if image_policy in ("strict", "lenient") and intent not in allowed_image_intents:
+                            images2 = []
+                        else:
+                            if image_policy == "strict":
+                                dish2 = _extract(answer2) or _extract(original_query)
+                                if dish2 and 'selected_docs_texts2' in locals() and images2:
+                                    filtered2 = [
+                                        url
+                                        for doc_text, url in zip(selected_docs_texts2, images2)
+                                        if url and isinstance(doc_text, str) and dish2 in doc_text
+                                    ]
+                                    if filtered2:
+                                        images2 = filtered2
+
+                                final_verdict2 = None
+                                if 'judge_verdict_2' in locals() and judge_verdict_2:
+                                    final_verdict2 = judge_verdict_2
+                                elif 'judge_verdict_1' in locals() and judge_verdict_1:
+                                    final_verdict2 = judge_verdict_1
+
+                                if ENABLE_CRAG and final_verdict2 and final_verdict2 != "grounded":
+                                    images2 = []
+                                elif not dish2:
+                                    images2 = []
+                except Exception as e:
+                    if DEBUG_RAW:
+                        print(f"where hint: {e}")
+
+                if docs2:
+                    judge_inputs2 = 'selected_docs_texts2' in locals() and selected_docs_texts2 or docs2
+                    judge_result_2 = await arelevance_check_node(answer2, judge_inputs2)
+                    judge_verdict_2 = judge_result_2.get("branch")
+                    verifier_metrics_2 = judge_result_2.get("metrics", {})
+                    pipeline_steps.append("judge2")
+
+                # adopt pass 2
+                answer = answer2
+                docs = docs2
+                scores = scores2
+                images = images2
+                branch = branch2
+                context_text = context_text2
+                corrected = True
+                final_pass = 2
+
+        if _discard(crag_task):
+            pipeline_steps.append("crag_speculation_wasted")
+        crag_task = None
+    finally:
+        # 예외/요청 취소로 중간에 빠져나가도 추측 실행한 rewrite + 재검색을 남기지 않음
+        _discard(crag_task)
 
    # Low-confidence detection (after judge and retrieval)
     low_confidence = False
@@ -771,7 +1048,7 @@ def run_pipeline(req: AskRequest) -> dict:
     # Respect explicit decision override from pending state
     if low_confidence and not (getattr(req, 'allow_low_confidence', False) or allow_low_override):
         try:
-            clarify_text = generate_with_history(
+            clarify_text = await agenerate_with_history(
                 query=original_query,
                 intent="clarify",
                 context="clarify_mode",
@@ -895,9 +1172,24 @@ def run_pipeline(req: AskRequest) -> dict:
             "unique_domains": len({(m.get("url") or "").split('/')[2] if (m.get("url") or "").startswith('http') else "" for m in metas}) if metas else 0,
             "verifier_metrics_1": verifier_metrics_1,
             "verifier_metrics_2": verifier_metrics_2,
+            "hybrid_legs": retrieve_result.get("hybrid_legs"),
+            "retrieval_cache_hit": bool(retrieve_result.get("cache_hit")),
         },
     }
 
+    # Cache only grounded, confident answers (without session history, see 1.8)
+    # CRAG gate로 judge를 생략한 답변은 실제로 검증되지 않았으므로 저장하지 않음
+    cache_verdict = judge_verdict_2 if corrected else judge_verdict_1
+    gated = bool(verifier_metrics_1.get("gated") or verifier_metrics_2.get("gated"))
+    if cache_vec is not None and docs and not low_confidence and not gated and cache_verdict == "grounded":
+        try:
+            get_answer_cache().put(
+                cache_vec, intent, cache_variant, cache_dish, cache_scope, original_query, response
+            )
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"answer_cache_store_error: {e}")
+
     # Debug fields
     # local import to avoid unused in prod
     if DEBUG_RAW:
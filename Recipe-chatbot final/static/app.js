@@ -4,6 +4,7 @@
    - 결정(저신뢰) 버튼 렌더
    - 이미지 갤러리
    - 출처 섹션 렌더
+   - 스트리밍 응답(/ask/stream, SSE) 점진 렌더
    ----------------------------------------------------------- */
 
 window.addEventListener("DOMContentLoaded", () => {
@@ -102,9 +103,41 @@ window.addEventListener("DOMContentLoaded", () => {
     return loader;
   }
 
+  const STAGE_LABELS = {
+    ood_guard: '질문 확인 중...',
+    router: '질문 분석 중...',
+    retrieve: '레시피 검색 중...',
+    generate: '답변 검증 중...',
+    judge1: '답변 검증 완료',
+    correcting: '답변 보정 중...',
+  };
+
+  function setLoaderStage(loader, stage) {
+    const label = STAGE_LABELS[stage];
+    if (!loader || !label) return;
+    let span = loader.querySelector('.stage-label');
+    if (!span) {
+      span = document.createElement('span');
+      span.className = 'stage-label ml-2 text-xs text-gray-500';
+      loader.appendChild(span);
+    }
+    span.textContent = label;
+  }
+
+  // Bot bubble filled progressively: answer text, status line, preview of sources/images
+  function startStreamingBubble() {
+    const bubble = addBubble('', 'bot');
+    const textEl = document.createElement('div');
+    const statusEl = document.createElement('div');
+    statusEl.className = 'mt-2 text-xs text-gray-500';
+    const extrasEl = document.createElement('div');
+    bubble.appendChild(textEl); bubble.appendChild(statusEl); bubble.appendChild(extrasEl);
+    return { bubble, textEl, statusEl, extrasEl };
+  }
+
   // 4) API
-  async function sendQuery(text, extra = {}) {
-    const body = {
+  function buildBody(text, extra = {}) {
+    return {
       query: text,
       session_id: sessionId,
       k: 10,
@@ -114,15 +147,57 @@ window.addEventListener("DOMContentLoaded", () => {
       max_images: maxImagesInput ? Math.max(0, Math.min(12, parseInt(maxImagesInput.value || '5', 10))) : 5,
       ...extra,
     };
+  }
+
+  async function sendQuery(text, extra = {}) {
     const res = await fetch("/ask", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(body),
+      body: JSON.stringify(buildBody(text, extra)),
     });
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
     return await res.json();
   }
 
+  // SSE over POST: handlers = { onStage, onSources, onToken }; resolves with the final payload (same as /ask)
+  async function sendQueryStream(text, handlers = {}, extra = {}) {
+    const res = await fetch("/ask/stream", {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+      body: JSON.stringify(buildBody(text, extra)),
+    });
+    if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let finalData = null;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buffer.indexOf("\n\n")) >= 0) {
+        const block = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+        let event = "message";
+        const dataLines = [];
+        block.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+        });
+        if (!dataLines.length) continue;
+        const data = JSON.parse(dataLines.join("\n"));
+        if (event === "stage" && handlers.onStage) handlers.onStage(data);
+        else if (event === "sources" && handlers.onSources) handlers.onSources(data);
+        else if (event === "token" && handlers.onToken) handlers.onToken(data.text || "");
+        else if (event === "final") finalData = data;
+        else if (event === "error") throw new Error(data.message || "stream error");
+      }
+    }
+    if (!finalData) throw new Error("stream ended without final event");
+    return finalData;
+  }
+
   // 5) Form handler
   if (chatForm) {
     chatForm.addEventListener("submit", async (e) => {
@@ -133,17 +208,55 @@ window.addEventListener("DOMContentLoaded", () => {
       addBubble(text, "user");
       userInput.value = ""; userInput.focus();
       const loader = addLoading();
+      let view = null;
+      let streamed = "";
+      const ensureView = () => {
+        if (!view) { loader.remove(); view = startStreamingBubble(); }
+        return view;
+      };
       try {
-        const data = await sendQuery(text);
+        let data;
+        try {
+          data = await sendQueryStream(text, {
+            onStage: (ev) => {
+              if (view) view.statusEl.textContent = STAGE_LABELS[ev.stage] || '';
+              else setLoaderStage(loader, ev.stage);
+            },
+            onSources: (ev) => {
+              const v = ensureView();
+              v.extrasEl.innerHTML = '';
+              try { if (Array.isArray(ev.sources) && ev.sources.length > 0) renderSources(v.extrasEl, ev.sources); } catch {}
+              try { if (Array.isArray(ev.image_urls) && ev.image_urls.length > 0) addImageGallery(ev.image_urls, v.extrasEl); } catch {}
+            },
+            onToken: (piece) => {
+              streamed += piece;
+              const v = ensureView();
+              v.textEl.innerHTML = formatMessage(streamed);
+              chatWindow.scrollTop = chatWindow.scrollHeight;
+            },
+          });
+        } catch (streamErr) {
+          // Nothing rendered yet: fall back to the non-streaming endpoint
+          if (view) throw streamErr;
+          console.warn('stream failed, falling back to /ask', streamErr);
+          data = await sendQuery(text);
+        }
         loader.remove();
         if (data.session_id) { sessionId = data.session_id; localStorage.setItem("recipe_rag_session_id", sessionId); }
         conversationTurns = data.conversation_turns || 0; updateSessionInfo();
-        const botBubble = addBubble(data.answer || "죄송해요. 답변을 생성하지 못했어요.");
+        // Final payload is authoritative (CRAG correction, low-confidence guidance, link sanitization)
+        const v = ensureView();
+        v.textEl.innerHTML = formatMessage(data.answer || "죄송해요. 답변을 생성하지 못했어요.");
+        v.statusEl.remove();
+        v.extrasEl.innerHTML = '';
+        const botBubble = v.bubble;
         try { if (data && data.decision_required) renderDecisionControls(botBubble, data); } catch {}
         try { if (Array.isArray(data.image_urls) && data.image_urls.length > 0) addImageGallery(data.image_urls); } catch {}
         try { if (Array.isArray(data.sources) && data.sources.length > 0) renderSources(botBubble, data.sources); } catch {}
       } catch (err) {
-        console.error(err); loader.remove(); addBubble("오류가 발생했어요. 잠시 후 다시 시도해 주세요.");
+        console.error(err); loader.remove();
+        if (view) view.statusEl.textContent = '';
+        addBubble("오류가 발생했어요. 잠시 후 다시 시도해 주세요.");
       }
     });
   }
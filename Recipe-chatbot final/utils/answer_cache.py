@@ -0,0 +1,214 @@
+"""Answer Cache - semantic LRU + TTL cache of final grounded pipeline responses
+
+Most traffic is the same few dishes asked in different words ("김치찌개 레시피",
+"김치찌개 만드는 법"). After the OOD guard, the pipeline embeds the query (an
+embedding-cache hit, since the guard just embedded the same text) and looks
+for a cached query whose cosine similarity clears ``ANSWER_CACHE_THRESHOLD``.
+A hit also needs the same router intent, the same request variant (model, k,
+rewrite flag, image options) and, when both queries name one, the same target
+dish. That last check guards against "김치찌개" vs "된장찌개" sitting close in
+embedding space.
+
+Query vectors live in one preallocated float32 matrix (one row per slot), so a
+lookup is a single matrix-vector product over all live entries. Entries are
+scoped by (index version, prompt-template fingerprint, query-embedding model);
+when any of them changes, the whole cache is dropped.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_THRESHOLD,
+)
+
+
+@lru_cache(maxsize=1)
+def prompt_version() -> str:
+    """Fingerprint of the router / rewrite / generation prompt templates."""
+    from prompts import templates
+
+    parts: List[str] = []
+    prompts = [templates.ROUTER_PROMPT, templates.REWRITE_PROMPT, templates.CLARIFY_PROMPT, templates.GENERAL_PROMPT]
+    prompts += [templates.PROMPT_BY_INTENT[name] for name in sorted(templates.PROMPT_BY_INTENT)]
+    for prompt in prompts:
+        messages = getattr(prompt, "messages", None) or [prompt]
+        for message in messages:
+            inner = getattr(message, "prompt", message)
+            parts.append(str(getattr(inner, "template", repr(inner))))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class _Entry:
+    __slots__ = ("stamp", "intent", "variant", "dish", "query", "payload")
+
+    def __init__(self, stamp: float, intent: str, variant: Hashable, dish: str, query: str, payload: Dict[str, Any]):
+        self.stamp = stamp
+        self.intent = intent
+        self.variant = variant
+        self.dish = dish
+        self.query = query
+        self.payload = payload
+
+
+class SemanticAnswerCache:
+    """Thread-safe semantic cache: vectorized cosine scan + LRU/TTL eviction + scope invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl)
+        self.threshold = float(threshold)
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first put
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # slot -> entry, LRU order
+        self._free: List[int] = []
+        self._used = 0  # rows [0, _used) have ever been assigned
+        self._scope: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+        self._invalidations = 0
+
+    def _sync_scope(self, scope: Hashable) -> None:
+        # caller holds the lock
+        if scope != self._scope:
+            if self._entries:
+                self._invalidations += 1
+            self._reset()
+            self._scope = scope
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._free = []
+        self._used = 0
+
+    def _drop(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._free.append(slot)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def get(
+        self,
+        vector,
+        intent: str,
+        variant: Hashable,
+        dish: str,
+        scope: Hashable,
+    ) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """(payload copy, similarity, cached query) of the best matching entry, or None."""
+        with self._lock:
+            self._sync_scope(scope)
+            hit = self._lookup(self._unit(vector), intent, variant, dish)
+            if hit is None:
+                self._misses += 1
+                return None
+            slot, sim = hit
+            self._entries.move_to_end(slot)
+            self._hits += 1
+            entry = self._entries[slot]
+            payload, query = entry.payload, entry.query
+        return copy.deepcopy(payload), sim, query
+
+    def _lookup(self, query: np.ndarray, intent: str, variant: Hashable, dish: str) -> Optional[Tuple[int, float]]:
+        # caller holds the lock
+        if not self._entries or self._matrix is None or query.shape[0] != self._matrix.shape[1]:
+            return None
+        sims = self._matrix[: self._used] @ query
+        candidates = np.flatnonzero(sims >= self.threshold)
+        now = time.monotonic()
+        for slot in candidates[np.argsort(-sims[candidates], kind="stable")]:
+            entry = self._entries.get(int(slot))
+            if entry is None:
+                continue
+            if self.ttl > 0 and now - entry.stamp > self.ttl:
+                self._drop(int(slot))
+                self._expired += 1
+                continue
+            if entry.intent != intent or entry.variant != variant:
+                continue
+            if dish and entry.dish and dish != entry.dish:
+                continue
+            return int(slot), float(sims[slot])
+        return None
+
+    def put(
+        self,
+        vector,
+        intent: str,
+        variant: Hashable,
+        dish: str,
+        scope: Hashable,
+        query: str,
+        payload: Dict[str, Any],
+    ) -> None:
+        if not self.max_entries:
+            return
+        unit = self._unit(vector)
+        stored = copy.deepcopy(payload)
+        with self._lock:
+            self._sync_scope(scope)
+            if self._matrix is None or self._matrix.shape[1] != unit.shape[0]:
+                self._matrix = np.zeros((self.max_entries, unit.shape[0]), dtype=np.float32)
+                self._reset()
+            # replace a near-identical entry of the same variant instead of duplicating it
+            existing = self._lookup(unit, intent, variant, dish)
+            if existing is not None and existing[1] >= 0.999:
+                slot = existing[0]
+            elif self._free:
+                slot = self._free.pop()
+            elif self._used < self.max_entries:
+                slot = self._used
+                self._used += 1
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+            self._matrix[slot] = unit
+            self._entries[slot] = _Entry(time.monotonic(), intent, variant, dish, query, stored)
+            self._entries.move_to_end(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else None,
+                "evictions": self._evictions,
+                "expired": self._expired,
+                "invalidations": self._invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> SemanticAnswerCache:
+    """Process-wide answer cache."""
+    return SemanticAnswerCache()
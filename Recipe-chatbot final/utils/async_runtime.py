@@ -0,0 +1,104 @@
+"""Async runtime helpers for the pipeline
+
+The async pipeline keeps network waits (OpenAI chat / embeddings / moderation)
+on the event loop and pushes everything that would block it to executors:
+
+- ``run_cpu``: CPU-bound work (Okt tokenization, BM25 scoring, local
+  embeddings) on a small pool sized to the cores, so it cannot starve the loop.
+- ``run_blocking``: blocking I/O without an async client (Chroma, retrieval
+  as a whole) and waits on the shared cross-encoder service, on a wider pool.
+- ``run_sync``: drive a coroutine from synchronous callers (auto-ask runner,
+  debug routes, scripts), also when the calling thread already runs a loop.
+  Each call runs on a fresh loop; per-loop resources registered with
+  ``on_loop_close`` (e.g. the LLM gateway's async HTTP clients) are closed
+  before that loop shuts down.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, TypeVar
+
+from config.settings import ASYNC_CPU_WORKERS, ASYNC_IO_WORKERS
+
+
+T = TypeVar("T")
+
+# run_sync가 만든 loop를 닫기 전에 그 loop 안에서 await할 정리 함수들
+_loop_close_hooks: List[Callable[[], Awaitable[None]]] = []
+
+
+@lru_cache(maxsize=1)
+def _cpu_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max(1, ASYNC_CPU_WORKERS), thread_name_prefix="pipeline-cpu")
+
+
+@lru_cache(maxsize=1)
+def _io_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max(1, ASYNC_IO_WORKERS), thread_name_prefix="pipeline-io")
+
+
+async def _run_in(executor: ThreadPoolExecutor, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-bound ``fn`` off the event loop."""
+    return await _run_in(_cpu_executor(), fn, *args, **kwargs)
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking-I/O ``fn`` off the event loop."""
+    return await _run_in(_io_executor(), fn, *args, **kwargs)
+
+
+def on_loop_close(hook: Callable[[], Awaitable[None]]) -> None:
+    """Register ``hook`` to be awaited on each ``run_sync`` loop right before it shuts down."""
+    if hook not in _loop_close_hooks:
+        _loop_close_hooks.append(hook)
+
+
+async def _closing_loop(coro: Awaitable[T]) -> T:
+    try:
+        return await coro
+    finally:
+        for hook in list(_loop_close_hooks):
+            try:
+                await hook()
+            except Exception:
+                pass  # 정리 실패가 결과/원래 예외를 가리지 않도록
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run ``coro`` to completion from synchronous code.
+
+    Uses ``asyncio.run`` when the thread has no running loop; otherwise the
+    coroutine runs on a fresh loop in a helper thread (blocking the caller,
+    as a sync call would). ``on_loop_close`` hooks run on that loop after
+    ``coro`` finishes.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_closing_loop(coro))
+
+    box: dict = {}
+
+    def _target() -> None:
+        try:
+            box["value"] = asyncio.run(_closing_loop(coro))
+        except BaseException as e:  # re-raised in the caller's thread
+            box["error"] = e
+
+    worker = threading.Thread(target=_target, name="run-sync", daemon=True)
+    worker.start()
+    worker.join()
+    if "error" in box:
+        raise box["error"]
+    return box["value"]
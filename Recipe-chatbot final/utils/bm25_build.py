@@ -0,0 +1,675 @@
+"""Parallel, paginated BM25 index builder (offline CLI + startup path).
+
+Pages through the Chroma collection with ``limit``/``offset`` instead of one
+``collection.get()`` of the whole corpus, tokenizes batches across a process
+pool (one Okt/JVM per worker process) and streams postings to spill files on
+disk. The spill is then scattered into the CSR layout of ``utils.bm25_store``
+chunk by chunk, so peak memory is bounded by the page size and the vocabulary,
+not by the corpus.
+
+Incremental updates (``update_index``) diff the collection's chunk IDs against
+the index, tokenize only new or re-upserted chunks into a small delta segment
+and tombstone deleted/replaced ones. ``merge_index`` folds the deltas back into
+a single base segment from the stored postings, without re-tokenizing.
+
+Usage (from the project root):
+    python -m utils.bm25_build                      # sync: delta when small, else full build
+    python -m utils.bm25_build --workers 8 --page-size 5000 --force
+    python -m utils.bm25_build --ids-file ingested_ids.txt    # re-tokenize re-upserted IDs
+    python -m utils.bm25_build --merge              # fold delta segments into the base
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils import bm25_store
+from utils.file_lock import build_lock
+from utils.index_publish import fsync_tree
+from utils.hybrid_retriever import KoreanTokenizer, okapi_idf, mean_raw_idf
+from config.settings import (
+    BM25_BUILD_WORKERS,
+    BM25_BUILD_PAGE_SIZE,
+    BM25_BUILD_BATCH_SIZE,
+    BM25_DELTA_MAX_RATIO,
+    BM25_MERGE_MAX_SEGMENTS,
+    BM25_MERGE_DELTA_RATIO,
+)
+
+
+K1, B, EPSILON = 1.5, 0.75, 0.25
+_SCATTER_CHUNK = 4_000_000  # postings per scatter step
+
+_WORKER_TOKENIZER = None
+
+
+def _init_worker(tokenizer_factory) -> None:
+    global _WORKER_TOKENIZER
+    _WORKER_TOKENIZER = tokenizer_factory()
+
+
+def _tokenize_batch(texts: List[str]) -> List[tuple]:
+    """Tokenize a batch in a worker; returns (terms, tfs, doc_len) per document."""
+    out = []
+    for text in texts:
+        tokens = _WORKER_TOKENIZER.tokenize(text or "")
+        counts = Counter(tokens)
+        out.append((list(counts.keys()), list(counts.values()), len(tokens)))
+    return out
+
+
+def _default_progress(msg: str) -> None:
+    print(msg, flush=True)
+
+
+class _SpillWriter:
+    """Append-only (term, doc, tf) posting triples, in document order."""
+
+    def __init__(self, directory: Path):
+        self.paths = {
+            "terms": directory / "spill.terms.bin",
+            "docs": directory / "spill.docs.bin",
+            "tfs": directory / "spill.tfs.bin",
+        }
+        self._fh = {k: open(p, "wb") for k, p in self.paths.items()}
+        self.count = 0
+
+    def write(self, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> None:
+        terms.astype(np.int32).tofile(self._fh["terms"])
+        docs.astype(np.int32).tofile(self._fh["docs"])
+        tfs.astype(np.float32).tofile(self._fh["tfs"])
+        self.count += int(terms.shape[0])
+
+    def close(self) -> None:
+        for fh in self._fh.values():
+            fh.close()
+
+    def remove(self) -> None:
+        for p in self.paths.values():
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+class _Accumulator:
+    """Parent-side state: global vocabulary, document frequencies, doc lengths."""
+
+    def __init__(self, spill: _SpillWriter):
+        self.vocab: Dict[str, int] = {}
+        self.df = np.zeros(1024, dtype=np.int64)
+        self.doc_len: List[int] = []
+        self.spill = spill
+
+    def add(self, tokenized: List[tuple]) -> None:
+        term_col: List[int] = []
+        doc_col: List[int] = []
+        tf_col: List[int] = []
+        for terms, tfs, length in tokenized:
+            doc_idx = len(self.doc_len)
+            self.doc_len.append(length)
+            for term, tf in zip(terms, tfs):
+                tid = self.vocab.setdefault(term, len(self.vocab))
+                term_col.append(tid)
+                doc_col.append(doc_idx)
+                tf_col.append(tf)
+        if not term_col:
+            return
+        terms_arr = np.asarray(term_col, dtype=np.int64)
+        if len(self.vocab) > self.df.shape[0]:
+            self.df = np.pad(self.df, (0, max(len(self.vocab), 2 * self.df.shape[0]) - self.df.shape[0]))
+        self.df += np.bincount(terms_arr, minlength=self.df.shape[0])
+        self.spill.write(terms_arr, np.asarray(doc_col), np.asarray(tf_col))
+
+
+def _scatter_postings(directory: Path, spill: _SpillWriter, remap: np.ndarray, indptr: np.ndarray) -> None:
+    """Counting-sort the document-ordered spill into term-major CSR arrays on disk."""
+    total = spill.count
+    doc_ids = np.lib.format.open_memmap(directory / "doc_ids.npy", mode="w+", dtype=np.int32, shape=(total,))
+    term_freqs = np.lib.format.open_memmap(directory / "term_freqs.npy", mode="w+", dtype=np.float32, shape=(total,))
+    fill = indptr[:-1].copy()
+
+    if total:
+        terms_mm = np.memmap(spill.paths["terms"], dtype=np.int32, mode="r")
+        docs_mm = np.memmap(spill.paths["docs"], dtype=np.int32, mode="r")
+        tfs_mm = np.memmap(spill.paths["tfs"], dtype=np.float32, mode="r")
+        for start in range(0, total, _SCATTER_CHUNK):
+            end = min(total, start + _SCATTER_CHUNK)
+            terms = remap[terms_mm[start:end]]
+            order = np.argsort(terms, kind="stable")  # keeps doc order within a term
+            terms = terms[order]
+            uniq, first, counts = np.unique(terms, return_index=True, return_counts=True)
+            rank = np.arange(terms.shape[0], dtype=np.int64) - np.repeat(first, counts)
+            pos = fill[terms] + rank
+            doc_ids[pos] = docs_mm[start:end][order]
+            term_freqs[pos] = tfs_mm[start:end][order]
+            fill[uniq] += counts
+        del terms_mm, docs_mm, tfs_mm
+
+    doc_ids.flush()
+    term_freqs.flush()
+    del doc_ids, term_freqs
+
+
+def _collection_pages(collection, total: int, page_size: int) -> Iterator[Tuple[list, list, list]]:
+    """(ids, documents, metadatas) pages of the whole collection via limit/offset."""
+    offset = 0
+    while offset < total:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        docs = page.get("documents") or []
+        if not docs:
+            break
+        yield page.get("ids") or [], docs, page.get("metadatas") or [{}] * len(docs)
+        offset += len(docs)
+
+
+def _id_pages(collection, ids: List[str], page_size: int) -> Iterator[Tuple[list, list, list]]:
+    """(ids, documents, metadatas) pages for an explicit list of chunk IDs."""
+    for i in range(0, len(ids), page_size):
+        page = collection.get(ids=ids[i:i + page_size], include=["documents", "metadatas"])
+        docs = page.get("documents") or []
+        if docs:
+            yield page.get("ids") or [], docs, page.get("metadatas") or [{}] * len(docs)
+
+
+def _write_segment(
+    seg_dir: Path,
+    pages: Iterable[Tuple[list, list, list]],
+    total: int,
+    label: str,
+    workers: int,
+    batch_size: int,
+    tokenizer_factory: Callable,
+    report: Callable[[str], None],
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Tokenize ``pages`` into one segment directory; returns (segment stats, chunk IDs)."""
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    spill = _SpillWriter(seg_dir)
+    acc = _Accumulator(spill)
+    ids_w = bm25_store.StringTableWriter(seg_dir, "ids")
+    texts_w = bm25_store.StringTableWriter(seg_dir, "texts")
+    metas_w = bm25_store.StringTableWriter(seg_dir, "metas")
+    digests: Dict[str, bytes] = {}
+
+    started = time.perf_counter()
+    report(f"[BM25] {label}: {total:,} docs, workers={workers}")
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),  # never fork a process that may already host a JVM
+            initializer=_init_worker,
+            initargs=(tokenizer_factory,),
+        )
+    else:
+        _init_worker(tokenizer_factory)
+
+    inflight: deque = deque()
+    max_inflight = 2 * workers
+
+    def _drain(limit: int) -> None:
+        while len(inflight) > limit:
+            fut = inflight.popleft()
+            acc.add(fut.result() if executor else fut)
+
+    try:
+        fetched = 0
+        for ids, docs, metas in pages:
+            ids_w.extend(ids)
+            texts_w.extend(d or "" for d in docs)
+            metas_w.extend(bm25_store.encode_meta(m) for m in metas)
+            for chunk_id, doc, meta in zip(ids, docs, metas):
+                digests[chunk_id] = bm25_store.doc_digest(doc, meta)
+
+            for i in range(0, len(docs), batch_size):
+                batch = docs[i:i + batch_size]
+                inflight.append(executor.submit(_tokenize_batch, batch) if executor else _tokenize_batch(batch))
+                _drain(max_inflight)
+
+            fetched += len(docs)
+            elapsed = max(1e-9, time.perf_counter() - started)
+            report(
+                f"[BM25] fetched {fetched:,}/{total:,} docs | tokenized {len(acc.doc_len):,} "
+                f"({len(acc.doc_len) / elapsed:,.0f} docs/s, {spill.count:,} postings)"
+            )
+        _drain(0)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        spill.close()
+        ids_w.close()
+        texts_w.close()
+        metas_w.close()
+
+    n_docs = len(acc.doc_len)
+    vocab_size = len(acc.vocab)
+    sorted_terms = sorted(acc.vocab)
+    old_ids = np.fromiter((acc.vocab[t] for t in sorted_terms), dtype=np.int64, count=vocab_size)
+    remap = np.empty(vocab_size, dtype=np.int64)
+    remap[old_ids] = np.arange(vocab_size, dtype=np.int64)
+    df = acc.df[:vocab_size][old_ids]
+    acc.vocab.clear()
+
+    indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+    np.cumsum(df, out=indptr[1:])
+    _scatter_postings(seg_dir, spill, remap, indptr)
+    spill.remove()
+
+    doc_len = np.asarray(acc.doc_len, dtype=np.float32)
+    np.save(seg_dir / "indptr.npy", indptr)
+    np.save(seg_dir / "doc_len.npy", doc_len)
+    np.save(seg_dir / "idf.npy", okapi_idf(df, n_docs, EPSILON))
+    bm25_store.write_strings(seg_dir, "vocab", sorted_terms)
+
+    stats = {
+        "name": seg_dir.name,
+        "doc_count": n_docs,
+        "vocab_size": vocab_size,
+        "postings": int(indptr[-1]),
+        "avgdl": float(doc_len.mean(dtype=np.float64)) if n_docs else 0.0,
+        "avg_idf": mean_raw_idf(df, n_docs),
+    }
+    return stats, digests
+
+
+def build_index(
+    collection,
+    index_dir: Path,
+    collection_name: Optional[str] = None,
+    workers: int = BM25_BUILD_WORKERS,
+    page_size: int = BM25_BUILD_PAGE_SIZE,
+    batch_size: int = BM25_BUILD_BATCH_SIZE,
+    tokenizer_factory: Callable = KoreanTokenizer,
+    progress: Optional[Callable[[str], None]] = _default_progress,
+) -> Optional[Path]:
+    """Build the on-disk BM25 index for ``collection`` and publish it to ``index_dir``.
+
+    Returns the published directory, or None when the collection is empty.
+    """
+    index_dir = Path(index_dir)
+    name = collection_name or getattr(collection, "name", None) or index_dir.name
+    report = progress or (lambda _msg: None)
+    total = int(collection.count())
+    if total <= 0:
+        report(f"[BM25] collection '{name}' is empty, nothing to build")
+        return None
+
+    workers = max(1, int(workers or 1))
+    page_size = max(1, int(page_size))
+    batch_size = max(1, int(batch_size))
+
+    started = time.perf_counter()
+    tmp = bm25_store.staging_dir(index_dir)
+    try:
+        stats, digests = _write_segment(
+            tmp / bm25_store.BASE_SEGMENT,
+            _collection_pages(collection, total, page_size),
+            total,
+            f"building '{name}' (page_size={page_size:,})",
+            workers,
+            batch_size,
+            tokenizer_factory,
+            report,
+        )
+        bm25_store.write_manifest(tmp, bm25_store.build_manifest(
+            collection=name,
+            doc_count=stats["doc_count"],
+            fingerprint=bm25_store.content_fingerprint(digests),
+            segments=[stats],
+            avg_idf=stats["avg_idf"],
+            k1=K1,
+            b=B,
+            epsilon=EPSILON,
+        ))
+        published = bm25_store.publish(tmp, index_dir)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    n_docs = stats["doc_count"]
+    elapsed = max(1e-9, time.perf_counter() - started)
+    report(
+        f"[BM25] done: {n_docs:,} docs, {stats['vocab_size']:,} terms, {stats['postings']:,} postings "
+        f"in {elapsed:.1f}s ({n_docs / elapsed:,.0f} docs/s) -> {published}"
+    )
+    return published
+
+
+def update_index(
+    collection,
+    index_dir: Path,
+    collection_name: Optional[str] = None,
+    upsert_ids: Optional[Iterable[str]] = None,
+    max_ratio: Optional[float] = None,
+    workers: int = BM25_BUILD_WORKERS,
+    page_size: int = BM25_BUILD_PAGE_SIZE,
+    batch_size: int = BM25_BUILD_BATCH_SIZE,
+    tokenizer_factory: Callable = KoreanTokenizer,
+    progress: Optional[Callable[[str], None]] = _default_progress,
+) -> Optional[Dict[str, int]]:
+    """Bring an existing index up to date with a delta segment (caller holds ``build_lock``).
+
+    Chunk IDs in the collection but not in the index are added; indexed IDs no
+    longer in the collection are tombstoned; ``upsert_ids`` (same ID, new
+    content) are tombstoned and re-tokenized. Returns a summary dict, or None
+    when there is no usable index or the change exceeds ``max_ratio`` of the
+    indexed documents (the caller should rebuild instead).
+    """
+    index_dir = Path(index_dir)
+    report = progress or (lambda _msg: None)
+    index = bm25_store.open_index(index_dir)
+    if index is None:
+        return None
+    manifest = index["manifest"]
+    name = collection_name or getattr(collection, "name", None) or index_dir.name
+    if manifest.get("collection") != name:
+        return None
+
+    page_size = max(1, int(page_size))
+    started = time.perf_counter()
+
+    # chunk ID -> (segment, local doc index) of its live copy
+    located: Dict[str, Tuple[int, int]] = {}
+    for s, (segment, dead) in enumerate(zip(index["segments"], index["tombstones"])):
+        dead_set = set(dead.tolist())
+        for i, chunk_id in enumerate(segment["ids"]):
+            if i not in dead_set:
+                located[chunk_id] = (s, i)
+
+    live = bm25_store.collection_digests(collection, page_size)
+    live_ids = list(live)
+    # 같은 ID로 본문/메타데이터만 바뀐 청크: 인덱스에 저장된 본문과 digest 비교로 감지 (upsert_ids 없이도)
+    changed = {
+        chunk_id
+        for chunk_id, (s, i) in located.items()
+        if chunk_id in live
+        and bm25_store.doc_digest(index["segments"][s]["texts"][i], index["segments"][s]["metas"][i]) != live[chunk_id]
+    }
+    upserts = changed.union(i for i in (upsert_ids or ()) if i in live)
+    added = [i for i in live_ids if i not in located or i in upserts]
+    removed = [i for i in located if i not in live]
+    replaced = [i for i in added if i in located]
+
+    changes = len(added) + len(removed)
+    if max_ratio is not None and changes > max_ratio * max(1, len(located)):
+        report(f"[BM25] {changes:,} changed docs exceed the delta limit, full rebuild needed")
+        return None
+
+    summary = {
+        "added": len(added) - len(replaced),
+        "updated": len(replaced),
+        "deleted": len(removed),
+        "doc_count": len(live_ids),
+    }
+    if not changes:
+        return summary
+
+    generation = int(manifest.get("generation", 0)) + 1
+    segments = [dict(info) for info in manifest["segments"]]
+    tombstones: Dict[str, set] = {k: set(v) for k, v in manifest.get("tombstones", {}).items()}
+    for chunk_id in removed + replaced:
+        s, i = located[chunk_id]
+        tombstones.setdefault(segments[s]["name"], set()).add(i)
+
+    tmp = None
+    if added:
+        seg_name = bm25_store.delta_segment_name(generation)
+        tmp = bm25_store.staging_dir(index_dir / seg_name)
+        try:
+            stats, _digests = _write_segment(
+                tmp,
+                _id_pages(collection, added, page_size),
+                len(added),
+                f"delta {seg_name}",
+                max(1, min(int(workers or 1), -(-len(added) // max(1, int(batch_size))))),
+                max(1, int(batch_size)),
+                tokenizer_factory,
+                report,
+            )
+            stats["name"] = seg_name
+            target = index_dir / seg_name
+            if target.exists() and seg_name not in {info["name"] for info in manifest["segments"]}:
+                # manifest 기록 전에 죽은 이전 실행이 남긴 세그먼트 (manifest가 참조하지 않음)
+                shutil.rmtree(target)
+            fsync_tree(tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        segments.append(stats)
+
+    bm25_store.write_manifest(index_dir, bm25_store.build_manifest(
+        collection=name,
+        doc_count=len(live_ids),
+        fingerprint=bm25_store.content_fingerprint(live),
+        segments=segments,
+        avg_idf=manifest.get("avg_idf", 0.0),
+        k1=manifest.get("k1", K1),
+        b=manifest.get("b", B),
+        epsilon=manifest.get("epsilon", EPSILON),
+        generation=generation,
+        tombstones={k: sorted(v) for k, v in tombstones.items()},
+    ))
+
+    elapsed = time.perf_counter() - started
+    report(
+        f"[BM25] delta generation {generation}: +{summary['added']:,} added, "
+        f"{summary['updated']:,} updated, {summary['deleted']:,} deleted in {elapsed:.1f}s"
+    )
+    return summary
+
+
+def should_merge(
+    manifest: Optional[Dict[str, Any]],
+    max_segments: int = BM25_MERGE_MAX_SEGMENTS,
+    delta_ratio: float = BM25_MERGE_DELTA_RATIO,
+) -> bool:
+    """True when delta segments/tombstones have grown enough to fold into the base."""
+    if not manifest or (len(manifest.get("segments", [])) <= 1 and not manifest.get("tombstones")):
+        return False
+    segments = manifest["segments"]
+    if len(segments) - 1 > max_segments:
+        return True
+    base_docs = max(1, int(segments[0]["doc_count"]))
+    delta_docs = sum(int(info["doc_count"]) for info in segments[1:])
+    dead = sum(len(v) for v in manifest.get("tombstones", {}).values())
+    return (delta_docs + dead) > delta_ratio * base_docs
+
+
+def merge_index(index_dir: Path, progress: Optional[Callable[[str], None]] = _default_progress) -> Optional[Path]:
+    """Fold all segments into a new base segment, dropping tombstoned docs (caller holds ``build_lock``).
+
+    Works from the stored postings, so nothing is re-tokenized. Returns the
+    published directory, or None when there is nothing to merge.
+    """
+    index_dir = Path(index_dir)
+    report = progress or (lambda _msg: None)
+    index = bm25_store.open_index(index_dir)
+    if index is None:
+        return None
+    manifest = index["manifest"]
+    segments, tombstones = index["segments"], index["tombstones"]
+    if len(segments) == 1 and not tombstones[0].size:
+        return None
+
+    started = time.perf_counter()
+    terms = sorted(set().union(*(set(seg["vocab"]) for seg in segments)))
+    vocab = {t: i for i, t in enumerate(terms)}
+
+    tmp = bm25_store.staging_dir(index_dir)
+    base = tmp / bm25_store.BASE_SEGMENT
+    base.mkdir()
+    spill = _SpillWriter(base)
+    df = np.zeros(len(terms), dtype=np.int64)
+    doc_len_parts: List[np.ndarray] = []
+    try:
+        writers = {name: bm25_store.StringTableWriter(base, name) for name in ("ids", "texts", "metas")}
+        next_doc = 0
+        for segment, dead in zip(segments, tombstones):
+            n_seg = int(segment["doc_len"].shape[0])
+            keep = np.ones(n_seg, dtype=bool)
+            keep[dead] = False
+            new_doc = np.full(n_seg, -1, dtype=np.int64)
+            new_doc[keep] = np.arange(next_doc, next_doc + int(keep.sum()), dtype=np.int64)
+            next_doc += int(keep.sum())
+            doc_len_parts.append(np.asarray(segment["doc_len"])[keep])
+            for name, writer in writers.items():
+                table = segment[name]
+                for i in np.flatnonzero(keep).tolist():
+                    writer.append(table.raw(i).decode("utf-8"))
+
+            # 세그먼트 내 posting은 term 순 + 문서 순이고, 세그먼트 순서대로 새 doc id가
+            # 증가하므로 spill에서도 term별 문서 순서가 유지된다
+            term_map = np.fromiter((vocab[t] for t in segment["vocab"]), dtype=np.int64, count=len(segment["vocab"]))
+            indptr = np.asarray(segment["indptr"])
+            total = int(indptr[-1])
+            for start in range(0, total, _SCATTER_CHUNK):
+                end = min(total, start + _SCATTER_CHUNK)
+                local_terms = np.searchsorted(indptr, np.arange(start, end), side="right") - 1
+                docs = new_doc[np.asarray(segment["doc_ids"][start:end])]
+                live = docs >= 0
+                merged_terms = term_map[local_terms[live]]
+                df += np.bincount(merged_terms, minlength=df.shape[0])
+                spill.write(merged_terms, docs[live], np.asarray(segment["term_freqs"][start:end])[live])
+        for writer in writers.values():
+            writer.close()
+        spill.close()
+
+        # tombstone된 문서에만 있던 term은 vocab에서 제외 (idf 평균이 새 빌드와 같도록)
+        present = df > 0
+        remap = np.cumsum(present) - 1
+        terms = [t for t, keep in zip(terms, present.tolist()) if keep]
+        df = df[present]
+
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        _scatter_postings(base, spill, remap, indptr)
+        spill.remove()
+
+        doc_len = np.concatenate(doc_len_parts).astype(np.float32) if doc_len_parts else np.empty(0, np.float32)
+        n_docs = int(doc_len.shape[0])
+        np.save(base / "indptr.npy", indptr)
+        np.save(base / "doc_len.npy", doc_len)
+        np.save(base / "idf.npy", okapi_idf(df, n_docs, manifest.get("epsilon", EPSILON)))
+        bm25_store.write_strings(base, "vocab", terms)
+
+        stats = {
+            "name": bm25_store.BASE_SEGMENT,
+            "doc_count": n_docs,
+            "vocab_size": len(terms),
+            "postings": int(indptr[-1]),
+            "avgdl": float(doc_len.mean(dtype=np.float64)) if n_docs else 0.0,
+            "avg_idf": mean_raw_idf(df, n_docs),
+        }
+        bm25_store.write_manifest(tmp, bm25_store.build_manifest(
+            collection=manifest["collection"],
+            doc_count=n_docs,
+            fingerprint=manifest["fingerprint"],
+            segments=[stats],
+            avg_idf=stats["avg_idf"],
+            k1=manifest.get("k1", K1),
+            b=manifest.get("b", B),
+            epsilon=manifest.get("epsilon", EPSILON),
+            generation=int(manifest.get("generation", 0)) + 1,
+        ))
+        published = bm25_store.publish(tmp, index_dir)
+    except BaseException:
+        spill.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    report(
+        f"[BM25] merged {len(segments)} segments -> {n_docs:,} docs, {len(terms):,} terms "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return published
+
+
+def sync_index(
+    collection,
+    index_dir: Path,
+    collection_name: Optional[str] = None,
+    upsert_ids: Optional[Iterable[str]] = None,
+    max_ratio: float = BM25_DELTA_MAX_RATIO,
+    **build_kwargs,
+) -> Optional[Path]:
+    """Delta update when the change is small, full rebuild otherwise (caller holds ``build_lock``).
+
+    Returns the index directory, or None when the collection is empty.
+    """
+    summary = update_index(
+        collection, index_dir, collection_name=collection_name,
+        upsert_ids=upsert_ids, max_ratio=max_ratio, **build_kwargs,
+    )
+    if summary is not None:
+        return Path(index_dir) if summary["doc_count"] else None
+    return build_index(collection, index_dir, collection_name=collection_name, **build_kwargs)
+
+
+def _open_collection(persist_dir: str, name: str):
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(
+        path=persist_dir,
+        settings=Settings(allow_reset=False, anonymized_telemetry=False),
+    )
+    return client.get_collection(name)
+
+
+def _read_ids_file(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+def main() -> None:
+    from config.settings import VECTOR_DIR, COLLECTION_NAME, BM25_INDEX_DIR
+
+    ap = argparse.ArgumentParser(description="Build or update the memory-mapped BM25 index for a Chroma collection.")
+    ap.add_argument("--persist_dir", default=VECTOR_DIR)
+    ap.add_argument("--collection", default=COLLECTION_NAME)
+    ap.add_argument("--index_dir", default=BM25_INDEX_DIR, help="Parent directory of per-collection indexes")
+    ap.add_argument("--workers", type=int, default=BM25_BUILD_WORKERS)
+    ap.add_argument("--page-size", type=int, default=BM25_BUILD_PAGE_SIZE)
+    ap.add_argument("--batch-size", type=int, default=BM25_BUILD_BATCH_SIZE)
+    ap.add_argument("--force", action="store_true", help="Full rebuild even if the manifest matches")
+    ap.add_argument("--ids-file", help="Chunk IDs (one per line) re-upserted with new content; re-tokenized into a delta")
+    ap.add_argument("--merge", action="store_true", help="Fold delta segments into the base segment")
+    args = ap.parse_args()
+
+    collection = _open_collection(args.persist_dir, args.collection)
+    index_dir = Path(args.index_dir) / args.collection
+    build_kwargs = dict(workers=args.workers, page_size=args.page_size, batch_size=args.batch_size)
+    upsert_ids = _read_ids_file(args.ids_file)
+
+    with build_lock(index_dir):
+        if args.force:
+            build_index(collection, index_dir, collection_name=args.collection, **build_kwargs)
+            return
+
+        manifest = bm25_store.read_manifest(index_dir)
+        fingerprint = bm25_store.collection_fingerprint(collection)
+        if upsert_ids or not bm25_store.manifest_matches(manifest, args.collection, collection.count(), fingerprint):
+            sync_index(collection, index_dir, collection_name=args.collection, upsert_ids=upsert_ids, **build_kwargs)
+        else:
+            print(f"[BM25] index is up to date: {index_dir}")
+
+        if args.merge or should_merge(bm25_store.read_manifest(index_dir)):
+            if merge_index(index_dir) is None:
+                print("[BM25] nothing to merge")
+
+
+if __name__ == "__main__":
+    main()
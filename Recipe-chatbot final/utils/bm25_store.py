@@ -0,0 +1,313 @@
+"""BM25 on-disk index format (versioned, memory-mapped, segmented).
+
+An index is a directory holding a JSON manifest and one or more segments. The
+``base`` segment comes from a full build; ``delta-<generation>`` segments are
+appended by incremental updates and folded back into the base by a merge:
+
+    manifest.json                      format/version, collection, doc_count, fingerprint,
+                                       generation, segments, tombstones, params
+    <segment>/vocab.offsets.npy|.bin   sorted UTF-8 terms (term id == position)
+    <segment>/indptr.npy               CSR row pointer per term (int64, V+1)
+    <segment>/doc_ids.npy              postings: segment-local doc index (int32)
+    <segment>/term_freqs.npy           postings: term frequency (float32)
+    <segment>/doc_len.npy / idf.npy    per-doc length (float32), per-term idf (float64)
+    <segment>/ids.* / texts.* / metas.*   chunk IDs, document texts, JSON metadata
+
+Tombstones are segment-local doc indexes that were deleted or re-upserted
+after the segment was written; they are hidden at query time and dropped by
+the next merge.
+
+Arrays are opened with ``np.load(mmap_mode="r")`` so every worker maps the same
+files and shares pages through the OS page cache instead of unpickling a
+private copy. The manifest ties the index to the Chroma collection it was built
+from; ``manifest_matches`` is used to detect a stale index after re-ingestion.
+Segments are immutable once written, and the manifest is replaced atomically,
+so readers always see a consistent generation.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils import index_publish
+from utils.index_publish import MANIFEST_FILE, staging_dir, write_manifest  # re-exported for the builders
+
+
+FORMAT_NAME = "bm25-csr"
+FORMAT_VERSION = 2
+BASE_SEGMENT = "base"
+
+_POSTING_ARRAYS = ("indptr", "doc_ids", "term_freqs", "doc_len", "idf")
+
+
+class StringTable:
+    """Read-only table of strings stored as one UTF-8 blob plus an offsets array."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, decode=None):
+        self._offsets = offsets
+        self._blob = blob
+        self._decode = decode
+
+    @classmethod
+    def open(cls, directory: Path, name: str, decode=None) -> "StringTable":
+        offsets = np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+        blob_path = directory / f"{name}.bin"
+        if blob_path.stat().st_size:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.empty(0, dtype=np.uint8)
+        return cls(offsets, blob, decode)
+
+    def __len__(self) -> int:
+        return int(self._offsets.shape[0]) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self._blob[int(self._offsets[i]):int(self._offsets[i + 1])].tobytes()
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        value = self.raw(i).decode("utf-8")
+        return self._decode(value) if self._decode else value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        """Binary search for ``key`` in a sorted table; returns its position (dict-like)."""
+        target = key.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.raw(lo) == target:
+            return lo
+        return default
+
+
+class StringTableWriter:
+    """Append strings to ``<name>.bin`` and record offsets; call ``close()`` to finish."""
+
+    def __init__(self, directory: Path, name: str):
+        self._directory = directory
+        self._name = name
+        self._fh = open(directory / f"{name}.bin", "wb")
+        self._offsets: List[int] = [0]
+
+    def append(self, value: str) -> None:
+        data = value.encode("utf-8")
+        self._fh.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def extend(self, values: Iterable[str]) -> None:
+        for v in values:
+            self.append(v)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def close(self) -> None:
+        self._fh.close()
+        np.save(self._directory / f"{self._name}.offsets.npy", np.asarray(self._offsets, dtype=np.int64))
+
+
+class SegmentedTable:
+    """Read-only concatenation of per-segment tables, addressed by global doc index."""
+
+    def __init__(self, tables: List[StringTable]):
+        self._tables = tables
+        self._offsets = np.cumsum([0] + [len(t) for t in tables])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        seg = int(np.searchsorted(self._offsets, i, side="right")) - 1
+        return self._tables[seg][i - int(self._offsets[seg])]
+
+    def __iter__(self):
+        for table in self._tables:
+            yield from table
+
+
+def delta_segment_name(generation: int) -> str:
+    return f"delta-{int(generation):06d}"
+
+
+def write_strings(directory: Path, name: str, values: Iterable[str]) -> int:
+    writer = StringTableWriter(directory, name)
+    writer.extend(values)
+    writer.close()
+    return len(writer)
+
+
+def encode_meta(meta: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(meta or {}, ensure_ascii=False, separators=(",", ":"))
+
+
+def doc_digest(text: Optional[str], meta: Optional[Dict[str, Any]]) -> bytes:
+    """sha1 of one chunk's document text and metadata (metadata keys sorted)."""
+    h = hashlib.sha1((text or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(meta or {}, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    return h.digest()
+
+
+def content_fingerprint(digests: Dict[str, bytes]) -> str:
+    """Order-independent fingerprint of chunk IDs and their ``doc_digest``.
+
+    Changes when documents are added, removed or re-chunked, and also when a
+    chunk is re-upserted under the same ID with new text or metadata.
+    """
+    h = hashlib.sha1()
+    for i in sorted(digests):
+        h.update(i.encode("utf-8"))
+        h.update(b"\0")
+        h.update(digests[i])
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def collection_digests(collection, page_size: int = 10000) -> Dict[str, bytes]:
+    """Chunk ID -> ``doc_digest`` for a live Chroma collection, paged (documents and metadata, no embeddings)."""
+    digests: Dict[str, bytes] = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        docs = page.get("documents") or [""] * len(ids)
+        metas = page.get("metadatas") or [{}] * len(ids)
+        for chunk_id, doc, meta in zip(ids, docs, metas):
+            digests[chunk_id] = doc_digest(doc, meta)
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    return digests
+
+
+def collection_fingerprint(collection, page_size: int = 10000) -> str:
+    """Content fingerprint of a live Chroma collection (IDs, document texts and metadata)."""
+    return content_fingerprint(collection_digests(collection, page_size))
+
+
+def build_manifest(
+    collection: str,
+    doc_count: int,
+    fingerprint: str,
+    segments: List[Dict[str, Any]],
+    avg_idf: float,
+    k1: float,
+    b: float,
+    epsilon: float,
+    generation: int = 0,
+    tombstones: Optional[Dict[str, List[int]]] = None,
+) -> Dict[str, Any]:
+    """
+    ``segments`` lists segment stats in query order (base first); ``doc_count``
+    is the number of live documents after tombstones. ``avg_idf`` is the mean
+    raw idf of the last full build or merge and drives the epsilon idf floor.
+    """
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "collection": collection,
+        "doc_count": int(doc_count),
+        "fingerprint": fingerprint,
+        "generation": int(generation),
+        "segments": segments,
+        "tombstones": {k: sorted(int(i) for i in v) for k, v in (tombstones or {}).items() if v},
+        "avg_idf": float(avg_idf),
+        "k1": float(k1),
+        "b": float(b),
+        "epsilon": float(epsilon),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    return index_publish.read_manifest(directory, FORMAT_NAME, FORMAT_VERSION)
+
+
+def manifest_matches(
+    manifest: Optional[Dict[str, Any]],
+    collection: str,
+    doc_count: int,
+    fingerprint: Optional[str] = None,
+) -> bool:
+    """True when the manifest describes the live collection (fingerprint optional)."""
+    if not manifest:
+        return False
+    if manifest.get("collection") != collection or int(manifest.get("doc_count", -1)) != int(doc_count):
+        return False
+    if fingerprint is not None and manifest.get("fingerprint") != fingerprint:
+        return False
+    return True
+
+
+def save_postings(directory: Path, arrays: Dict[str, np.ndarray]) -> None:
+    for name in _POSTING_ARRAYS:
+        np.save(Path(directory) / f"{name}.npy", arrays[name])
+
+
+def open_segment(directory: Path) -> Dict[str, Any]:
+    """Memory-map one segment directory (raises when files are missing)."""
+    directory = Path(directory)
+    segment: Dict[str, Any] = {}
+    for name in _POSTING_ARRAYS:
+        segment[name] = np.load(directory / f"{name}.npy", mmap_mode="r")
+    segment["vocab"] = StringTable.open(directory, "vocab")
+    segment["ids"] = StringTable.open(directory, "ids")
+    segment["texts"] = StringTable.open(directory, "texts")
+    segment["metas"] = StringTable.open(directory, "metas", decode=json.loads)
+    return segment
+
+
+def open_index(directory: Path) -> Optional[Dict[str, Any]]:
+    """Memory-map an index directory. Returns None when missing or incompatible.
+
+    ``segments`` and ``tombstones`` (int64 arrays) are in manifest order;
+    ``ids`` / ``texts`` / ``metas`` address all segments by global doc index.
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    try:
+        segments = []
+        tombstones = []
+        for info in manifest["segments"]:
+            segment = open_segment(directory / info["name"])
+            segment["name"] = info["name"]
+            segments.append(segment)
+            dead = manifest.get("tombstones", {}).get(info["name"], [])
+            tombstones.append(np.asarray(dead, dtype=np.int64))
+    except Exception:
+        return None
+    if not segments:
+        return None
+
+    index: Dict[str, Any] = {"manifest": manifest, "segments": segments, "tombstones": tombstones}
+    for name in ("ids", "texts", "metas"):
+        tables = [seg[name] for seg in segments]
+        index[name] = tables[0] if len(tables) == 1 else SegmentedTable(tables)
+    return index
+
+
+def publish(tmp_dir: Path, final_dir: Path) -> Path:
+    """Swap a fully written staging directory into place; if another worker published first, its index is kept."""
+    return index_publish.publish(tmp_dir, final_dir, lambda d: read_manifest(d) is not None)
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""Cross-Encoder ONNX backend - CE_MODEL exported once to ONNX (optionally int8) and run under ONNX Runtime
+
+With ``CE_BACKEND=onnx`` the shared CE service (``utils/ce_service.py``) runs the
+reranker through ONNX Runtime on CPU instead of PyTorch + FlagEmbedding. Each
+model is exported once into its own directory under ``CE_ONNX_DIR``:
+
+    <model slug>/manifest.json     model, opset, files
+    <model slug>/model.onnx        fp32 graph (torch.onnx.export, dynamic batch / sequence axes)
+    <model slug>/model.int8.onnx   dynamic int8 quantization of model.onnx (QInt8 weights)
+    <model slug>/tokenizer files
+
+The export runs under the same cross-process build lock as the index builders;
+a missing directory is exported on first load. Build offline with:
+
+    python -m utils.ce_onnx                      # CE_MODEL, fp32 + int8
+    python -m utils.ce_onnx --model BAAI/bge-reranker-base --no-int8
+
+Inference sorts the pairs by length before batching (less padding), tokenizes
+exactly like ``FlagReranker.compute_score`` (pair truncation, ``CE_MAX_LENGTH``)
+and returns the first logit, or its sigmoid with ``normalize=True``. Tolerance
+against the PyTorch path, on the sigmoid score: fp32 ONNX within 1e-3, int8
+within 0.05 (checked by ``python -m benchmarks.ce_backends``).
+"""
+from __future__ import annotations
+
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from config.settings import CE_MAX_LENGTH, CE_ONNX_DIR, CE_ONNX_INT8, CE_ONNX_THREADS
+from utils.file_lock import build_lock
+from utils.index_publish import publish, read_manifest, staging_dir, write_manifest
+
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+OPSET = 17
+
+
+def model_dir(model_name: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_") or "model"
+    return Path(CE_ONNX_DIR).expanduser() / slug
+
+
+def _is_complete(directory: Path, model_name: str, int8: bool) -> bool:
+    manifest = read_manifest(directory) or {}
+    name = INT8_FILE if int8 else FP32_FILE
+    return manifest.get("model") == model_name and name in manifest.get("files", []) and (directory / name).exists()
+
+
+def export_model(model_name: str, int8: bool = True, report=print) -> Path:
+    """Export ``model_name`` to ONNX (and int8) under CE_ONNX_DIR; no-op when already exported."""
+    final = model_dir(model_name)
+    with build_lock(final):
+        if _is_complete(final, model_name, int8):
+            return final
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        started = time.perf_counter()
+        tmp = staging_dir(final)
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+            sample = tokenizer(["김치찌개 레시피"], ["돼지고기와 김치를 볶은 뒤 물을 붓고 끓인다."], return_tensors="pt")
+            names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+            axes = {n: {0: "batch", 1: "sequence"} for n in names}
+            axes["logits"] = {0: "batch"}
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    ({n: sample[n] for n in names},),
+                    str(tmp / FP32_FILE),
+                    input_names=names,
+                    output_names=["logits"],
+                    dynamic_axes=axes,
+                    opset_version=OPSET,
+                    do_constant_folding=True,
+                )
+            tokenizer.save_pretrained(str(tmp))
+            files = [FP32_FILE]
+            if int8:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                quantize_dynamic(str(tmp / FP32_FILE), str(tmp / INT8_FILE), weight_type=QuantType.QInt8)
+                files.append(INT8_FILE)
+            write_manifest(tmp, {"model": model_name, "opset": OPSET, "inputs": names, "files": files})
+            publish(tmp, final)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    report(f"[CE-ONNX] exported {model_name} ({', '.join(files)}) in {time.perf_counter() - started:.1f}s -> {final}")
+    return final
+
+
+class OnnxCrossEncoder:
+    """``FlagReranker.compute_score``-compatible cross-encoder on an ONNX Runtime CPU session."""
+
+    def __init__(self, directory: Path, int8: bool = CE_ONNX_INT8, threads: int = CE_ONNX_THREADS, max_length: int = CE_MAX_LENGTH):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        directory = Path(directory)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, int(threads))
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = directory / (INT8_FILE if int8 else FP32_FILE)
+        self.session = ort.InferenceSession(str(self.path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(str(directory))
+        self.max_length = max_length
+        self.backend = "onnx-int8" if int8 else "onnx-fp32"
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    def compute_score(self, pairs: Sequence[Sequence[str]], normalize: bool = False, batch_size: int = 32) -> List[float]:
+        if not pairs:
+            return []
+        # 길이순으로 묶어 padding 최소화, 결과는 원래 순서로
+        order = np.argsort([len(q) + len(p) for q, p in pairs], kind="stable")
+        out = np.empty(len(pairs), dtype=np.float32)
+        step = max(1, int(batch_size))
+        for start in range(0, len(order), step):
+            idx = order[start: start + step]
+            enc = self.tokenizer(
+                [pairs[i][0] for i in idx],
+                [pairs[i][1] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feed = {name: np.asarray(enc[name], dtype=np.int64) for name in self._inputs}
+            logits = self.session.run(None, feed)[0]
+            out[idx] = np.asarray(logits, dtype=np.float32).reshape(len(idx), -1)[:, 0]
+        if normalize:
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out.tolist()
+
+
+def load_cross_encoder(model_name: str, int8: bool = CE_ONNX_INT8, threads: int = CE_ONNX_THREADS) -> OnnxCrossEncoder:
+    """ONNX cross-encoder for ``model_name`` (exported first when missing)."""
+    directory = model_dir(model_name)
+    if not _is_complete(directory, model_name, int8):
+        print(f"[CE-ONNX] {model_name} not exported yet; exporting once (offline: python -m utils.ce_onnx)")
+        export_model(model_name, int8=int8)
+    return OnnxCrossEncoder(directory, int8=int8, threads=threads)
+
+
+def main() -> int:
+    import argparse
+
+    from config.settings import CE_MODEL
+
+    ap = argparse.ArgumentParser(description="Export the cross-encoder to ONNX (+ dynamic int8)")
+    ap.add_argument("--model", default=CE_MODEL)
+    ap.add_argument("--no-int8", action="store_true", help="Skip the int8 quantized copy")
+    args = ap.parse_args()
+    export_model(args.model, int8=not args.no_int8)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
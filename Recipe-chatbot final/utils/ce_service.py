@@ -0,0 +1,234 @@
+"""Cross-Encoder Service - one shared CE model per process with dynamic micro-batching
+
+The CE rerank (``utils/reranker.py``) and the grounding verifier
+(``utils/verifier_ce.py``) both score (query, passage) pairs with ``CE_MODEL``.
+They share one service instead of loading a ``FlagReranker`` each:
+
+- the model is loaded once, on first use, and only the worker thread runs it;
+- callers submit their pairs and block on a future (``compute_score``) or await
+  it (``acompute_score``);
+- the worker takes the first waiting job, then keeps collecting jobs from other
+  requests until ``CE_BATCH_MAX_PAIRS`` pairs are gathered or
+  ``CE_BATCH_MAX_WAIT_MS`` has passed. It scores them in one call and splits the
+  scores back per job;
+- raw logits are computed once; callers asking for ``normalize=True`` get the
+  sigmoid, as ``FlagReranker`` does.
+
+The model runs on PyTorch through ``FlagReranker`` (``CE_BACKEND=torch``) or on
+ONNX Runtime (``CE_BACKEND=onnx``, ``utils/ce_onnx.py``); when the ONNX model
+cannot be loaded the service falls back to PyTorch.
+
+Queue depth, batch sizes and wait / inference times are reported by ``stats()``
+(``GET /debug/ce_service``). Each worker process holds its own service.
+"""
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config.settings import CE_BACKEND, CE_BATCH_MAX_PAIRS, CE_BATCH_MAX_WAIT_MS, DEBUG_RAW
+
+
+def _load_flag_reranker(model_name: str):
+    try:
+        from FlagEmbedding import FlagReranker  # type: ignore
+    except Exception as e:
+        print(f"Cross-encoder not available (FlagEmbedding import failed): {e}")
+        return None
+    try:
+        return FlagReranker(model_name, use_fp16=False)
+    except Exception as e:
+        print(f"Failed to load cross-encoder model {model_name}: {e}")
+        return None
+
+
+def _load_model(model_name: str, backend: str = CE_BACKEND):
+    if backend == "onnx":
+        try:
+            from utils.ce_onnx import load_cross_encoder
+
+            return load_cross_encoder(model_name)
+        except Exception as e:
+            print(f"ONNX cross-encoder unavailable for {model_name} ({e}); using FlagEmbedding")
+    return _load_flag_reranker(model_name)
+
+
+class _Job:
+    __slots__ = ("pairs", "normalize", "future", "enqueued")
+
+    def __init__(self, pairs: List[List[str]], normalize: bool):
+        self.pairs = pairs
+        self.normalize = normalize
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class CrossEncoderService:
+    """Shared cross-encoder with a dedicated worker thread that micro-batches jobs from concurrent callers."""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_batch_pairs: int = CE_BATCH_MAX_PAIRS,
+        max_wait_ms: float = CE_BATCH_MAX_WAIT_MS,
+    ):
+        self.model_name = model_name
+        self.max_batch_pairs = max(1, int(max_batch_pairs))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._model = None
+        self._load_failed = False
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending_pairs = 0
+        self._batches = 0
+        self._jobs = 0
+        self._pairs = 0
+        self._max_batch_seen = 0
+        self._errors = 0
+        self._wait_s = 0.0
+        self._infer_s = 0.0
+
+    # ---- model / worker lifecycle ----
+    def available(self) -> bool:
+        """Load the model on first call; False when it cannot be loaded."""
+        if self._model is None and not self._load_failed:
+            with self._load_lock:
+                if self._model is None and not self._load_failed:
+                    self._model = _load_model(self.model_name)
+                    self._load_failed = self._model is None
+        return self._model is not None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._load_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="ce-service", daemon=True)
+                    self._worker.start()
+
+    # ---- client API ----
+    def submit(self, pairs: Sequence[Sequence[str]], normalize: bool = True) -> Future:
+        """Queue ``pairs`` for scoring; the future resolves to one float per pair."""
+        job = _Job([[str(q), str(p)] for q, p in pairs], normalize)
+        if not job.pairs:
+            job.future.set_result([])
+            return job.future
+        if not self.available():
+            job.future.set_exception(RuntimeError(f"cross-encoder {self.model_name} unavailable"))
+            return job.future
+        self._ensure_worker()
+        with self._lock:
+            self._pending_pairs += len(job.pairs)
+        self._queue.put(job)
+        return job.future
+
+    def compute_score(self, pairs: Sequence[Sequence[str]], normalize: bool = True, batch_size: Any = None) -> List[float]:
+        """Blocking, ``FlagReranker.compute_score``-compatible (always a list; batch_size is the service's)."""
+        return self.submit(pairs, normalize).result()
+
+    async def acompute_score(self, pairs: Sequence[Sequence[str]], normalize: bool = True) -> List[float]:
+        return await asyncio.wrap_future(self.submit(pairs, normalize))
+
+    # ---- worker ----
+    def _collect(self) -> List[_Job]:
+        batch = [self._queue.get()]
+        n = len(batch[0].pairs)
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch_pairs:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(job)
+            n += len(job.pairs)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            collected = self._collect()
+            with self._lock:
+                self._pending_pairs -= sum(len(job.pairs) for job in collected)
+            # 취소된 요청(클라이언트 연결 종료 등)은 건너뜀
+            batch = [job for job in collected if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            pairs = [pair for job in batch for pair in job.pairs]
+            started = time.perf_counter()
+            with self._lock:
+                self._wait_s += sum(started - job.enqueued for job in batch)
+                self._batches += 1
+                self._jobs += len(batch)
+                self._pairs += len(pairs)
+                self._max_batch_seen = max(self._max_batch_seen, len(pairs))
+            try:
+                raw = self._model.compute_score(pairs, normalize=False, batch_size=self.max_batch_pairs)
+                logits = np.asarray(raw, dtype=np.float64).reshape(-1)
+                if logits.shape[0] != len(pairs):
+                    raise ValueError(f"expected {len(pairs)} scores, got {logits.shape[0]}")
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"ce_service: batch of {len(pairs)} pairs failed: {e}")
+                with self._lock:
+                    self._errors += 1
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+            with self._lock:
+                self._infer_s += time.perf_counter() - started
+            offset = 0
+            for job in batch:
+                scores = logits[offset: offset + len(job.pairs)]
+                offset += len(job.pairs)
+                if job.normalize:
+                    scores = 1.0 / (1.0 + np.exp(-scores))
+                job.future.set_result(scores.tolist())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self._batches
+            return {
+                "model": self.model_name,
+                "loaded": self._model is not None,
+                "backend": getattr(self._model, "backend", "torch") if self._model is not None else None,
+                "queue_depth": self._queue.qsize(),
+                "pending_pairs": self._pending_pairs,
+                "batches": batches,
+                "jobs": self._jobs,
+                "pairs": self._pairs,
+                "avg_batch_pairs": (self._pairs / batches) if batches else None,
+                "avg_jobs_per_batch": (self._jobs / batches) if batches else None,
+                "max_batch_pairs_seen": self._max_batch_seen,
+                "avg_queue_wait_ms": (self._wait_s / self._jobs * 1000) if self._jobs else None,
+                "avg_inference_ms": (self._infer_s / (batches - self._errors) * 1000) if batches > self._errors else None,
+                "errors": self._errors,
+                "max_batch_pairs": self.max_batch_pairs,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+_REGISTRY: Dict[str, CrossEncoderService] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_ce_service(model_name: str) -> CrossEncoderService:
+    """Process-wide service for ``model_name`` (rerank and verifier share it)."""
+    with _REGISTRY_LOCK:
+        service = _REGISTRY.get(model_name)
+        if service is None:
+            service = _REGISTRY[model_name] = CrossEncoderService(model_name)
+        return service
+
+
+def ce_service_stats() -> Dict[str, Any]:
+    """Counters of every service created so far (for /debug/ce_service)."""
+    with _REGISTRY_LOCK:
+        services = list(_REGISTRY.values())
+    return {"services": [service.stats() for service in services]}
@@ -0,0 +1,224 @@
+"""CRAG Gate - predicts the grounding verdict from cheap signals and skips the judge when confident
+
+With ``ENABLE_CRAG`` every answer goes through ``relevance_check_node`` (a
+cross-encoder pass or an LLM judge call). When retrieval returned several
+strong chunks of the same recipe and the answer visibly reuses them, the verdict
+is almost always ``grounded``. The gate scores four features with a logistic
+model (weights in ``CRAG_GATE_WEIGHTS_PATH``):
+
+- ``top_score`` / ``top3_mean``: best and top-3 mean retrieval score of the
+  judged docs. Similarities are used as-is; hybrid RRF scores are scaled by
+  ``HYBRID_K_RRF + 1``, so 1.0 means rank 1 in both legs;
+- ``same_parent``: number of judged docs from the most common ``parent_id``;
+- ``overlap``: share of the answer's character trigrams found in the docs.
+
+``CRAG_GATE_MODE``:
+
+- ``off``: no gate;
+- ``shadow`` (default): the judge always runs; predictions and verdicts are recorded;
+- ``skip``: at ``p >= CRAG_GATE_SKIP_P`` the judge is skipped and the answer is
+  treated as grounded. ``CRAG_GATE_AUDIT_RATE`` of the skipped checks still run
+  the judge in the background, off the request path. The shipped weights are
+  hand-set; enable ``skip`` only after fitting them on shadow-mode logs.
+
+Features, predictions and verdicts are appended to ``CRAG_GATE_LOG_PATH`` for
+offline audit and for refitting the weights (``python -m benchmarks.crag_gate_fit``).
+The skip rate and the disagreement rate are reported by ``stats()``
+(``GET /debug/crag_gate``). Disagreement counts predicted skips that the judge
+did not call grounded: audited skips, plus judged checks over the threshold
+in shadow mode.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from config.settings import (
+    CRAG_GATE_AUDIT_RATE,
+    CRAG_GATE_LOG_PATH,
+    CRAG_GATE_MODE,
+    CRAG_GATE_SKIP_P,
+    CRAG_GATE_WEIGHTS_PATH,
+    DEBUG_RAW,
+    HYBRID_K_RRF,
+)
+
+
+FEATURES = ("top_score", "top3_mean", "same_parent", "overlap")
+
+
+def _trigrams(text: str) -> set:
+    t = re.sub(r"\s+", "", (text or "").lower())
+    return {t[i: i + 3] for i in range(len(t) - 2)}
+
+
+def normalized_scores(scores: Sequence[Optional[float]], score_mode: str) -> List[float]:
+    """Numeric retrieval scores, best first, on a 0~1 scale for every score mode."""
+    vals = sorted((float(s) for s in scores if isinstance(s, (int, float))), reverse=True)
+    if score_mode == "hybrid_rrf":
+        # RRF 최대값 1/(k_rrf+1) (두 leg 모두 1위) 기준으로 0~1
+        vals = [s * (HYBRID_K_RRF + 1) for s in vals]
+    return vals
+
+
+def gate_features(
+    answer: str,
+    docs: Sequence[str],
+    scores: Sequence[Optional[float]],
+    parents: Sequence[Optional[str]],
+    score_mode: str,
+) -> Dict[str, float]:
+    """Gate inputs for one answer over the docs it will be judged against."""
+    vals = normalized_scores(scores, score_mode)
+    counts = Counter(p for p in parents if p)
+    ans = _trigrams(answer)
+    ctx = set().union(*(_trigrams(d) for d in docs if isinstance(d, str))) if docs else set()
+    return {
+        "top_score": vals[0] if vals else 0.0,
+        "top3_mean": sum(vals[:3]) / len(vals[:3]) if vals else 0.0,
+        "same_parent": float(max(counts.values())) if counts else 0.0,
+        "overlap": len(ans & ctx) / len(ans) if ans else 0.0,
+    }
+
+
+def load_weights(path: Path) -> Dict[str, Any]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {"bias": float(data.get("bias", 0.0)), "weights": {k: float(v) for k, v in (data.get("weights") or {}).items()}}
+
+
+def predict(model: Dict[str, Any], features: Dict[str, float]) -> float:
+    """Predicted probability that the judge returns ``grounded``."""
+    z = model["bias"] + sum(w * float(features.get(name, 0.0)) for name, w in model["weights"].items())
+    return 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, z))))
+
+
+class CragGate:
+    """Logistic grounding predictor in front of the CRAG judge, with skip / audit bookkeeping."""
+
+    def __init__(
+        self,
+        mode: str = CRAG_GATE_MODE,
+        skip_p: float = CRAG_GATE_SKIP_P,
+        audit_rate: float = CRAG_GATE_AUDIT_RATE,
+        weights_path: str = CRAG_GATE_WEIGHTS_PATH,
+        log_path: str = CRAG_GATE_LOG_PATH,
+    ):
+        self.mode = (mode or "off").lower()
+        self.skip_p = float(skip_p)
+        self.audit_rate = max(0.0, min(1.0, float(audit_rate)))
+        self.log_path = Path(log_path).expanduser() if log_path else None
+        self.model: Optional[Dict[str, Any]] = None
+        if self.mode != "off":
+            try:
+                self.model = load_weights(Path(weights_path))
+            except Exception as e:
+                print(f"[CRAG gate] weights unavailable ({e}); gate disabled")
+                self.mode = "off"
+        self._lock = threading.Lock()
+        self._tasks: set = set()
+        self._checks = 0
+        self._skipped = 0
+        self._audits_scheduled = 0
+        self._predicted_checked = 0
+        self._disagreements = 0
+        self._audit_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("shadow", "skip")
+
+    def evaluate(self, answer: str, docs, scores, parents, score_mode: str) -> Optional[Dict[str, Any]]:
+        """{"p", "features", "skip"} for one check; None when the gate is off."""
+        if not self.enabled:
+            return None
+        features = gate_features(answer, docs, scores, parents, score_mode)
+        p = predict(self.model, features)
+        with self._lock:
+            self._checks += 1
+        return {"p": p, "features": features, "skip": self.mode == "skip" and p >= self.skip_p}
+
+    # ---- outcomes ----
+    def record_judged(self, decision: Optional[Dict[str, Any]], verdict: Optional[str]) -> None:
+        """The judge ran on the request path (below threshold, or shadow mode)."""
+        if decision is None:
+            return
+        self._note(decision, verdict, "judge")
+
+    def record_skipped(self, decision: Dict[str, Any], judge: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        """The judge was skipped; sample it for a background audit."""
+        with self._lock:
+            self._skipped += 1
+            audit = random.random() < self.audit_rate
+            if audit:
+                self._audits_scheduled += 1
+        if audit:
+            task = asyncio.get_running_loop().create_task(self._audit(decision, judge))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _audit(self, decision: Dict[str, Any], judge: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        try:
+            result = await judge()
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"crag_gate audit error: {e}")
+            with self._lock:
+                self._audit_errors += 1
+            return
+        self._note(decision, (result or {}).get("branch"), "audit")
+
+    def _note(self, decision: Dict[str, Any], verdict: Optional[str], source: str) -> None:
+        if decision["p"] >= self.skip_p:
+            with self._lock:
+                self._predicted_checked += 1
+                self._disagreements += int(verdict != "grounded")
+        if self.log_path is None:
+            return
+        record = {
+            "ts": time.time(),
+            "source": source,
+            "mode": self.mode,
+            "p": decision["p"],
+            "features": decision["features"],
+            "verdict": verdict,
+        }
+        try:
+            with self._lock:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.log_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"crag_gate log error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "skip_p": self.skip_p,
+                "audit_rate": self.audit_rate,
+                "checks": self._checks,
+                "skipped": self._skipped,
+                "skip_rate": (self._skipped / self._checks) if self._checks else None,
+                "audits_scheduled": self._audits_scheduled,
+                "audits_pending": len(self._tasks),
+                "audit_errors": self._audit_errors,
+                "predicted_grounded_checked": self._predicted_checked,
+                "disagreements": self._disagreements,
+                "disagreement_rate": (self._disagreements / self._predicted_checked) if self._predicted_checked else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_crag_gate() -> CragGate:
+    """Process-wide CRAG gate."""
+    return CragGate()
@@ -0,0 +1,292 @@
+"""Embedding Cache - process-wide LRU (+ optional SQLite tier) around OpenAIEmbeddings
+
+One request embeds the same text several times: the OOD guard scores the query
+against the domain centroid, Chroma embeds the (rewritten) query for the dense
+search, and the MMR path embeds it again for the score backfill. Every
+consumer goes through ``get_cached_embeddings()`` so those become cache hits.
+Model names starting with ``local:`` are served by ``LocalEmbeddings`` (CPU,
+see ``utils/local_embeddings.py``); query-side scorers use
+``GUARD_EMBEDDING_MODEL``.
+
+Keys are ``model + normalized text`` (NFKC, collapsed whitespace). Vectors are
+kept as float32 in memory, bounded by ``EMBED_CACHE_MAX_ENTRIES``; when
+``EMBED_CACHE_DB`` is set they are also written to SQLite and survive restarts.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.settings import (
+    EMBEDDING_MODEL,
+    GUARD_EMBEDDING_BACKEND,
+    OPENAI_API_KEY,
+    USE_FAKE_LLM,
+    EMBED_CACHE_ENABLED,
+    EMBED_CACHE_MAX_ENTRIES,
+    EMBED_CACHE_DB,
+    EMBED_CACHE_DB_MAX_ROWS,
+)
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+class _SqliteTier:
+    """Persistent key -> float32 vector table shared by all models."""
+
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_rows: int):
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(Path(path).expanduser()), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._max_rows = max_rows
+        self._writes = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        out: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    out[key] = np.frombuffer(blob, dtype=np.float32)
+        return out
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vec, created) VALUES (?, ?, ?, ?)",
+                [(k, int(v.shape[0]), v.astype(np.float32).tobytes(), now) for k, v in items.items()],
+            )
+            self._writes += len(items)
+            if self._max_rows > 0 and self._writes >= self._PRUNE_EVERY:
+                self._writes = 0
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self._max_rows,),
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` that answers repeated texts from memory / SQLite."""
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model: str,
+        max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+        disk: Optional[_SqliteTier] = None,
+    ):
+        self.inner = inner
+        self.model = model
+        self.max_entries = max(0, int(max_entries))
+        self._disk = disk
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._api_calls = 0
+
+    def _key(self, text: str) -> str:
+        return f"{self.model}\x00{normalize_text(text)}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._mem.get(key)
+                if vec is not None:
+                    self._mem.move_to_end(key)
+                    found[key] = vec
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self._disk is not None:
+            try:
+                from_disk = self._disk.get_many(missing)
+            except Exception as e:
+                print(f"Embedding cache disk read failed: {e}")
+                from_disk = {}
+            if from_disk:
+                self._remember(from_disk, persist=False)
+                found.update(from_disk)
+                with self._lock:
+                    self._disk_hits += len(from_disk)
+        return found
+
+    def _remember(self, items: Dict[str, np.ndarray], persist: bool = True) -> None:
+        if self.max_entries:
+            with self._lock:
+                for key, vec in items.items():
+                    self._mem[key] = vec
+                    self._mem.move_to_end(key)
+                while len(self._mem) > self.max_entries:
+                    self._mem.popitem(last=False)
+        if persist and self._disk is not None:
+            try:
+                self._disk.put_many(items)
+            except Exception as e:
+                print(f"Embedding cache disk write failed: {e}")
+
+    def _split(self, texts: List[str]):
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+        # 같은 배치 안의 중복 텍스트는 한 번만 임베딩
+        todo: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        with self._lock:
+            self._hits += len(keys) - len(todo)
+            self._misses += len(todo)
+        return keys, found, todo
+
+    def _merge(self, keys, found, todo, vectors) -> List[List[float]]:
+        fresh = {k: np.asarray(v, dtype=np.float32) for k, v in zip(todo, vectors)}
+        self._remember(fresh)
+        found.update(fresh)
+        return [found[k].tolist() for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, todo = self._split(list(texts))
+        vectors = []
+        if todo:
+            with self._lock:
+                self._api_calls += 1
+            vectors = self.inner.embed_documents(list(todo.values()))
+        return self._merge(keys, found, todo, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, todo = self._split([text])
+        vectors = []
+        if todo:
+            with self._lock:
+                self._api_calls += 1
+            vectors = [self.inner.embed_query(text)]
+        return self._merge(keys, found, todo, vectors)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, todo = self._split(list(texts))
+        vectors = []
+        if todo:
+            with self._lock:
+                self._api_calls += 1
+            vectors = await self.inner.aembed_documents(list(todo.values()))
+        return self._merge(keys, found, todo, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, todo = self._split([text])
+        vectors = []
+        if todo:
+            with self._lock:
+                self._api_calls += 1
+            vectors = [await self.inner.aembed_query(text)]
+        return self._merge(keys, found, todo, vectors)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "model": self.model,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else None,
+                "api_calls": self._api_calls,
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "disk": self._disk is not None,
+            }
+
+
+@lru_cache(maxsize=1)
+def _disk_tier() -> Optional[_SqliteTier]:
+    if not EMBED_CACHE_DB:
+        return None
+    try:
+        return _SqliteTier(EMBED_CACHE_DB, EMBED_CACHE_DB_MAX_ROWS)
+    except Exception as e:
+        print(f"Embedding cache disk tier disabled: {e}")
+        return None
+
+
+_REGISTRY: Dict[str, Embeddings] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_cached_embeddings(model: str = EMBEDDING_MODEL) -> Embeddings:
+    """Process-wide embeddings for ``model`` (uncached when EMBED_CACHE_ENABLED=0).
+
+    ``local:<name>`` loads a sentence-transformers model on CPU; anything else is OpenAIEmbeddings.
+    """
+    with _REGISTRY_LOCK:
+        emb = _REGISTRY.get(model)
+        if emb is None:
+            from utils.local_embeddings import LOCAL_PREFIX
+
+            if model.startswith(LOCAL_PREFIX):
+                from utils.local_embeddings import LocalEmbeddings
+
+                emb = LocalEmbeddings(model[len(LOCAL_PREFIX):])
+            else:
+                from langchain_openai import OpenAIEmbeddings
+
+                emb = OpenAIEmbeddings(model=model)
+            if EMBED_CACHE_ENABLED:
+                emb = CachedEmbeddings(emb, model=model, disk=_disk_tier())
+            _REGISTRY[model] = emb
+        return emb
+
+
+def guard_embeddings_enabled() -> bool:
+    """Whether GUARD_EMBEDDING_MODEL can embed: local backend, or OpenAI with an API key (never in fake mode)."""
+    if USE_FAKE_LLM:
+        return False
+    return GUARD_EMBEDDING_BACKEND == "local" or bool(OPENAI_API_KEY)
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of every cache created so far (for /debug/embedding_cache)."""
+    with _REGISTRY_LOCK:
+        caches = [emb.stats() for emb in _REGISTRY.values() if isinstance(emb, CachedEmbeddings)]
+    disk = _disk_tier()
+    return {
+        "enabled": EMBED_CACHE_ENABLED,
+        "caches": caches,
+        "disk_path": EMBED_CACHE_DB or None,
+        "disk_rows": disk.count() if disk is not None else None,
+    }
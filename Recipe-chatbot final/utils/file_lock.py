@@ -0,0 +1,112 @@
+"""Cross-process lockfile shared by the on-disk index builders (BM25, dense export)."""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from config.settings import BM25_BUILD_LOCK_TIMEOUT
+
+
+def _owner_token() -> str:
+    return f"{os.getpid()} {socket.gethostname()}"
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _holder_dead(token: str) -> bool:
+    """True when the lock was written by a process on this host that no longer exists."""
+    pid, _, host = token.partition(" ")
+    if host and host != socket.gethostname():
+        return False  # 다른 호스트 (공유 볼륨): heartbeat 만료로만 판단
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (ValueError, PermissionError, OSError):
+        return False
+    return False
+
+
+def _take_over(lock_path: Path, stale: str) -> None:
+    """Remove the abandoned lock ``stale``; a lock re-created by another waiter in between is put back."""
+    moved = lock_path.with_name(f"{lock_path.name}.stale.{os.getpid()}")
+    try:
+        os.replace(lock_path, moved)
+    except OSError:
+        return
+    if _read(moved) != stale:
+        try:
+            os.link(moved, lock_path)  # 실패 = 이미 새 잠금이 있음
+        except OSError:
+            pass
+    try:
+        moved.unlink()
+    except OSError:
+        pass
+
+
+def _heartbeat(lock_path: Path, token: str, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        if _read(lock_path) != token:
+            return
+        try:
+            os.utime(lock_path)
+        except OSError:
+            return
+
+
+@contextmanager
+def build_lock(index_dir: Path, timeout: float = BM25_BUILD_LOCK_TIMEOUT, poll: float = 1.0):
+    """Cross-process build lock so that only one worker rebuilds a given index.
+
+    The lock file holds the holder's PID and host, and the holder refreshes its
+    mtime every ``timeout / 4`` seconds while it builds. Waiters block until
+    the holder finishes; the lock is taken over at once when its PID is gone
+    (same host), or when it has not been refreshed for ``timeout`` seconds.
+    """
+    index_dir = Path(index_dir)
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = index_dir.parent / f".{index_dir.name}.lock"
+    token = _owner_token()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, token.encode())
+            os.close(fd)
+            break
+        except FileExistsError:
+            holder = _read(lock_path)
+            try:
+                expired = time.time() - lock_path.stat().st_mtime > timeout
+            except OSError:
+                continue
+            if holder is not None and (expired or _holder_dead(holder)):
+                _take_over(lock_path, holder)
+                continue
+            time.sleep(poll)
+    stop = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat, args=(lock_path, token, max(1.0, timeout / 4.0), stop), daemon=True
+    )
+    beat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        beat.join()
+        # 넘겨받힌 경우 다른 프로세스의 잠금은 지우지 않음
+        if _read(lock_path) == token:
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
@@ -1,16 +1,30 @@
 """Hybrid Retriever - Combining Dense (Vector) + Sparse (BM25) Search with RRF"""
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Iterable
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from functools import lru_cache
 import re
-import pickle
 import os
+import time
+import threading
 from pathlib import Path
 
-from rank_bm25 import BM25Okapi
+import numpy as np
 from konlpy.tag import Okt
 
+from utils import bm25_store
 from utils.vectorstore import get_vectorstore
-from config.settings import DEBUG_RAW, BASE_DIR
+from config.settings import (
+    DEBUG_RAW,
+    COLLECTION_NAME,
+    BM25_INDEX_DIR,
+    BM25_VERIFY_FINGERPRINT,
+    BM25_REFRESH_INTERVAL,
+    HYBRID_PARALLEL,
+    HYBRID_DENSE_TIMEOUT,
+    HYBRID_SPARSE_TIMEOUT,
+    HYBRID_LEG_WORKERS,
+)
 
 
 class KoreanTokenizer:
@@ -45,6 +59,320 @@ class KoreanTokenizer:
             return text.split()
 
 
+class InvertedBM25:
+    """
+    CSR 역색인 기반 BM25 (Okapi) 엔진
+
+    rank_bm25.BM25Okapi와 동일한 점수식(k1, b, epsilon idf floor)을 사용하지만,
+    질의 토큰의 posting만 점수화하므로 코퍼스 전체를 훑지 않는다.
+
+    - indptr[t]:indptr[t+1] 구간이 term t의 posting 범위
+    - doc_ids / term_freqs: posting별 문서 인덱스와 term frequency
+    - doc_len / idf: 문서 길이, term별 idf
+    """
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_len: np.ndarray,
+        idf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_len = doc_len
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+
+        self.corpus_size = int(doc_len.shape[0])
+        self.avgdl = float(doc_len.mean(dtype=np.float64)) if self.corpus_size else 0.0
+
+        # 문서 길이 정규화 항은 질의와 무관하므로 미리 계산
+        if self.avgdl > 0:
+            self._norm = k1 * (1.0 - b + b * doc_len.astype(np.float64) / self.avgdl)
+        else:
+            self._norm = np.full(self.corpus_size, k1, dtype=np.float64)
+
+    @classmethod
+    def from_corpus(
+        cls,
+        tokenized_corpus: Iterable[List[str]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "InvertedBM25":
+        """
+        토큰화된 코퍼스로부터 역색인 생성
+
+        Args:
+            tokenized_corpus: 문서별 토큰 리스트
+            k1, b, epsilon: BM25Okapi 파라미터
+
+        Returns:
+            InvertedBM25 인스턴스
+        """
+        vocab: Dict[str, int] = {}
+        term_col: List[int] = []
+        doc_col: List[int] = []
+        tf_col: List[int] = []
+        doc_len: List[int] = []
+
+        for doc_idx, tokens in enumerate(tokenized_corpus):
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                tid = vocab.setdefault(term, len(vocab))
+                term_col.append(tid)
+                doc_col.append(doc_idx)
+                tf_col.append(tf)
+
+        # term id를 사전순으로 재배정 (디스크 vocab과 동일한 순서)
+        sorted_terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        remap[[vocab[t] for t in sorted_terms]] = np.arange(len(vocab), dtype=np.int64)
+        vocab = {t: i for i, t in enumerate(sorted_terms)}
+
+        terms = remap[np.asarray(term_col, dtype=np.int64)]
+        # term 순으로 정렬 (stable → posting 내부는 문서 순서 유지)
+        order = np.argsort(terms, kind="stable")
+        df = np.bincount(terms, minlength=len(vocab))
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        lengths = np.asarray(doc_len, dtype=np.float32)
+        idf = okapi_idf(df, len(doc_len), epsilon)
+
+        return cls(
+            vocab=vocab,
+            indptr=indptr,
+            doc_ids=np.asarray(doc_col, dtype=np.int32)[order],
+            term_freqs=np.asarray(tf_col, dtype=np.float32)[order],
+            doc_len=lengths,
+            idf=idf,
+            k1=k1,
+            b=b,
+        )
+
+    @classmethod
+    def from_segment(cls, segment: Dict[str, Any], k1: float = 1.5, b: float = 0.75) -> "InvertedBM25":
+        """utils.bm25_store.open_segment()로 memory-map한 세그먼트에서 생성 (복사 없음)"""
+        return cls(
+            vocab=segment["vocab"],
+            indptr=segment["indptr"],
+            doc_ids=segment["doc_ids"],
+            term_freqs=segment["term_freqs"],
+            doc_len=segment["doc_len"],
+            idf=segment["idf"],
+            k1=k1,
+            b=b,
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """디스크 저장용 posting 배열"""
+        return {
+            "indptr": self.indptr,
+            "doc_ids": self.doc_ids,
+            "term_freqs": self.term_freqs,
+            "doc_len": self.doc_len,
+            "idf": self.idf,
+        }
+
+    def top_k(self, query_tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        질의 토큰의 posting만 누적 점수화한 뒤 argpartition으로 상위 k개 선택
+
+        Args:
+            query_tokens: 토큰화된 질의 (중복 토큰은 BM25Okapi와 같이 가중 합산)
+            k: 반환할 문서 수
+
+        Returns:
+            (문서 인덱스 배열, BM25 점수 배열) - 점수 내림차순, 동점은 문서 순서
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        if k <= 0 or not query_tokens or self.corpus_size == 0:
+            return empty
+
+        doc_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+        for term, qf in Counter(query_tokens).items():
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            weight = float(self.idf[tid])
+            if weight == 0.0:
+                continue
+            start, end = int(self.indptr[tid]), int(self.indptr[tid + 1])
+            docs = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.term_freqs[start:end], dtype=np.float64)
+            doc_parts.append(docs)
+            score_parts.append(qf * weight * tf * (self.k1 + 1.0) / (tf + self._norm[docs]))
+
+        if not doc_parts:
+            return empty
+
+        if len(doc_parts) == 1:
+            cand, acc = doc_parts[0].astype(np.int64), score_parts[0]
+        else:
+            # 여러 term의 posting을 문서 단위로 합산
+            cand, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            acc = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        if cand.shape[0] > k:
+            part = np.argpartition(-acc, k - 1)[:k]
+            cand, acc = cand[part], acc[part]
+
+        order = np.lexsort((cand, -acc))
+        return cand[order].astype(np.int64), acc[order]
+
+
+def okapi_idf(
+    df: np.ndarray,
+    corpus_size: int,
+    epsilon: float = 0.25,
+    average_idf: Optional[float] = None,
+) -> np.ndarray:
+    """BM25Okapi와 동일한 idf (음수 idf는 epsilon * 평균 idf로 floor)"""
+    df = df.astype(np.float64)
+    idf = np.log(corpus_size - df + 0.5) - np.log(df + 0.5)
+    if idf.size:
+        avg = float(idf.mean()) if average_idf is None else float(average_idf)
+        idf[idf < 0] = epsilon * avg
+    return idf
+
+
+def mean_raw_idf(df: np.ndarray, corpus_size: int) -> float:
+    """floor 적용 전 평균 idf (세그먼트 검색의 epsilon floor 기준값)"""
+    if df.size == 0:
+        return 0.0
+    df = df.astype(np.float64)
+    return float(np.mean(np.log(corpus_size - df + 0.5) - np.log(df + 0.5)))
+
+
+class SegmentedBM25:
+    """
+    base + delta 세그먼트를 함께 검색하는 BM25 엔진
+
+    세그먼트별 posting을 그대로 memory-map으로 쓰고, 점수 계산에 필요한
+    N / df / avgdl은 tombstone을 제외한 전체(live) 문서 기준으로 계산한다.
+    따라서 점수는 live 문서만으로 새로 빌드한 인덱스와 같다
+    (예외: 음수 idf floor는 마지막 전체 빌드/merge 시점의 평균 idf를 사용).
+
+    문서 인덱스는 세그먼트 순서대로 이어 붙인 전역 인덱스
+    (bm25_store.SegmentedTable과 동일한 주소 체계).
+    """
+
+    def __init__(
+        self,
+        segments: List[InvertedBM25],
+        tombstones: List[np.ndarray],
+        average_idf: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ):
+        self.segments = segments
+        self.k1 = k1
+        self.b = b
+        self.idf_floor = epsilon * float(average_idf)
+
+        sizes = [seg.corpus_size for seg in segments]
+        self.offsets = np.cumsum([0] + sizes).astype(np.int64)
+        self.live = np.ones(int(self.offsets[-1]), dtype=bool)
+        for offset, dead in zip(self.offsets[:-1], tombstones):
+            if dead.size:
+                self.live[offset + dead] = False
+
+        doc_len = np.concatenate([np.asarray(seg.doc_len, dtype=np.float64) for seg in segments])
+        self.corpus_size = int(self.live.sum())
+        self.avgdl = float(doc_len[self.live].mean()) if self.corpus_size else 0.0
+        if self.avgdl > 0:
+            self._norm = k1 * (1.0 - b + b * doc_len / self.avgdl)
+        else:
+            self._norm = np.full(doc_len.shape[0], k1, dtype=np.float64)
+
+    def top_k(self, query_tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """InvertedBM25.top_k와 같은 계약 (전역 문서 인덱스, 점수 내림차순)"""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        if k <= 0 or not query_tokens or self.corpus_size == 0:
+            return empty
+
+        doc_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+        n = self.corpus_size
+        for term, qf in Counter(query_tokens).items():
+            docs_list: List[np.ndarray] = []
+            tf_list: List[np.ndarray] = []
+            for offset, seg in zip(self.offsets, self.segments):
+                tid = seg.vocab.get(term)
+                if tid is None:
+                    continue
+                start, end = int(seg.indptr[tid]), int(seg.indptr[tid + 1])
+                docs = np.asarray(seg.doc_ids[start:end], dtype=np.int64) + offset
+                keep = self.live[docs]
+                docs_list.append(docs[keep])
+                tf_list.append(np.asarray(seg.term_freqs[start:end], dtype=np.float64)[keep])
+            if not docs_list:
+                continue
+            docs = np.concatenate(docs_list)
+            df = docs.shape[0]
+            if df == 0:
+                continue
+            weight = float(np.log(n - df + 0.5) - np.log(df + 0.5))
+            if weight < 0:
+                weight = self.idf_floor
+            if weight == 0.0:
+                continue
+            tf = np.concatenate(tf_list)
+            doc_parts.append(docs)
+            score_parts.append(qf * weight * tf * (self.k1 + 1.0) / (tf + self._norm[docs]))
+
+        if not doc_parts:
+            return empty
+
+        if len(doc_parts) == 1:
+            cand, acc = doc_parts[0], score_parts[0]
+        else:
+            cand, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            acc = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        if cand.shape[0] > k:
+            part = np.argpartition(-acc, k - 1)[:k]
+            cand, acc = cand[part], acc[part]
+
+        order = np.lexsort((cand, -acc))
+        return cand[order].astype(np.int64), acc[order]
+
+
+def bm25_from_index(index: Dict[str, Any]):
+    """
+    bm25_store.open_index() 결과로 검색 엔진 생성
+
+    delta 세그먼트/tombstone이 없으면 저장된 idf를 그대로 쓰는 InvertedBM25,
+    있으면 전역 통계로 점수화하는 SegmentedBM25를 반환한다.
+    """
+    manifest = index["manifest"]
+    k1 = manifest.get("k1", 1.5)
+    b = manifest.get("b", 0.75)
+    engines = [InvertedBM25.from_segment(seg, k1=k1, b=b) for seg in index["segments"]]
+    if len(engines) == 1 and not index["tombstones"][0].size:
+        return engines[0]
+    return SegmentedBM25(
+        engines,
+        index["tombstones"],
+        average_idf=manifest.get("avg_idf", 0.0),
+        k1=k1,
+        b=b,
+        epsilon=manifest.get("epsilon", 0.25),
+    )
+
+
 class HybridRetriever:
     """
     Hybrid Retrieval: Dense (Vector) + Sparse (BM25) 검색 결합
@@ -58,126 +386,209 @@ class HybridRetriever:
         """
         Args:
             vectorstore: Chroma vectorstore instance (optional, will use get_vectorstore if None)
-            cache_dir: Directory to cache BM25 index (optional, defaults to BASE_DIR / "bm25_cache")
+            cache_dir: Directory for BM25 indexes (optional, defaults to BM25_INDEX_DIR)
         """
-        self.vectorstore = vectorstore or get_vectorstore()
+        # None이면 매번 get_vectorstore()로 조회 (export 백엔드 refresh로 교체된 store를 따라감)
+        self._vectorstore = vectorstore
         self.tokenizer = KoreanTokenizer()
 
-        # 캐시 디렉토리 설정
+        # 캐시 디렉토리 설정 (컬렉션별 하위 디렉토리에 인덱스 저장)
         if cache_dir is None:
-            self.cache_dir = Path(BASE_DIR) / "bm25_cache"
+            self.cache_dir = Path(BM25_INDEX_DIR)
         else:
             self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
-
-        self.cache_file = self.cache_dir / "bm25_index.pkl"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
 
         # BM25 인덱스 (lazy loading)
         self._bm25_index = None
         self._bm25_docs = None
         self._bm25_metas = None
+        self._bm25_lock = threading.Lock()
+        self._bm25_error = None  # 마지막 빌드/로드 실패 (sparse leg가 "error"로 보고)
 
-    def _load_from_cache(self) -> bool:
-        """캐시에서 BM25 인덱스 로드"""
-        if not self.cache_file.exists():
-            return False
+        # manifest 변경 감지 (CLI delta 업데이트 / background merge 반영)
+        self._manifest_stamp = None
+        self._next_refresh = 0.0
+        self._merge_thread = None
 
-        try:
-            if DEBUG_RAW:
-                print(f"Loading BM25 index from cache: {self.cache_file}")
-
-            with open(self.cache_file, 'rb') as f:
-                cached_data = pickle.load(f)
+    @property
+    def vectorstore(self):
+        return self._vectorstore if self._vectorstore is not None else get_vectorstore()
 
-            self._bm25_index = cached_data['index']
-            self._bm25_docs = cached_data['docs']
-            self._bm25_metas = cached_data['metas']
-
-            if DEBUG_RAW:
-                print(f"BM25 index loaded from cache ({len(self._bm25_docs)} documents)")
+    def _collection_name(self, collection) -> str:
+        return getattr(collection, "name", None) or COLLECTION_NAME
 
-            return True
+    def _index_dir(self, collection) -> Path:
+        return self.cache_dir / self._collection_name(collection)
 
-        except Exception as e:
-            if DEBUG_RAW:
-                print(f"Failed to load cache: {e}")
+    def _manifest_stat(self, index_dir: Path):
+        try:
+            st = (index_dir / bm25_store.MANIFEST_FILE).stat()
+            return (st.st_ino, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _load_from_cache(self, collection, verify: bool = True) -> bool:
+        """디스크 인덱스를 memory-map으로 로드 (manifest가 현재 컬렉션과 일치할 때만)"""
+        index_dir = self._index_dir(collection)
+        stamp = self._manifest_stat(index_dir)
+        index = bm25_store.open_index(index_dir)
+        if index is None:
             return False
 
-    def _save_to_cache(self):
-        """BM25 인덱스를 캐시에 저장"""
         try:
-            if DEBUG_RAW:
-                print(f"Saving BM25 index to cache: {self.cache_file}")
-
-            cached_data = {
-                'index': self._bm25_index,
-                'docs': self._bm25_docs,
-                'metas': self._bm25_metas
-            }
+            fingerprint = (
+                bm25_store.collection_fingerprint(collection)
+                if (verify and BM25_VERIFY_FINGERPRINT) else None
+            )
+            if not bm25_store.manifest_matches(
+                index["manifest"], self._collection_name(collection), collection.count(), fingerprint
+            ):
+                if DEBUG_RAW:
+                    print(f"BM25 index is stale for collection, rebuilding: {index_dir}")
+                return False
 
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(cached_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._bm25_index = bm25_from_index(index)
+            self._bm25_docs = index["texts"]
+            self._bm25_metas = index["metas"]
+            self._manifest_stamp = stamp
+            self._next_refresh = time.monotonic() + BM25_REFRESH_INTERVAL
 
             if DEBUG_RAW:
-                print("BM25 index saved to cache")
+                print(
+                    f"BM25 index mapped from {index_dir} ({len(self._bm25_docs)} documents, "
+                    f"{len(index['segments'])} segments)"
+                )
+
+            return True
 
         except Exception as e:
             if DEBUG_RAW:
-                print(f"Failed to save cache: {e}")
+                print(f"Failed to load BM25 index: {e}")
+            return False
 
     def _build_bm25_index(self):
-        """BM25 인덱스 구축 (캐시 사용, 없으면 새로 생성)"""
+        """BM25 인덱스 준비 (디스크 인덱스 사용, 없거나 오래되면 새로 생성)"""
         if self._bm25_index is not None:
             return  # Already built
 
-        # 1. 캐시에서 로드 시도
-        if self._load_from_cache():
-            return
-
-        # 2. 캐시 없으면 새로 빌드
-        if DEBUG_RAW:
-            print("Building BM25 index from scratch...")
+        with self._bm25_lock:
+            if self._bm25_index is not None:
+                return
 
-        try:
-            # Vector DB에서 모든 문서 가져오기
+            # Vector DB 컬렉션 확인
             collection = getattr(self.vectorstore, "_collection", None)
-            if collection is None:
+            if collection is None or not hasattr(collection, "get"):
                 if DEBUG_RAW:
                     print("No collection found, BM25 disabled")
                 self._bm25_index = None
                 return
 
-            # Chroma에서 모든 문서 가져오기
-            all_data = collection.get(include=["documents", "metadatas"])
-
-            if not all_data or not all_data.get("documents"):
-                if DEBUG_RAW:
-                    print("No documents found, BM25 disabled")
-                self._bm25_index = None
-                return
-
-            self._bm25_docs = all_data["documents"]
-            self._bm25_metas = all_data.get("metadatas", [{}] * len(self._bm25_docs))
+            self._prepare_bm25_index(collection)
 
-            # 토크나이징
-            if DEBUG_RAW:
-                print(f"Tokenizing {len(self._bm25_docs)} documents...")
+        # 4. delta가 쌓였으면 백그라운드에서 base로 merge
+        if self._bm25_index is not None:
+            self._schedule_merge(collection)
 
-            tokenized_corpus = [self.tokenizer.tokenize(doc) for doc in self._bm25_docs]
+    def _prepare_bm25_index(self, collection) -> None:
+        """디스크 인덱스 로드 → 실패 시 delta 업데이트/전체 빌드 후 로드 (_bm25_lock 안에서 호출)"""
+        # 1. 디스크 인덱스 memory-map 시도
+        self._bm25_error = None
+        if self._load_from_cache(collection):
+            return
 
-            # BM25 인덱스 생성
-            self._bm25_index = BM25Okapi(tokenized_corpus)
+        # 2. 없거나 오래된 경우: 변경분이 작으면 delta 세그먼트, 아니면 페이지 단위 병렬 빌드
+        #    (다른 워커가 빌드 중이면 대기)
+        from utils.bm25_build import sync_index, build_lock
 
-            if DEBUG_RAW:
-                print(f"BM25 index built with {len(self._bm25_docs)} documents")
+        index_dir = self._index_dir(collection)
+        try:
+            with build_lock(index_dir):
+                # 대기하는 동안 다른 워커가 빌드를 끝냈을 수 있음
+                if self._load_from_cache(collection):
+                    return
 
-            # 3. 캐시에 저장
-            self._save_to_cache()
+                if DEBUG_RAW:
+                    print("Updating BM25 index...")
+
+                built = sync_index(
+                    collection,
+                    index_dir,
+                    collection_name=self._collection_name(collection),
+                    progress=print if DEBUG_RAW else None,
+                )
+                if built is None:
+                    if DEBUG_RAW:
+                        print("No documents found, BM25 disabled")
+                    self._bm25_index = None
+                    return
+
+            # 3. 방금 만든 인덱스를 memory-map으로 열기 (워커 간 페이지 공유)
+            self._load_from_cache(collection, verify=False)
 
         except Exception as e:
             if DEBUG_RAW:
                 print(f"BM25 index build error: {e}")
             self._bm25_index = None
+            self._bm25_error = e
+
+    def _schedule_merge(self, collection) -> None:
+        """delta 세그먼트/tombstone이 임계값을 넘으면 daemon 스레드에서 merge"""
+        from utils.bm25_build import should_merge
+
+        index_dir = self._index_dir(collection)
+        if not should_merge(bm25_store.read_manifest(index_dir)):
+            return
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+
+        def _run():
+            from utils.bm25_build import merge_index, build_lock
+            try:
+                with build_lock(index_dir):
+                    # 잠금 대기 중 다른 워커가 이미 merge했을 수 있음
+                    if should_merge(bm25_store.read_manifest(index_dir)):
+                        merge_index(index_dir, progress=print if DEBUG_RAW else None)
+                # 다음 검색에서 새 manifest를 바로 반영
+                self._next_refresh = 0.0
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"BM25 merge error: {e}")
+
+        self._merge_thread = threading.Thread(target=_run, name="bm25-merge", daemon=True)
+        self._merge_thread.start()
+
+    def _maybe_refresh(self) -> None:
+        """manifest가 바뀌었으면 (delta 추가 / merge) 새 세대를 다시 memory-map"""
+        if self._bm25_index is None or BM25_REFRESH_INTERVAL <= 0:
+            return
+        if time.monotonic() < self._next_refresh:
+            return
+
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is None:
+            return
+        with self._bm25_lock:
+            self._next_refresh = time.monotonic() + BM25_REFRESH_INTERVAL
+            index_dir = self._index_dir(collection)
+            stamp = self._manifest_stat(index_dir)
+            if stamp is None or stamp == self._manifest_stamp:
+                return
+            if DEBUG_RAW:
+                print(f"BM25 manifest changed, remapping {index_dir}")
+            # 실패하면 기존 매핑을 그대로 사용
+            self._load_from_cache(collection, verify=False)
+        self._schedule_merge(collection)
+
+    def index_version(self):
+        """현재 서빙 중인 BM25 manifest stamp (refresh 주기마다 확인, 검색 결과 캐시 무효화용)"""
+        self._maybe_refresh()
+        return self._manifest_stamp
+
+    def warm_up(self) -> bool:
+        """서버 시작 시 BM25 인덱스를 미리 준비 (첫 요청 지연 방지)"""
+        self._build_bm25_index()
+        return self._bm25_index is not None
 
     def _bm25_search(self, query: str, k: int = 10) -> List[Tuple[str, Dict, float]]:
         """
@@ -190,10 +601,14 @@ class HybridRetriever:
         Returns:
             List of (document_text, metadata, bm25_score)
         """
-        # BM25 인덱스 빌드 (최초 1회)
+        # BM25 인덱스 빌드 (최초 1회) + 새 세대 반영
         self._build_bm25_index()
+        self._maybe_refresh()
 
         if self._bm25_index is None:
+            # 빌드 실패는 leg 오류로 보고 (문서 없음 / 컬렉션 없음은 빈 결과)
+            if self._bm25_error is not None:
+                raise RuntimeError(f"BM25 index unavailable: {self._bm25_error}")
             return []
 
         # 쿼리 토크나이징
@@ -202,18 +617,14 @@ class HybridRetriever:
         if not tokenized_query:
             return []
 
-        # BM25 점수 계산
-        scores = self._bm25_index.get_scores(tokenized_query)
-
-        # Top-k 인덱스 추출
-        top_k_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        # 질의 term의 posting만 점수화 + argpartition top-k
+        top_k_indices, top_k_scores = self._bm25_index.top_k(tokenized_query, k)
 
         results = []
-        for idx in top_k_indices:
+        for idx, score in zip(top_k_indices.tolist(), top_k_scores.tolist()):
             doc = self._bm25_docs[idx]
             meta = self._bm25_metas[idx] if idx < len(self._bm25_metas) else {}
-            score = float(scores[idx])
-            results.append((doc, meta, score))
+            results.append((doc, meta, float(score)))
 
         return results
 
@@ -227,24 +638,20 @@ class HybridRetriever:
 
         Returns:
             List of (document_text, metadata, similarity_score)
+
+        예외는 그대로 전파 (_run_leg가 leg 상태 "error"로 기록)
         """
-        try:
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
+        results = self.vectorstore.similarity_search_with_score(query, k=k)
 
-            # 결과 변환: (Document, distance) -> (text, metadata, similarity)
-            formatted = []
-            for doc, distance in results:
-                text = doc.page_content
-                meta = getattr(doc, "metadata", {}) or {}
-                similarity = 1.0 - float(distance)  # distance를 similarity로 변환
-                formatted.append((text, meta, similarity))
+        # 결과 변환: (Document, distance) -> (text, metadata, similarity)
+        formatted = []
+        for doc, distance in results:
+            text = doc.page_content
+            meta = getattr(doc, "metadata", {}) or {}
+            similarity = 1.0 - float(distance)  # distance를 similarity로 변환
+            formatted.append((text, meta, similarity))
 
-            return formatted
-
-        except Exception as e:
-            if DEBUG_RAW:
-                print(f"Vector search error: {e}")
-            return []
+        return formatted
 
     def _reciprocal_rank_fusion(
         self,
@@ -315,16 +722,38 @@ class HybridRetriever:
         # Top-k 반환
         return fused[:k]
 
-    def hybrid_search(
+    def _run_leg(self, fn, query: str, k: int) -> Dict[str, Any]:
+        """leg 하나를 실행하고 결과/상태/소요시간 기록 (스레드에서 호출)"""
+        started = time.perf_counter()
+        try:
+            results = fn(query, k=k)
+            status = "ok"
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"Hybrid leg error ({getattr(fn, '__name__', fn)}): {e}")
+            results, status = [], "error"
+        return {"results": results, "status": status, "ms": (time.perf_counter() - started) * 1000.0}
+
+    def _sparse_ready(self) -> bool:
+        """BM25 인덱스를 다른 스레드가 빌드 중이면 sparse leg를 건너뜀 (스레드 점유 방지)"""
+        return self._bm25_index is not None or not self._bm25_lock.locked()
+
+    def hybrid_search_detailed(
         self,
         query: str,
         k: int = 10,
         alpha: float = 0.5,
         k_rrf: int = 60,
-        fetch_k: int = None
-    ) -> List[Tuple[str, Dict, float]]:
+        fetch_k: int = None,
+        dense_timeout: Optional[float] = None,
+        sparse_timeout: Optional[float] = None,
+    ) -> Tuple[List[Tuple[str, Dict, float]], Dict[str, Any]]:
         """
-        Hybrid Search: Dense + Sparse 검색 결합
+        Hybrid Search + leg별 실행 정보
+
+        Dense / Sparse leg를 스레드 풀에서 동시에 실행하고 각 leg에 deadline을 둔다.
+        deadline을 넘긴 leg는 결과에서 빠지고 RRF는 나머지 leg만으로 순위를 만든다
+        (넘긴 leg의 스레드는 백그라운드에서 끝까지 실행됨).
 
         Args:
             query: 검색 쿼리
@@ -332,32 +761,103 @@ class HybridRetriever:
             alpha: Dense/Sparse 가중치 (0.5 = 동등 가중)
             k_rrf: RRF 상수
             fetch_k: Dense/Sparse 각각에서 가져올 문서 수 (default: k * 2)
+            dense_timeout: Dense leg 제한 시간 (초, default: HYBRID_DENSE_TIMEOUT, 0이면 무제한)
+            sparse_timeout: Sparse leg 제한 시간 (초, default: HYBRID_SPARSE_TIMEOUT, 0이면 무제한)
 
         Returns:
-            List of (document_text, metadata, rrf_score)
+            (List of (document_text, metadata, rrf_score), legs)
+            legs: {"dense": {...}, "sparse": {...}, "parallel": bool, "fused": int, "total_ms": float}
+                  leg별 {"status": ok|timeout|error|skipped, "ms": float, "count": int}
         """
+        started = time.perf_counter()
+        legs: Dict[str, Any] = {"parallel": HYBRID_PARALLEL}
         if not query or not query.strip():
-            return []
+            return [], legs
 
         # Fetch more candidates for fusion
         if fetch_k is None:
             fetch_k = k * 2
 
-        # Dense 검색
-        dense_results = self._vector_search(query, k=fetch_k)
+        timeouts = {
+            "dense": HYBRID_DENSE_TIMEOUT if dense_timeout is None else dense_timeout,
+            "sparse": HYBRID_SPARSE_TIMEOUT if sparse_timeout is None else sparse_timeout,
+        }
+        fns = {"dense": self._vector_search, "sparse": self._bm25_search}
+
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        if HYBRID_PARALLEL:
+            futures = {}
+            for name, fn in fns.items():
+                if name == "sparse" and not self._sparse_ready():
+                    outcomes[name] = {"results": [], "status": "skipped", "ms": 0.0}
+                    continue
+                futures[name] = _leg_executor().submit(self._run_leg, fn, query, fetch_k)
+            # deadline은 검색 시작 시점 기준, 짧은 deadline부터 대기 (leg끼리 대기 시간이 누적되지 않도록)
+            for name in sorted(futures, key=lambda n: timeouts[n] if timeouts[n] and timeouts[n] > 0 else float("inf")):
+                fut = futures[name]
+                limit = timeouts[name]
+                remaining = None
+                if limit and limit > 0:
+                    remaining = max(0.0, limit - (time.perf_counter() - started))
+                try:
+                    outcomes[name] = fut.result(timeout=remaining)
+                except FutureTimeout:
+                    fut.cancel()  # 아직 대기열에 있으면 실행하지 않음 (이미 실행 중이면 백그라운드에서 끝남)
+                    outcomes[name] = {"results": [], "status": "timeout", "ms": (time.perf_counter() - started) * 1000.0}
+        else:
+            for name, fn in fns.items():
+                outcomes[name] = self._run_leg(fn, query, fetch_k)
 
-        # Sparse 검색
-        sparse_results = self._bm25_search(query, k=fetch_k)
+        dense_results = outcomes["dense"]["results"]
+        sparse_results = outcomes["sparse"]["results"]
+        for name, out in outcomes.items():
+            legs[name] = {"status": out["status"], "ms": round(out["ms"], 1), "count": len(out["results"])}
 
-        # RRF Fusion
+        # RRF Fusion (한쪽 leg가 비면 나머지 leg 순위만으로 정렬됨)
         fused_results = self._reciprocal_rank_fusion(
             dense_results, sparse_results, k=k, alpha=alpha, k_rrf=k_rrf
         )
+        legs["fused"] = len(fused_results)
+        legs["total_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
 
         if DEBUG_RAW:
-            print(f"Hybrid search: Dense={len(dense_results)}, Sparse={len(sparse_results)}, Fused={len(fused_results)}")
+            print(
+                f"Hybrid search: Dense={len(dense_results)} ({legs['dense']['status']}, {legs['dense']['ms']}ms), "
+                f"Sparse={len(sparse_results)} ({legs['sparse']['status']}, {legs['sparse']['ms']}ms), "
+                f"Fused={len(fused_results)} in {legs['total_ms']}ms"
+            )
+
+        return fused_results, legs
+
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 10,
+        alpha: float = 0.5,
+        k_rrf: int = 60,
+        fetch_k: int = None
+    ) -> List[Tuple[str, Dict, float]]:
+        """
+        Hybrid Search: Dense + Sparse 검색 결합
 
-        return fused_results
+        Args:
+            query: 검색 쿼리
+            k: 최종 반환할 문서 수
+            alpha: Dense/Sparse 가중치 (0.5 = 동등 가중)
+            k_rrf: RRF 상수
+            fetch_k: Dense/Sparse 각각에서 가져올 문서 수 (default: k * 2)
+
+        Returns:
+            List of (document_text, metadata, rrf_score)
+        """
+        results, _legs = self.hybrid_search_detailed(query, k=k, alpha=alpha, k_rrf=k_rrf, fetch_k=fetch_k)
+        return results
+
+
+@lru_cache(maxsize=1)
+def _leg_executor() -> ThreadPoolExecutor:
+    """Dense/Sparse leg 공용 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=max(2, HYBRID_LEG_WORKERS), thread_name_prefix="hybrid-leg")
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1,187 @@
+"""Crash-safe publishing of on-disk index directories and their JSON manifests.
+
+Every builder (BM25, dense export, quantized / Matryoshka side indexes, ONNX
+cross-encoder export) writes into a ``staging_dir`` next to the final
+directory and writes its manifest there last. ``publish`` fsyncs the staged
+files and renames them to a versioned sibling ``.<name>.v-<ns>``. The final
+path is a symlink to the current version, and it is swapped with one atomic
+``os.replace``. Readers open files through the final path as before and see
+either the previous complete version or the new one, also after a crash
+mid-publish; superseded versions are removed afterwards (mapped pages stay
+valid under POSIX unlink semantics).
+
+Where symlinks are unavailable (e.g. Windows without the privilege), and once
+when migrating an existing plain directory, the swap is two renames with a
+short window without an index. A crash there leaves the final path missing, and
+``recover`` (run by ``read_manifest`` whenever a manifest is missing) puts
+the newest complete version back.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _fsync_path(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # 디렉터리 fsync를 지원하지 않는 플랫폼/파일시스템
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(directory: Path) -> None:
+    """Flush every file under ``directory``, then the directories themselves."""
+    directory = Path(directory)
+    for root, dirs, files in os.walk(directory, topdown=False):
+        for name in files:
+            _fsync_path(Path(root) / name)
+        _fsync_path(Path(root))
+
+
+def staging_dir(final_dir: Path) -> Path:
+    """Fresh sibling directory to build into before ``publish`` (or a delta rename)."""
+    final_dir = Path(final_dir)
+    tmp = final_dir.parent / f".{final_dir.name}.tmp-{os.getpid()}"
+    if tmp.exists():
+        shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    return tmp
+
+
+def _version_dir(final_dir: Path) -> Path:
+    return final_dir.parent / f".{final_dir.name}.v-{time.time_ns():020d}-{os.getpid()}"
+
+
+def _versions(final_dir: Path) -> List[Path]:
+    """Versioned siblings of ``final_dir``, oldest first (plus ``.old-*`` dirs left by earlier releases)."""
+    parent = final_dir.parent
+    if not parent.is_dir():
+        return []
+    found = list(parent.glob(f".{final_dir.name}.v-*")) + list(parent.glob(f".{final_dir.name}.old-*"))
+    return sorted((p for p in found if p.is_dir() and not p.is_symlink()), key=lambda p: p.stat().st_mtime_ns)
+
+
+def _point(final_dir: Path, version: Path) -> bool:
+    """Atomically point the ``final_dir`` symlink at ``version``; False when symlinks are unavailable."""
+    link = final_dir.parent / f".{final_dir.name}.link-{os.getpid()}"
+    try:
+        if link.is_symlink() or link.exists():
+            link.unlink()
+        os.symlink(version.name, link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        return False
+    try:
+        os.replace(link, final_dir)
+    except OSError:
+        link.unlink()
+        raise
+    return True
+
+
+def _collect(final_dir: Path) -> None:
+    """Remove versions other than the one ``final_dir`` points at."""
+    current = os.readlink(final_dir) if final_dir.is_symlink() else None
+    for version in _versions(final_dir):
+        if version.name != current:
+            shutil.rmtree(version, ignore_errors=True)
+
+
+def recover(final_dir: Path) -> bool:
+    """Restore the newest complete version when ``final_dir`` is missing (crash mid-publish); True if restored."""
+    final_dir = Path(final_dir)
+    if final_dir.exists():
+        return False
+    for version in reversed(_versions(final_dir)):
+        if not (version / MANIFEST_FILE).exists():
+            continue
+        try:
+            if not _point(final_dir, version):
+                os.replace(version, final_dir)
+        except OSError:
+            return final_dir.exists()
+        _fsync_path(final_dir.parent)
+        return True
+    return False
+
+
+def publish(tmp_dir: Path, final_dir: Path, is_valid: Optional[Callable[[Path], bool]] = None) -> Path:
+    """Fsync a fully written staging directory and atomically make it the current version of ``final_dir``.
+
+    If the swap fails but ``is_valid(final_dir)`` holds (another worker
+    published first), that index is kept and the staged version dropped.
+    """
+    tmp_dir, final_dir = Path(tmp_dir), Path(final_dir)
+    fsync_tree(tmp_dir)
+    version = _version_dir(final_dir)
+    os.replace(tmp_dir, version)
+    try:
+        if final_dir.exists() and not final_dir.is_symlink():
+            # 기존 일반 디렉터리(이전 형식 / symlink 미지원): 버전으로 옮긴 뒤 교체 (그 사이 crash는 recover가 복구)
+            os.replace(final_dir, _version_dir(final_dir))
+        if not _point(final_dir, version):
+            os.replace(version, final_dir)
+    except OSError:
+        recover(final_dir)
+        if is_valid is None or not is_valid(final_dir):
+            raise
+        shutil.rmtree(version, ignore_errors=True)
+        return final_dir
+    _fsync_path(final_dir.parent)
+    _collect(final_dir)
+    return final_dir
+
+
+def remove(final_dir: Path) -> None:
+    """Delete a published index: the final path and every version."""
+    final_dir = Path(final_dir)
+    if final_dir.is_symlink():
+        final_dir.unlink()
+    else:
+        shutil.rmtree(final_dir, ignore_errors=True)
+    for version in _versions(final_dir):
+        shutil.rmtree(version, ignore_errors=True)
+
+
+def read_manifest(
+    directory: Path,
+    format_name: Optional[str] = None,
+    version: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """Parsed manifest, or None when missing, unreadable or of another format/version."""
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        recover(directory)  # publish 도중 crash로 최종 경로가 빠졌으면 마지막 완성 버전 복구
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict):
+        return None
+    if format_name is not None and (data.get("format") != format_name or data.get("version") != version):
+        return None
+    return data
+
+
+def write_manifest(directory: Path, manifest: Dict[str, Any]) -> None:
+    """Atomically replace ``directory``'s manifest (written and fsynced under a temp name first)."""
+    directory = Path(directory)
+    tmp = directory / f".{MANIFEST_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(manifest, ensure_ascii=False, indent=2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, directory / MANIFEST_FILE)
+    _fsync_path(directory)
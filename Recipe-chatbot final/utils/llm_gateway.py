@@ -0,0 +1,487 @@
+"""LLM Gateway - pooled OpenAI clients with rate limiting, retries and usage accounting
+
+Every chat / moderation call of the nodes goes through one process-wide
+gateway instead of building a fresh ``ChatOpenAI`` / ``OpenAI()`` per call:
+
+- one client per (model, temperature, kwargs), all sharing one httpx
+  connection pool (keep-alive survives across requests). Async clients are
+  kept per event loop, since httpx async connections cannot cross loops, and
+  closed by ``aclose_loop`` (run by ``run_sync`` before its short-lived loops
+  shut down).
+- per-model token buckets for requests/min (``LLM_RPM``) and tokens/min
+  (``LLM_TPM``). Tokens are reserved from an estimate before the call and
+  reconciled with the reported usage afterwards.
+- per-model concurrency cap (``LLM_MAX_CONCURRENCY``). Callers waiting for
+  a slot block on a condition (sync) or a future (async) that ``release``
+  signals; only token-bucket waits are timed.
+- retries on 429 / 5xx / connection errors with exponential backoff and full
+  jitter (``Retry-After`` is honored). The clients themselves use
+  ``max_retries=0`` so retries are not stacked.
+- per-model call count, errors, retries, throttle wait, latency percentiles
+  and token usage (``GET /debug/llm_gateway``).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+
+from config.settings import (
+    LLM_RPM,
+    LLM_TPM,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TIMEOUT,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_EST_COMPLETION_TOKENS,
+    DEBUG_RAW,
+)
+from utils.async_runtime import on_loop_close
+
+
+_LATENCY_WINDOW = 1024
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units per minute up to one minute of burst; may go into debt on reconcile."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 when it is now); caller holds the lane lock."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) after the real usage is known."""
+        self.level = min(self.capacity, self.level - delta)
+
+
+class _Lane:
+    """Limits and counters of one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.lock = threading.Lock()
+        self.slot_free = threading.Condition(self.lock)  # sync 대기자: release()가 깨움
+        self.async_waiters: list = []  # (loop, future): release()가 모두 깨움
+        self.requests = TokenBucket(LLM_RPM) if LLM_RPM > 0 else None
+        self.tokens = TokenBucket(LLM_TPM) if LLM_TPM > 0 else None
+        self.max_inflight = max(1, LLM_MAX_CONCURRENCY)
+        self.inflight = 0
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttle_wait = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+
+    def _try_acquire(self, est_tokens: int) -> Optional[float]:
+        """Take a slot + budget and return 0; else the token-bucket wait, or None while no slot is free (lock held)."""
+        if self.inflight >= self.max_inflight:
+            return None
+        now = time.monotonic()
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None and est_tokens:
+            wait = max(wait, self.tokens.wait_time(est_tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None and est_tokens:
+            self.tokens.take(est_tokens)
+        self.inflight += 1
+        return 0.0
+
+    def acquire(self, est_tokens: int) -> None:
+        """Block until a slot and budget are taken."""
+        with self.slot_free:
+            while True:
+                wait = self._try_acquire(est_tokens)
+                if wait == 0:
+                    return
+                # 슬롯 대기는 release() 신호까지, token bucket 대기만 시간 제한
+                self.slot_free.wait(wait)
+
+    async def aacquire(self, est_tokens: int) -> None:
+        """Async ``acquire``: waits on a future resolved by ``release`` (the event loop is never blocked)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.lock:
+                wait = self._try_acquire(est_tokens)
+                if wait == 0:
+                    return
+                if wait is None:
+                    waiter = loop.create_future()
+                    self.async_waiters.append((loop, waiter))
+            if wait is not None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await waiter
+            finally:
+                with self.lock:
+                    try:
+                        self.async_waiters.remove((loop, waiter))
+                    except ValueError:
+                        pass  # release()가 이미 꺼냄
+
+    def _wake(self) -> None:
+        # caller holds self.lock
+        self.slot_free.notify_all()  # token bucket 대기 중인 스레드가 신호를 가로채지 않도록 모두 깨움
+        waiters, self.async_waiters = self.async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                pass  # loop가 이미 닫힘
+
+    def release(self, est_tokens: int, usage: Optional[Tuple[int, int]], latency: Optional[float], error: bool) -> None:
+        with self.lock:
+            self.inflight -= 1
+            self._wake()
+            if latency is not None:
+                self.calls += 1
+                self.latencies.append(latency)
+            if error:
+                self.errors += 1
+            if usage is not None:
+                self.input_tokens += usage[0]
+                self.output_tokens += usage[1]
+                if self.tokens is not None and est_tokens:
+                    self.tokens.adjust(usage[0] + usage[1] - est_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lat = sorted(self.latencies)
+            pct = lambda p: (lat[min(len(lat) - 1, int(p * len(lat)))] if lat else None)  # noqa: E731
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "inflight": self.inflight,
+                "throttle_wait_s": round(self.throttle_wait, 3),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "latency_ms": {
+                    "p50": pct(0.5) * 1000 if lat else None,
+                    "p95": pct(0.95) * 1000 if lat else None,
+                    "avg": (sum(lat) / len(lat)) * 1000 if lat else None,
+                },
+            }
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _text_of(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_text_of(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return " ".join(_text_of(v) for v in value)
+    content = getattr(value, "content", None)
+    if content is not None:
+        return _text_of(content)
+    to_string = getattr(value, "to_string", None)
+    if callable(to_string):
+        return to_string()
+    return str(value)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough prompt-size estimate (~2 chars per token for mixed Korean/English) plus the expected completion."""
+    return len(_text_of(value)) // 2 + 1 + max(0, LLM_EST_COMPLETION_TOKENS)
+
+
+def _usage_of(result: Any) -> Optional[Tuple[int, int]]:
+    # with_structured_output(..., include_raw=True) -> {"raw": AIMessage, "parsed": ...}
+    if isinstance(result, dict) and "raw" in result:
+        result = result["raw"]
+    meta = getattr(result, "usage_metadata", None)
+    if not meta:
+        return None
+    return int(meta.get("input_tokens", 0) or 0), int(meta.get("output_tokens", 0) or 0)
+
+
+def _retryable(err: BaseException) -> bool:
+    if isinstance(err, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    status = getattr(err, "status_code", None)
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def _retry_after(err: BaseException) -> float:
+    response = getattr(err, "response", None)
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except Exception:
+        return 0.0
+
+
+class LLMGateway:
+    """Process-wide entry point for chat / moderation calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lanes: Dict[str, _Lane] = {}
+        self._sync_http: Optional[httpx.Client] = None
+        self._sync_models: Dict[Tuple, ChatOpenAI] = {}
+        self._sync_openai: Optional[openai.OpenAI] = None
+        # event loop -> {"http": AsyncClient, "models": {...}, "openai": AsyncOpenAI}
+        self._loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+    # --- clients -------------------------------------------------------------
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=max(1, LLM_HTTP_MAX_CONNECTIONS),
+            max_keepalive_connections=max(1, LLM_HTTP_MAX_CONNECTIONS),
+        )
+
+    def _http(self) -> httpx.Client:
+        # caller holds self._lock
+        if self._sync_http is None:
+            self._sync_http = httpx.Client(limits=self._limits(), timeout=LLM_TIMEOUT)
+        return self._sync_http
+
+    def _async_state(self) -> Optional[Dict[str, Any]]:
+        # caller holds self._lock
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = {
+                "http": httpx.AsyncClient(limits=self._limits(), timeout=LLM_TIMEOUT),
+                "models": {},
+                "openai": None,
+            }
+            self._loop_state[loop] = state
+        return state
+
+    async def aclose_loop(self) -> None:
+        """Close the running loop's async HTTP client and drop its models (before the loop shuts down)."""
+        with self._lock:
+            try:
+                state = self._loop_state.pop(asyncio.get_running_loop(), None)
+            except RuntimeError:
+                state = None
+        if state is not None:
+            await state["http"].aclose()
+
+    def chat(self, model: str, temperature: float = 0.0, **kwargs: Any) -> ChatOpenAI:
+        """Pooled ``ChatOpenAI`` for (model, temperature, kwargs); bound to the running loop when called from async code."""
+        key = (model, float(temperature), json.dumps(kwargs, sort_keys=True, default=str))
+        with self._lock:
+            state = self._async_state()
+            models = state["models"] if state is not None else self._sync_models
+            llm = models.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    max_retries=0,
+                    timeout=LLM_TIMEOUT,
+                    stream_usage=True,
+                    http_client=self._http(),
+                    http_async_client=state["http"] if state is not None else None,
+                    **kwargs,
+                )
+                models[key] = llm
+            return llm
+
+    def openai_client(self) -> openai.OpenAI:
+        with self._lock:
+            if self._sync_openai is None:
+                self._sync_openai = openai.OpenAI(http_client=self._http(), max_retries=0, timeout=LLM_TIMEOUT)
+            return self._sync_openai
+
+    def async_openai_client(self) -> openai.AsyncOpenAI:
+        with self._lock:
+            state = self._async_state()
+            if state is None:
+                raise RuntimeError("async_openai_client() needs a running event loop")
+            if state["openai"] is None:
+                state["openai"] = openai.AsyncOpenAI(http_client=state["http"], max_retries=0, timeout=LLM_TIMEOUT)
+            return state["openai"]
+
+    def _lane(self, model: str) -> _Lane:
+        with self._lock:
+            lane = self._lanes.get(model)
+            if lane is None:
+                lane = self._lanes[model] = _Lane(model)
+            return lane
+
+    # --- admission -------------------------------------------------------------
+
+    def _acquire(self, lane: _Lane, est_tokens: int) -> None:
+        started = time.monotonic()
+        lane.acquire(est_tokens)
+        with lane.lock:
+            lane.throttle_wait += time.monotonic() - started
+
+    async def _aacquire(self, lane: _Lane, est_tokens: int) -> None:
+        started = time.monotonic()
+        await lane.aacquire(est_tokens)
+        with lane.lock:
+            lane.throttle_wait += time.monotonic() - started
+
+    def _backoff(self, lane: _Lane, attempt: int, err: BaseException) -> Optional[float]:
+        """Delay before the next attempt, or None when the error is final."""
+        if attempt >= LLM_MAX_RETRIES or not _retryable(err):
+            return None
+        with lane.lock:
+            lane.retries += 1
+        ceiling = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        delay = max(random.uniform(0, ceiling), _retry_after(err))
+        if DEBUG_RAW:
+            print(f"[LLM] {lane.model} retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.2f}s: {err}")
+        return delay
+
+    # --- calls -----------------------------------------------------------------
+
+    def call(self, fn: Callable[[], Any], model: str, est_tokens: int = 0) -> Any:
+        """Run a blocking client call under the model's limits with retries."""
+        lane = self._lane(model)
+        attempt = 0
+        while True:
+            self._acquire(lane, est_tokens)
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                lane.release(est_tokens, None, time.monotonic() - started, error=True)
+                delay = self._backoff(lane, attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            lane.release(est_tokens, _usage_of(result), time.monotonic() - started, error=False)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], model: str, est_tokens: int = 0) -> Any:
+        """Async ``call``; ``fn`` returns a fresh awaitable per attempt."""
+        lane = self._lane(model)
+        attempt = 0
+        while True:
+            await self._aacquire(lane, est_tokens)
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                lane.release(est_tokens, None, None, error=False)
+                raise
+            except Exception as e:
+                lane.release(est_tokens, None, time.monotonic() - started, error=True)
+                delay = self._backoff(lane, attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            lane.release(est_tokens, _usage_of(result), time.monotonic() - started, error=False)
+            return result
+
+    def invoke(self, runnable: Any, value: Any, model: Optional[str] = None) -> Any:
+        """``runnable.invoke(value)`` through the gateway (model defaults to ``runnable.model_name``)."""
+        model = model or getattr(runnable, "model_name", None) or "unknown"
+        return self.call(lambda: runnable.invoke(value), model, estimate_tokens(value))
+
+    async def ainvoke(self, runnable: Any, value: Any, model: Optional[str] = None) -> Any:
+        model = model or getattr(runnable, "model_name", None) or "unknown"
+        return await self.acall(lambda: runnable.ainvoke(value), model, estimate_tokens(value))
+
+    async def astream(self, runnable: Any, value: Any, model: Optional[str] = None) -> AsyncIterator[Any]:
+        """``runnable.astream(value)`` through the gateway; retried only while nothing has been yielded."""
+        model = model or getattr(runnable, "model_name", None) or "unknown"
+        est_tokens = estimate_tokens(value)
+        lane = self._lane(model)
+        attempt = 0
+        while True:
+            await self._aacquire(lane, est_tokens)
+            started = time.monotonic()
+            usage = [0, 0]
+            seen_usage = False
+            yielded = False
+            released = False
+            try:
+                async for chunk in runnable.astream(value):
+                    got = _usage_of(chunk)
+                    if got is not None:
+                        usage[0] += got[0]
+                        usage[1] += got[1]
+                        seen_usage = True
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                lane.release(est_tokens, tuple(usage) if seen_usage else None, time.monotonic() - started, error=True)
+                released = True
+                delay = None if yielded else self._backoff(lane, attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                if not released:
+                    # normal end, or the consumer stopped iterating / was cancelled
+                    lane.release(est_tokens, tuple(usage) if seen_usage else None, time.monotonic() - started, error=False)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {
+            "limits": {
+                "rpm": LLM_RPM,
+                "tpm": LLM_TPM,
+                "max_concurrency": LLM_MAX_CONCURRENCY,
+                "max_retries": LLM_MAX_RETRIES,
+            },
+            "models": {name: lane.stats() for name, lane in lanes.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide LLM gateway."""
+    gateway = LLMGateway()
+    on_loop_close(gateway.aclose_loop)
+    return gateway
@@ -0,0 +1,95 @@
+"""Local Embeddings - small multilingual sentence-embedding model on CPU
+
+The OOD guard, the local intent router and the answer-cache lookup only compare
+the query with a few dozen prototypes or cached queries, so they do not need
+the collection's 3072-dim OpenAI embedding. With ``GUARD_EMBEDDING_BACKEND=local``
+they embed the query in-process with ``LOCAL_EMBEDDING_MODEL`` instead. The
+default is multilingual MiniLM: 384 dims, Korean and English. This takes the
+embeddings API round trip off the front of every request; retrieval keeps
+``EMBEDDING_MODEL``.
+
+The model is loaded through sentence-transformers with the ONNX Runtime backend
+and the quantized weights named by ``LOCAL_EMBEDDING_ONNX_FILE``. It falls back
+to the PyTorch weights when ONNX Runtime (``optimum[onnxruntime]``) or that file
+is unavailable. Vectors are unit-normalized.
+
+Callers go through ``get_cached_embeddings("local:<model>")`` so the usual
+LRU / SQLite cache sits in front of it.
+"""
+from __future__ import annotations
+
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.settings import LOCAL_EMBEDDING_ONNX_FILE
+from utils.async_runtime import run_cpu
+
+
+LOCAL_PREFIX = "local:"
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` backed by a sentence-transformers model on CPU (loaded on first use)."""
+
+    def __init__(self, model_name: str, onnx_file: Optional[str] = LOCAL_EMBEDDING_ONNX_FILE, batch_size: int = 32):
+        self.model_name = model_name
+        self.onnx_file = onnx_file or None
+        self.batch_size = batch_size
+        self.backend: Optional[str] = None  # "onnx:<file>" | "torch" once loaded
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    model = None
+                    if self.onnx_file:
+                        try:
+                            model = SentenceTransformer(
+                                self.model_name,
+                                device="cpu",
+                                backend="onnx",
+                                model_kwargs={"file_name": self.onnx_file},
+                            )
+                            self.backend = f"onnx:{self.onnx_file}"
+                        except Exception as e:
+                            print(f"[LocalEmbeddings] ONNX weights unavailable ({e}); using PyTorch weights")
+                    if model is None:
+                        model = SentenceTransformer(self.model_name, device="cpu")
+                        self.backend = "torch"
+                    self._model = model
+        return self._model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_cpu(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await run_cpu(self.embed_query, text)
+
+    def warm_up(self) -> None:
+        """Load the weights and run one forward pass (ONNX session init) before serving."""
+        self._encode(["warm-up"])
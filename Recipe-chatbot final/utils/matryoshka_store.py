@@ -0,0 +1,174 @@
+"""Matryoshka two-stage dense search: truncated-prefix scan + full-dimension rescoring
+
+text-embedding-3 vectors keep most of their quality when truncated to a
+prefix and renormalized. The first ``MATRYOSHKA_PREFIX_DIM`` dimensions of the
+float32 export (``utils.numpy_store``) are written, L2-normalized, to a sibling
+directory ``<collection>.mrl-<dim>/`` and loaded fully into RAM:
+
+    manifest.json      format/version, prefix_dim, collection, doc_count, fingerprint of the export
+    prefix.npy         float32 (N, prefix_dim), unit rows
+
+A query scans the whole corpus on the prefix (cosine), keeps the best
+``MATRYOSHKA_CANDIDATES`` rows and rescores only those with the full vectors
+read lazily from the memory-mapped export, in the collection's distance space.
+"""
+from __future__ import annotations
+
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import index_publish
+from utils.file_lock import build_lock
+from utils.numpy_store import NumpyVectorStore, _MAX_SCORE_CELLS, ensure_export
+from utils.numpy_store import read_manifest as read_dense_manifest
+from config.settings import (
+    NUMPY_STORE_DIR,
+    MATRYOSHKA_PREFIX_DIM,
+    MATRYOSHKA_CANDIDATES,
+    DEBUG_RAW,
+)
+
+
+FORMAT_NAME = "dense-mrl"
+FORMAT_VERSION = 1
+_BLOCK_ROWS = 4096
+
+
+def prefix_dir(dense_dir: Path, prefix_dim: int) -> Path:
+    dense_dir = Path(dense_dir)
+    return dense_dir.parent / f"{dense_dir.name}.mrl-{int(prefix_dim)}"
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    return index_publish.read_manifest(directory, FORMAT_NAME, FORMAT_VERSION)
+
+
+def manifest_matches(manifest: Optional[Dict[str, Any]], dense: Optional[Dict[str, Any]], prefix_dim: int) -> bool:
+    """True when the prefix matrix was cut from this exact float32 export."""
+    if not manifest or not dense or int(manifest.get("prefix_dim", -1)) != int(prefix_dim):
+        return False
+    return all(manifest.get(key) == dense.get(key) for key in ("collection", "doc_count", "dim", "fingerprint"))
+
+
+def normalized_prefix(vectors: np.ndarray, prefix_dim: int) -> np.ndarray:
+    """First ``prefix_dim`` dimensions of each row, renormalized to unit length."""
+    prefix = np.array(vectors[..., :prefix_dim], dtype=np.float32)
+    prefix /= np.maximum(np.linalg.norm(prefix, axis=-1, keepdims=True), 1e-12)
+    return prefix
+
+
+def build_prefix(dense_dir: Path, prefix_dim: int, out_dir: Optional[Path] = None, progress=print) -> Path:
+    """Cut and normalize the prefix matrix of a float32 export and publish it."""
+    dense_dir = Path(dense_dir)
+    dense = read_dense_manifest(dense_dir)
+    if dense is None:
+        raise FileNotFoundError(f"no dense export at {dense_dir}")
+    dim = int(dense["dim"])
+    if not 0 < int(prefix_dim) < dim:
+        raise ValueError(f"prefix_dim must be in (0, {dim}), got {prefix_dim}")
+    out_dir = Path(out_dir) if out_dir is not None else prefix_dir(dense_dir, prefix_dim)
+    report = progress or (lambda _msg: None)
+    rows = int(dense["doc_count"])
+    matrix = np.load(dense_dir / "embeddings.npy", mmap_mode="r")[:rows]
+
+    started = time.perf_counter()
+    tmp = index_publish.staging_dir(out_dir)
+    try:
+        prefix = np.lib.format.open_memmap(tmp / "prefix.npy", mode="w+", dtype=np.float32, shape=(rows, int(prefix_dim)))
+        for start in range(0, rows, _BLOCK_ROWS):
+            end = min(rows, start + _BLOCK_ROWS)
+            prefix[start:end] = normalized_prefix(matrix[start:end], int(prefix_dim))
+        prefix.flush()
+        del prefix
+        index_publish.write_manifest(tmp, {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "prefix_dim": int(prefix_dim),
+            "collection": dense.get("collection"),
+            "doc_count": rows,
+            "dim": dim,
+            "fingerprint": dense.get("fingerprint"),
+        })
+        published = index_publish.publish(tmp, out_dir, lambda d: read_manifest(d) is not None)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    report(f"[Dense] prefix {rows:,} x {prefix_dim} in {time.perf_counter() - started:.1f}s -> {published}")
+    return published
+
+
+class MatryoshkaVectorStore(NumpyVectorStore):
+    """``NumpyVectorStore`` whose top-k prefilters on a resident prefix matrix and rescores in full dimension."""
+
+    def __init__(
+        self,
+        dense_dir: Path,
+        prefix_directory: Path,
+        embedding_function,
+        collection=None,
+        fallback=None,
+        candidates: int = MATRYOSHKA_CANDIDATES,
+    ):
+        super().__init__(dense_dir, embedding_function, collection=collection, fallback=fallback)
+        manifest = read_manifest(prefix_directory)
+        if manifest is None or not manifest_matches(manifest, self.manifest, manifest.get("prefix_dim", -1)):
+            raise FileNotFoundError(f"no up-to-date prefix matrix at {prefix_directory}")
+        self.prefix_dim = int(manifest["prefix_dim"])
+        self.candidates = max(1, int(candidates))
+        # 1단계 스캔용 prefix는 메모리에 상주 (전체 차원 행렬은 memory-map 그대로)
+        self.prefix = np.load(Path(prefix_directory) / "prefix.npy")
+
+    def memory_bytes(self) -> int:
+        """Resident bytes of the first stage; full vectors are only paged in for rescoring."""
+        return int(self.prefix.nbytes + self.norms.nbytes)
+
+    def _top_k(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        n = int(self.prefix.shape[0])
+        k = min(int(k), n)
+        if k <= 0:
+            return [(np.empty(0, np.int64), np.empty(0, np.float32)) for _ in range(queries.shape[0])]
+        cand = min(n, max(k, self.candidates))
+        out = []
+        step = max(1, _MAX_SCORE_CELLS // max(1, n))
+        for start in range(0, queries.shape[0], step):
+            block = queries[start:start + step]
+            sims = normalized_prefix(block, self.prefix_dim) @ self.prefix.T
+            part = np.argpartition(-sims, cand - 1, axis=1)[:, :cand] if cand < n else np.tile(np.arange(n), (block.shape[0], 1))
+            for q, rows in zip(block, part):
+                rows = np.sort(rows)  # 후보 행을 파일 순서대로 읽기
+                dist = self._distances(q[None, :], rows)[0]
+                order = np.lexsort((rows, dist))[:k]
+                out.append((rows[order].astype(np.int64), dist[order]))
+        return out
+
+
+def open_matryoshka_store(
+    chroma,
+    prefix_dim: int = MATRYOSHKA_PREFIX_DIM,
+    index_root: Path = NUMPY_STORE_DIR,
+    progress=None,
+) -> MatryoshkaVectorStore:
+    """Open (exporting / cutting the prefix first when missing or stale) the two-stage store for a langchain Chroma instance."""
+    report = progress or (print if DEBUG_RAW else None)
+    dense_dir = ensure_export(chroma, index_root, progress=report)
+    out_dir = prefix_dir(dense_dir, prefix_dim)
+
+    def _fresh() -> bool:
+        return manifest_matches(read_manifest(out_dir), read_dense_manifest(dense_dir), prefix_dim)
+
+    if not _fresh():
+        with build_lock(out_dir):
+            if not _fresh():
+                build_prefix(dense_dir, prefix_dim, out_dir, progress=report)
+
+    return MatryoshkaVectorStore(
+        dense_dir,
+        out_dir,
+        embedding_function=chroma.embeddings,
+        collection=chroma._collection,
+        fallback=chroma,
+    )
@@ -0,0 +1,303 @@
+"""NumPy exact-search vectorstore (read path) over a memory-mapped collection export
+
+The Chroma collection is exported once into a directory that every worker
+memory-maps:
+
+    manifest.json                 format/version, collection, doc_count, dim, space, fingerprint
+    embeddings.npy                float32 (N, D), row i == chunk i
+    sq_norms.npy                  float32 (N,) squared L2 norms
+    ids.* / texts.* / metas.*     chunk IDs, document texts, JSON metadata (utils.bm25_store tables)
+
+A query is one BLAS matrix-vector product plus ``argpartition`` top-k (a batch
+of queries is one matrix-matrix product). Distances follow the collection's
+``hnsw:space`` exactly like Chroma (l2 = squared euclidean, cosine = 1 - cos,
+ip = 1 - dot), so callers that turn distances into ``1 - distance`` keep
+working. ``_collection`` still points at the Chroma collection for counts and
+the BM25 builder; metadata filters are delegated to the Chroma vectorstore.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils import bm25_store, index_publish
+from utils.file_lock import build_lock
+from config.settings import (
+    NUMPY_STORE_DIR,
+    NUMPY_STORE_PAGE_SIZE,
+    NUMPY_STORE_VERIFY_FINGERPRINT,
+    DEBUG_RAW,
+)
+
+
+FORMAT_NAME = "dense-f32"
+FORMAT_VERSION = 1
+_MAX_SCORE_CELLS = 1 << 26  # (queries x docs) floats per matrix-matrix block
+
+
+def collection_space(collection) -> str:
+    meta = getattr(collection, "metadata", None) or {}
+    space = str(meta.get("hnsw:space", "l2")).lower()
+    return space if space in ("l2", "cosine", "ip") else "l2"
+
+
+def space_distances(space: str, queries: np.ndarray, dots: np.ndarray, sq_norms: np.ndarray, norms: np.ndarray) -> np.ndarray:
+    """Chroma-compatible distances from (Q, N) dot products and the rows' (squared) norms."""
+    if space == "ip":
+        return 1.0 - dots
+    if space == "cosine":
+        q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        return 1.0 - dots / np.maximum(q_norms * norms[None, :], 1e-12)
+    q_sq = np.einsum("ij,ij->i", queries, queries)[:, None]
+    return np.maximum(q_sq + sq_norms[None, :] - 2.0 * dots, 0.0)
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    return index_publish.read_manifest(directory, FORMAT_NAME, FORMAT_VERSION)
+
+
+def export_collection(
+    collection,
+    out_dir: Path,
+    collection_name: Optional[str] = None,
+    page_size: int = NUMPY_STORE_PAGE_SIZE,
+    progress=print,
+) -> Optional[Path]:
+    """Page embeddings/documents/metadata out of Chroma and publish them to ``out_dir``.
+
+    Returns the published directory, or None when the collection is empty.
+    """
+    out_dir = Path(out_dir)
+    name = collection_name or getattr(collection, "name", None) or out_dir.name
+    report = progress or (lambda _msg: None)
+    total = int(collection.count())
+    if total <= 0:
+        report(f"[Dense] collection '{name}' is empty, nothing to export")
+        return None
+
+    started = time.perf_counter()
+    tmp = index_publish.staging_dir(out_dir)
+    try:
+        writers = {n: bm25_store.StringTableWriter(tmp, n) for n in ("ids", "texts", "metas")}
+        digests: Dict[str, bytes] = {}
+        matrix = None
+        rows = 0
+        offset = 0
+        while offset < total:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=max(1, int(page_size)), offset=offset
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            emb = np.asarray(page.get("embeddings"), dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    tmp / "embeddings.npy", mode="w+", dtype=np.float32, shape=(total, emb.shape[1])
+                )
+            n = min(len(ids), total - rows)
+            matrix[rows:rows + n] = emb[:n]
+            docs = page.get("documents") or [""] * len(ids)
+            metas = page.get("metadatas") or [{}] * len(ids)
+            writers["ids"].extend(ids[:n])
+            writers["texts"].extend(d or "" for d in docs[:n])
+            writers["metas"].extend(bm25_store.encode_meta(m) for m in metas[:n])
+            for chunk_id, doc, meta in zip(ids[:n], docs[:n], metas[:n]):
+                digests[chunk_id] = bm25_store.doc_digest(doc, meta)
+            rows += n
+            offset += len(ids)
+            report(f"[Dense] exported {rows:,}/{total:,} vectors")
+            if rows >= total:
+                break
+        for writer in writers.values():
+            writer.close()
+        if matrix is None:
+            raise RuntimeError("collection returned no embeddings")
+
+        sq_norms = np.einsum("ij,ij->i", matrix[:rows], matrix[:rows]).astype(np.float32)
+        dim = int(matrix.shape[1])
+        matrix.flush()
+        del matrix
+        np.save(tmp / "sq_norms.npy", sq_norms)
+        index_publish.write_manifest(tmp, {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "collection": name,
+            "doc_count": rows,
+            "dim": dim,
+            "space": collection_space(collection),
+            "fingerprint": bm25_store.content_fingerprint(digests),
+        })
+        published = index_publish.publish(tmp, out_dir, lambda d: read_manifest(d) is not None)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    report(f"[Dense] export done: {rows:,} x {dim} in {time.perf_counter() - started:.1f}s -> {published}")
+    return published
+
+
+def _mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Maximal marginal relevance over cosine similarity (same selection as langchain's helper)."""
+    if candidates.shape[0] == 0 or k <= 0:
+        return []
+    cand = candidates.astype(np.float32)
+    cand_n = cand / np.maximum(np.linalg.norm(cand, axis=1, keepdims=True), 1e-12)
+    q = query / max(float(np.linalg.norm(query)), 1e-12)
+    sim_q = cand_n @ q
+    selected = [int(np.argmax(sim_q))]
+    # 후보 간 최대 유사도를 선택할 때마다 갱신 (O(k * fetch_k * D))
+    max_sim_sel = cand_n @ cand_n[selected[0]]
+    while len(selected) < min(k, cand.shape[0]):
+        score = lambda_mult * sim_q - (1.0 - lambda_mult) * max_sim_sel
+        score[selected] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        np.maximum(max_sim_sel, cand_n @ cand_n[best], out=max_sim_sel)
+    return selected
+
+
+class NumpyVectorStore:
+    """Read-only exact-search store with the Chroma vectorstore surface used by this app."""
+
+    def __init__(self, directory: Path, embedding_function, collection=None, fallback=None):
+        directory = Path(directory)
+        manifest = read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"no dense export at {directory}")
+        rows = int(manifest["doc_count"])
+        self.manifest = manifest
+        self.space = manifest.get("space", "l2")
+        self.matrix = np.load(directory / "embeddings.npy", mmap_mode="r")[:rows]
+        self.sq_norms = np.load(directory / "sq_norms.npy", mmap_mode="r")[:rows]
+        self.norms = np.sqrt(np.asarray(self.sq_norms, dtype=np.float32))
+        self.ids = bm25_store.StringTable.open(directory, "ids")
+        self.texts = bm25_store.StringTable.open(directory, "texts")
+        self.metas = bm25_store.StringTable.open(directory, "metas", decode=json.loads)
+        self._embedding_function = embedding_function
+        self._collection = collection
+        self._fallback = fallback
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    # ---- scoring -------------------------------------------------------------------------
+
+    def _distances(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(Q, N) distances in the collection's space (one GEMV/GEMM over the mapped matrix).
+
+        ``rows`` restricts the product to those matrix rows (only their pages are read).
+        """
+        if rows is None:
+            matrix, sq_norms, norms = self.matrix, self.sq_norms, self.norms
+        else:
+            matrix, sq_norms, norms = np.asarray(self.matrix[rows]), self.sq_norms[rows], self.norms[rows]
+        return space_distances(self.space, queries, queries @ matrix.T, sq_norms, norms)
+
+    def _top_k(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        n = int(self.matrix.shape[0])
+        k = min(int(k), n)
+        if k <= 0:
+            return [(np.empty(0, np.int64), np.empty(0, np.float32)) for _ in range(queries.shape[0])]
+        out = []
+        step = max(1, _MAX_SCORE_CELLS // max(1, n))
+        for start in range(0, queries.shape[0], step):
+            dist = self._distances(queries[start:start + step])
+            part = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (dist.shape[0], 1))
+            for row, idx in zip(dist, part):
+                d = row[idx]
+                order = np.lexsort((idx, d))
+                out.append((idx[order].astype(np.int64), d[order]))
+        return out
+
+    def _docs(self, idx: np.ndarray) -> List[Document]:
+        docs = []
+        for i in idx.tolist():
+            docs.append(Document(page_content=self.texts[i], metadata=self.metas[i] or {}, id=self.ids[i]))
+        return docs
+
+    def _embed(self, text: str) -> np.ndarray:
+        return np.asarray(self._embedding_function.embed_query(text), dtype=np.float32)
+
+    # ---- vectorstore surface -------------------------------------------------------------
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        idx, dist = self._top_k(np.asarray(embedding, dtype=np.float32)[None, :], k)[0]
+        return list(zip(self._docs(idx), dist.astype(float).tolist()))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        if filter is not None or kwargs.get("where_document") is not None:
+            if self._fallback is None:
+                raise NotImplementedError("metadata filters need the Chroma backend")
+            return self._fallback.similarity_search_with_score(query, k=k, filter=filter, **kwargs)
+        return self.similarity_search_by_vector_with_score(self._embed(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def similarity_search_with_score_batch(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Several queries in one embedding call and one matrix-matrix product."""
+        if not queries:
+            return []
+        q = np.asarray(self._embedding_function.embed_documents(list(queries)), dtype=np.float32)
+        return [
+            list(zip(self._docs(idx), dist.astype(float).tolist()))
+            for idx, dist in self._top_k(q, k)
+        ]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter=None,
+        **kwargs,
+    ) -> List[Document]:
+        if filter is not None or kwargs.get("where_document") is not None:
+            if self._fallback is None:
+                raise NotImplementedError("metadata filters need the Chroma backend")
+            return self._fallback.max_marginal_relevance_search(
+                query, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter, **kwargs
+            )
+        q = self._embed(query)
+        idx, _dist = self._top_k(q[None, :], max(k, fetch_k))[0]
+        picked = _mmr(q, np.asarray(self.matrix[idx]), k, lambda_mult)
+        return self._docs(idx[picked])
+
+
+def ensure_export(chroma, index_root: Path = NUMPY_STORE_DIR, progress=None) -> Path:
+    """Directory of an up-to-date float32 export of ``chroma``'s collection (exported when missing or stale)."""
+    collection = chroma._collection
+    name = getattr(collection, "name", None) or "default"
+    out_dir = Path(index_root) / name
+    report = progress or (print if DEBUG_RAW else None)
+
+    def _fresh() -> bool:
+        manifest = read_manifest(out_dir)
+        fingerprint = bm25_store.collection_fingerprint(collection) if NUMPY_STORE_VERIFY_FINGERPRINT else None
+        return bm25_store.manifest_matches(manifest, name, collection.count(), fingerprint)
+
+    if not _fresh():
+        with build_lock(out_dir):
+            if not _fresh():
+                if export_collection(collection, out_dir, collection_name=name, progress=report) is None:
+                    raise RuntimeError(f"collection '{name}' is empty")
+    return out_dir
+
+
+def open_numpy_store(chroma, index_root: Path = NUMPY_STORE_DIR, progress=None) -> NumpyVectorStore:
+    """Open (exporting first when missing or stale) the NumPy store for a langchain Chroma instance."""
+    return NumpyVectorStore(
+        ensure_export(chroma, index_root, progress),
+        embedding_function=chroma.embeddings,
+        collection=chroma._collection,
+        fallback=chroma,
+    )
@@ -0,0 +1,222 @@
+"""Prototype Store - labeled example texts embedded once into a persisted NumPy matrix
+
+Local classifiers (intent router, OOD guard) compare a query embedding with a
+small set of labeled prototype sentences kept in a JSON file under
+``config/``. Their embeddings are written next to that JSON as
+
+    <json stem>.<model>.<fingerprint>.npy     float32 (N, D), unit rows
+
+where the fingerprint covers the embedding model and the ordered
+(label, text) pairs. Editing the JSON or switching the model therefore points
+to a new file; the matching one is memory-mapped, and a missing one is
+embedded in a single batch and saved (older versions are removed). Build
+offline with:
+
+    python -m utils.prototype_store config/intent_prototypes.json
+    python -m utils.prototype_store config/ood_prototypes.json
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+
+def fingerprint(model: str, labels: Sequence[str], texts: Sequence[str]) -> str:
+    h = hashlib.sha1(model.encode("utf-8"))
+    for label, text in zip(labels, texts):
+        h.update(b"\x1e" + label.encode("utf-8") + b"\x1f" + text.encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def _model_slug(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model).strip("_") or "model"
+
+
+def matrix_path(json_path: Path, model: str, fp: str) -> Path:
+    json_path = Path(json_path)
+    return json_path.with_name(f"{json_path.stem}.{_model_slug(model)}.{fp}.npy")
+
+
+def load_labeled(json_path: Path, key: str) -> Tuple[List[str], List[str]]:
+    """(labels, texts) from ``{key: {label: [text, ...]}}`` in ``json_path``.
+
+    A flat ``{key: [text, ...]}`` list is read as a single class labeled ``key``.
+    """
+    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
+    labels: List[str] = []
+    texts: List[str] = []
+    section = data.get(key) or {}
+    if isinstance(section, list):
+        section = {key: section}
+    for label, items in section.items():
+        for text in items or []:
+            if isinstance(text, str) and text.strip():
+                labels.append(str(label))
+                texts.append(text.strip())
+    return labels, texts
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    mat = np.asarray(vectors, dtype=np.float32)
+    mat /= np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+    return mat
+
+
+def load_matrix(json_path: Path, model: str, labels: Sequence[str], texts: Sequence[str]) -> Optional[np.ndarray]:
+    """Memory-mapped prototype matrix for exactly these texts and model, or None when not built."""
+    path = matrix_path(json_path, model, fingerprint(model, labels, texts))
+    if not path.exists():
+        return None
+    mat = np.load(path, mmap_mode="r")
+    if mat.ndim != 2 or mat.shape[0] != len(texts):
+        return None
+    return mat
+
+
+def build_matrix(json_path: Path, model: str, labels: Sequence[str], texts: Sequence[str], embeddings) -> np.ndarray:
+    """Embed ``texts`` (one batch) and save the versioned matrix next to the JSON; returns the matrix."""
+    mat = _unit_rows(embeddings.embed_documents(list(texts)))
+    path = matrix_path(json_path, model, fingerprint(model, labels, texts))
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, mat)
+        os.replace(tmp, path)
+        for stale in path.parent.glob(f"{Path(json_path).stem}.{_model_slug(model)}.*.npy"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    except OSError as e:
+        # read-only deploy: keep the in-memory matrix
+        print(f"[Prototypes] could not save {path.name}: {e}")
+    return mat
+
+
+def load_or_build(json_path: Path, model: str, labels: Sequence[str], texts: Sequence[str], embeddings) -> np.ndarray:
+    mat = load_matrix(json_path, model, labels, texts)
+    if mat is None:
+        mat = build_matrix(json_path, model, labels, texts, embeddings)
+    return mat
+
+
+class PrototypeClassifier:
+    """Nearest-centroid / top-k prototype scoring over unit-normalized prototype rows."""
+
+    def __init__(self, matrix: np.ndarray, labels: Sequence[str]):
+        self.matrix = matrix
+        self.labels = np.asarray(labels)
+        self.classes: List[str] = list(dict.fromkeys(labels))
+        rows = np.asarray(matrix, dtype=np.float32)
+        self._rows_by_class = [np.flatnonzero(self.labels == c) for c in self.classes]
+        centroids = np.stack([rows[idx].mean(axis=0) for idx in self._rows_by_class])
+        self.centroids = _unit_rows(centroids)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return q / max(float(np.linalg.norm(q)), 1e-12)
+
+    def scores(self, vector) -> np.ndarray:
+        """Cosine similarity of the query to every class centroid (order of ``classes``)."""
+        return self.centroids @ self._unit(vector)
+
+    def topk_mean(self, vector, k: int) -> Dict[str, float]:
+        """Per class, the mean of the ``k`` highest prototype similarities (one product over all rows)."""
+        sims = self.matrix @ self._unit(vector)
+        out: Dict[str, float] = {}
+        for c, idx in zip(self.classes, self._rows_by_class):
+            row = sims[idx]
+            n = min(max(1, int(k)), row.shape[0])
+            out[c] = float(np.partition(row, row.shape[0] - n)[-n:].mean())
+        return out
+
+    def classify(self, vector) -> Dict[str, Any]:
+        """{label, score, margin (top1 - top2), scores}."""
+        sims = self.scores(vector)
+        order = np.argsort(-sims)
+        top = int(order[0])
+        second = float(sims[order[1]]) if len(order) > 1 else -1.0
+        return {
+            "label": self.classes[top],
+            "score": float(sims[top]),
+            "margin": float(sims[top]) - second,
+            "scores": {c: float(s) for c, s in zip(self.classes, sims)},
+        }
+
+
+T = TypeVar("T")
+
+
+def cache_loaded(retry_after: float) -> Callable[[Callable[[], Optional[T]]], Callable[[], Optional[T]]]:
+    """Cache a zero-argument loader's first non-None result.
+
+    A None result (load failed, or embeddings unavailable) is not cached: the
+    loader runs again on the first call after ``retry_after`` seconds and the
+    calls in between return None at once. ``cache_clear()`` forgets both.
+    """
+    def decorate(loader: Callable[[], Optional[T]]) -> Callable[[], Optional[T]]:
+        lock = threading.Lock()
+        state: Dict[str, Any] = {"value": None, "retry_at": 0.0}
+
+        @functools.wraps(loader)
+        def load() -> Optional[T]:
+            value = state["value"]
+            if value is not None:
+                return value
+            with lock:
+                if state["value"] is None and time.monotonic() >= state["retry_at"]:
+                    state["value"] = loader()
+                    if state["value"] is None:
+                        state["retry_at"] = time.monotonic() + retry_after
+                return state["value"]
+
+        def cache_clear() -> None:
+            with lock:
+                state.update(value=None, retry_at=0.0)
+
+        load.cache_clear = cache_clear  # type: ignore[attr-defined]
+        return load
+
+    return decorate
+
+
+def main() -> int:
+    import argparse
+
+    from config.settings import GUARD_EMBEDDING_MODEL
+    from utils.embedding_cache import get_cached_embeddings
+
+    ap = argparse.ArgumentParser(description="Embed a prototype JSON into its versioned .npy")
+    ap.add_argument("json_path")
+    ap.add_argument(
+        "--key", action="append", default=None,
+        help="Top-level key holding {label: [texts]} or [texts]; repeatable (default: every key, in file order)",
+    )
+    ap.add_argument(
+        "--model", default=GUARD_EMBEDDING_MODEL,
+        help="Embedding model the router / OOD guard score with (default: GUARD_EMBEDDING_MODEL)",
+    )
+    args = ap.parse_args()
+
+    keys = args.key or list(json.loads(Path(args.json_path).read_text(encoding="utf-8")))
+    labels, texts = [], []
+    for key in keys:
+        key_labels, key_texts = load_labeled(Path(args.json_path), key)
+        labels += key_labels
+        texts += key_texts
+    mat = build_matrix(Path(args.json_path), args.model, labels, texts, get_cached_embeddings(args.model))
+    print(f"[Prototypes] {len(texts)} x {mat.shape[1]} -> {matrix_path(Path(args.json_path), args.model, fingerprint(args.model, labels, texts))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
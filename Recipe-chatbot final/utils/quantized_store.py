@@ -0,0 +1,342 @@
+"""Quantized dense vectorstore: int8 / product-quantized scan + float32 re-rank
+
+Built from the float32 export of ``utils.numpy_store`` (which is built from
+the Chroma collection) into a sibling directory ``<collection>.<mode>/``:
+
+    manifest.json          format/version, mode, params, collection, doc_count, fingerprint of the export
+    codes.npy              int8 (N, D) scalar codes   |   uint8 (M, N) PQ codes (subspace-major)
+    scale.npy / offset.npy per-dimension int8 scale   (x ~ offset + code * scale)
+    centroids.npy          float32 (M, 256, D / M) PQ codebooks
+    recon_sq_norms.npy     float32 (N,) squared norms of the reconstructed vectors
+
+A query scans the codes with vectorized NumPy kernels (int8: cache-sized blocks
+dequantized into a reused float32 buffer, one GEMM each; PQ: per-subspace
+lookup tables summed with gathers), keeps the
+``QUANT_RERANK_CANDIDATES`` best rows and re-ranks them with exact float32
+distances read from the memory-mapped export, so only those rows are paged in.
+Resident memory per worker is the codes (D or M bytes per vector) instead of
+4 * D bytes; the mapped files are shared through the page cache.
+
+The int8 scan is about as fast as the float32 scan, not faster: NumPy has no
+BLAS kernel for integer matrix products (int8 x int8 -> int32 measured ~6x
+slower than the float32 GEMV), so codes are widened to float32 block by block
+and the conversion costs about what the smaller read saves. The gain is
+memory, not latency.
+"""
+from __future__ import annotations
+
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import index_publish
+from utils.file_lock import build_lock
+from utils.numpy_store import (
+    NumpyVectorStore,
+    _MAX_SCORE_CELLS,
+    ensure_export,
+    space_distances,
+)
+from utils.numpy_store import read_manifest as read_dense_manifest
+from config.settings import (
+    NUMPY_STORE_DIR,
+    QUANT_RERANK_CANDIDATES,
+    QUANT_PQ_SUBSPACES,
+    QUANT_PQ_TRAIN_SIZE,
+    QUANT_PQ_ITERS,
+    DEBUG_RAW,
+)
+
+
+FORMAT_NAME = "dense-q"
+FORMAT_VERSION = 1
+MODES = ("int8", "pq")
+PQ_CENTROIDS = 256
+_BLOCK_ROWS = 2048  # rows dequantized / encoded per block
+_SCAN_BLOCK_BYTES = 1 << 20  # float32 bytes per int8 scan block (stays in L2 between conversion and GEMM)
+_ASSIGN_ROWS = 8192  # rows per (rows, 256) distance block in k-means
+
+
+def quant_dir(dense_dir: Path, mode: str) -> Path:
+    dense_dir = Path(dense_dir)
+    return dense_dir.parent / f"{dense_dir.name}.{mode}"
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    return index_publish.read_manifest(directory, FORMAT_NAME, FORMAT_VERSION)
+
+
+def pq_subspaces(dim: int, requested: int = QUANT_PQ_SUBSPACES) -> int:
+    """Largest divisor of ``dim`` that is <= ``requested`` (PQ needs equal-width subspaces)."""
+    for m in range(max(1, min(int(requested), dim)), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_params(mode: str, dim: int) -> Dict[str, Any]:
+    if mode == "pq":
+        return {"subspaces": pq_subspaces(dim), "train_size": QUANT_PQ_TRAIN_SIZE, "iters": QUANT_PQ_ITERS}
+    return {}
+
+
+def manifest_matches(manifest: Optional[Dict[str, Any]], dense: Optional[Dict[str, Any]], mode: str) -> bool:
+    """True when the quantized index was built from this exact float32 export with the current params."""
+    if not manifest or not dense or manifest.get("mode") != mode:
+        return False
+    for key in ("collection", "doc_count", "dim", "fingerprint"):
+        if manifest.get(key) != dense.get(key):
+            return False
+    return manifest.get("params") == build_params(mode, int(dense["dim"]))
+
+
+def _blocks(n: int, step: int = _BLOCK_ROWS):
+    for start in range(0, n, step):
+        yield start, min(n, start + step)
+
+
+# ---- int8 ---------------------------------------------------------------------------------
+
+def _fit_scalar(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-dimension (offset, scale) mapping [min, max] onto the int8 range."""
+    lo = np.full(matrix.shape[1], np.inf, dtype=np.float32)
+    hi = np.full(matrix.shape[1], -np.inf, dtype=np.float32)
+    for start, end in _blocks(matrix.shape[0]):
+        block = np.asarray(matrix[start:end])
+        np.minimum(lo, block.min(axis=0), out=lo)
+        np.maximum(hi, block.max(axis=0), out=hi)
+    scale = (hi - lo) / 255.0
+    scale[scale <= 0] = 1.0
+    return (lo + 128.0 * scale).astype(np.float32), scale.astype(np.float32)
+
+
+def _write_int8(matrix: np.ndarray, tmp: Path, report) -> None:
+    offset, scale = _fit_scalar(matrix)
+    n = matrix.shape[0]
+    codes = np.lib.format.open_memmap(tmp / "codes.npy", mode="w+", dtype=np.int8, shape=matrix.shape)
+    recon_sq = np.empty(n, dtype=np.float32)
+    for start, end in _blocks(n):
+        q = np.clip(np.rint((np.asarray(matrix[start:end]) - offset) / scale), -128, 127)
+        codes[start:end] = q.astype(np.int8)
+        recon = offset + q.astype(np.float32) * scale
+        recon_sq[start:end] = np.einsum("ij,ij->i", recon, recon)
+        report(f"[Quant] int8 encoded {end:,}/{n:,}")
+    codes.flush()
+    del codes
+    np.save(tmp / "offset.npy", offset)
+    np.save(tmp / "scale.npy", scale)
+    np.save(tmp / "recon_sq_norms.npy", recon_sq)
+
+
+# ---- product quantization -----------------------------------------------------------------
+
+def _assign(sub: np.ndarray, centroids: np.ndarray, cent_sq: np.ndarray) -> np.ndarray:
+    """(M, B, dsub) sub-vectors -> (M, B) nearest centroid per subspace."""
+    out = np.empty(sub.shape[:2], dtype=np.uint8)
+    for j in range(sub.shape[0]):
+        for start, end in _blocks(sub.shape[1], _ASSIGN_ROWS):
+            dist = sub[j, start:end] @ centroids[j].T
+            dist *= -2.0
+            dist += cent_sq[j]
+            out[j, start:end] = np.argmin(dist, axis=1)
+    return out
+
+
+def _train_pq(sample: np.ndarray, m: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd k-means per subspace on a (S, D) sample -> (M, 256, D / M) codebooks."""
+    s, dim = sample.shape
+    dsub = dim // m
+    sub = np.ascontiguousarray(sample.reshape(s, m, dsub).transpose(1, 0, 2))
+    centroids = sub[:, rng.choice(s, PQ_CENTROIDS, replace=s < PQ_CENTROIDS)].copy()
+    cols = np.arange(dsub)
+    for _ in range(max(1, iters)):
+        assign = _assign(sub, centroids, np.einsum("mkd,mkd->mk", centroids, centroids))
+        for j in range(m):
+            counts = np.bincount(assign[j], minlength=PQ_CENTROIDS)
+            flat = (assign[j].astype(np.int64)[:, None] * dsub + cols).ravel()
+            sums = np.bincount(flat, weights=sub[j].ravel(), minlength=PQ_CENTROIDS * dsub)
+            sums = sums.reshape(PQ_CENTROIDS, dsub)
+            live = counts > 0
+            centroids[j, live] = sums[live] / counts[live, None]
+            # 빈 클러스터는 임의 샘플로 다시 시작
+            if not live.all():
+                centroids[j, ~live] = sub[j, rng.choice(s, int((~live).sum()))]
+    return centroids.astype(np.float32)
+
+
+def _write_pq(matrix: np.ndarray, tmp: Path, params: Dict[str, Any], seed: int, report) -> None:
+    n, dim = matrix.shape
+    m = int(params["subspaces"])
+    dsub = dim // m
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(n, min(n, int(params["train_size"])), replace=False))
+    started = time.perf_counter()
+    centroids = _train_pq(np.asarray(matrix[picks], dtype=np.float32), m, int(params["iters"]), rng)
+    report(f"[Quant] PQ codebooks {m} x {PQ_CENTROIDS} x {dsub} trained in {time.perf_counter() - started:.1f}s")
+
+    cent_sq = np.einsum("mkd,mkd->mk", centroids, centroids)
+    codes = np.lib.format.open_memmap(tmp / "codes.npy", mode="w+", dtype=np.uint8, shape=(m, n))
+    recon_sq = np.empty(n, dtype=np.float32)
+    sub_rows = np.arange(m)[:, None]
+    for start, end in _blocks(n):
+        block = np.asarray(matrix[start:end], dtype=np.float32)
+        sub = np.ascontiguousarray(block.reshape(end - start, m, dsub).transpose(1, 0, 2))
+        assign = _assign(sub, centroids, cent_sq)
+        codes[:, start:end] = assign
+        recon_sq[start:end] = cent_sq[sub_rows, assign].sum(axis=0)
+        report(f"[Quant] PQ encoded {end:,}/{n:,}")
+    codes.flush()
+    del codes
+    np.save(tmp / "centroids.npy", centroids)
+    np.save(tmp / "recon_sq_norms.npy", recon_sq)
+
+
+def build_quantized(dense_dir: Path, mode: str, out_dir: Optional[Path] = None, seed: int = 0, progress=print) -> Path:
+    """Quantize a float32 export into ``out_dir`` (default ``<export>.<mode>``) and publish it."""
+    if mode not in MODES:
+        raise ValueError(f"unknown quantization mode: {mode!r} (expected one of {MODES})")
+    dense_dir = Path(dense_dir)
+    dense = read_dense_manifest(dense_dir)
+    if dense is None:
+        raise FileNotFoundError(f"no dense export at {dense_dir}")
+    out_dir = Path(out_dir) if out_dir is not None else quant_dir(dense_dir, mode)
+    report = progress or (lambda _msg: None)
+    rows = int(dense["doc_count"])
+    matrix = np.load(dense_dir / "embeddings.npy", mmap_mode="r")[:rows]
+    params = build_params(mode, int(dense["dim"]))
+
+    started = time.perf_counter()
+    tmp = index_publish.staging_dir(out_dir)
+    try:
+        if mode == "int8":
+            _write_int8(matrix, tmp, report)
+        else:
+            _write_pq(matrix, tmp, params, seed, report)
+        index_publish.write_manifest(tmp, {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "mode": mode,
+            "params": params,
+            "collection": dense.get("collection"),
+            "doc_count": rows,
+            "dim": dense.get("dim"),
+            "space": dense.get("space"),
+            "fingerprint": dense.get("fingerprint"),
+        })
+        published = index_publish.publish(tmp, out_dir, lambda d: read_manifest(d) is not None)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    report(f"[Quant] {mode} index done in {time.perf_counter() - started:.1f}s -> {published}")
+    return published
+
+
+class QuantizedVectorStore(NumpyVectorStore):
+    """``NumpyVectorStore`` whose top-k scans quantized codes and re-ranks candidates in float32."""
+
+    def __init__(
+        self,
+        dense_dir: Path,
+        quantized_dir: Path,
+        embedding_function,
+        collection=None,
+        fallback=None,
+        rerank: int = QUANT_RERANK_CANDIDATES,
+    ):
+        super().__init__(dense_dir, embedding_function, collection=collection, fallback=fallback)
+        quantized_dir = Path(quantized_dir)
+        manifest = read_manifest(quantized_dir)
+        if manifest is None or not manifest_matches(manifest, self.manifest, manifest.get("mode")):
+            raise FileNotFoundError(f"no up-to-date quantized index at {quantized_dir}")
+        self.mode = manifest["mode"]
+        self.rerank = max(1, int(rerank))
+        self.codes = np.load(quantized_dir / "codes.npy", mmap_mode="r")
+        self.recon_sq_norms = np.load(quantized_dir / "recon_sq_norms.npy")
+        self.recon_norms = np.sqrt(self.recon_sq_norms)
+        if self.mode == "int8":
+            self.offset = np.load(quantized_dir / "offset.npy")
+            self.scale = np.load(quantized_dir / "scale.npy")
+        else:
+            self.centroids = np.load(quantized_dir / "centroids.npy")
+        self._scan_local = threading.local()  # 스레드별 int8 dequantize 버퍼 (검색은 여러 스레드에서 동시 실행)
+
+    def memory_bytes(self) -> int:
+        """Bytes the scan keeps hot per query (codes + side arrays); float32 rows are only read for re-ranking."""
+        extra = [self.recon_sq_norms, self.recon_norms]
+        extra += [self.offset, self.scale] if self.mode == "int8" else [self.centroids]
+        return int(self.codes.nbytes + sum(a.nbytes for a in extra))
+
+    def _scan_buffer(self) -> np.ndarray:
+        buf = getattr(self._scan_local, "buf", None)
+        if buf is None:
+            dim = int(self.codes.shape[1])
+            buf = self._scan_local.buf = np.empty((max(1, _SCAN_BLOCK_BYTES // (4 * dim)), dim), dtype=np.float32)
+        return buf
+
+    def _approx_dots(self, queries: np.ndarray) -> np.ndarray:
+        n = int(self.matrix.shape[0])
+        if self.mode == "int8":
+            # q . (offset + code * scale) = q . offset + (q * scale) . code
+            scaled = queries * self.scale
+            out = np.empty((queries.shape[0], n), dtype=np.float32)
+            buf = self._scan_buffer()
+            for start, end in _blocks(n, buf.shape[0]):
+                block = buf[:end - start]
+                np.copyto(block, self.codes[start:end], casting="unsafe")
+                out[:, start:end] = scaled @ block.T
+            out += (queries @ self.offset)[:, None]
+            return out
+        m, _k, dsub = self.centroids.shape
+        lut = np.einsum("qmd,mkd->qmk", queries.reshape(queries.shape[0], m, dsub), self.centroids)
+        out = np.zeros((queries.shape[0], n), dtype=np.float32)
+        for j in range(m):
+            out += lut[:, j, self.codes[j]]
+        return out
+
+    def _top_k(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        n = int(self.matrix.shape[0])
+        k = min(int(k), n)
+        if k <= 0:
+            return [(np.empty(0, np.int64), np.empty(0, np.float32)) for _ in range(queries.shape[0])]
+        cand = min(n, max(k, self.rerank))
+        out = []
+        step = max(1, _MAX_SCORE_CELLS // max(1, n))
+        for start in range(0, queries.shape[0], step):
+            block = queries[start:start + step]
+            approx = space_distances(self.space, block, self._approx_dots(block), self.recon_sq_norms, self.recon_norms)
+            part = np.argpartition(approx, cand - 1, axis=1)[:, :cand] if cand < n else np.tile(np.arange(n), (block.shape[0], 1))
+            for q, rows in zip(block, part):
+                rows = np.sort(rows)  # 후보 행을 파일 순서대로 읽기
+                dist = self._distances(q[None, :], rows)[0]
+                order = np.lexsort((rows, dist))[:k]
+                out.append((rows[order].astype(np.int64), dist[order]))
+        return out
+
+
+def open_quantized_store(chroma, mode: str, index_root: Path = NUMPY_STORE_DIR, progress=None) -> QuantizedVectorStore:
+    """Open (exporting / quantizing first when missing or stale) the ``mode`` store for a langchain Chroma instance."""
+    if mode not in MODES:
+        raise ValueError(f"unknown quantization mode: {mode!r} (expected one of {MODES})")
+    report = progress or (print if DEBUG_RAW else None)
+    dense_dir = ensure_export(chroma, index_root, progress=report)
+    out_dir = quant_dir(dense_dir, mode)
+
+    def _fresh() -> bool:
+        return manifest_matches(read_manifest(out_dir), read_dense_manifest(dense_dir), mode)
+
+    if not _fresh():
+        with build_lock(out_dir):
+            if not _fresh():
+                build_quantized(dense_dir, mode, out_dir, progress=report)
+
+    return QuantizedVectorStore(
+        dense_dir,
+        out_dir,
+        embedding_function=chroma.embeddings,
+        collection=chroma._collection,
+        fallback=chroma,
+    )
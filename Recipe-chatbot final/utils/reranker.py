@@ -1,21 +1,14 @@
 from __future__ import annotations
 
-from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
+from utils.ce_service import CrossEncoderService, get_ce_service
 
-@lru_cache(maxsize=1)
-def _load_reranker(model_name: str):
-    try:
-        from FlagEmbedding import FlagReranker  # type: ignore
-    except Exception as e:
-        print(f"Cross-encoder reranker not available (FlagEmbedding import failed): {e}")
-        return None
-    try:
-        return FlagReranker(model_name, use_fp16=False)
-    except Exception as e:
-        print(f"Failed to load reranker model {model_name}: {e}")
-        return None
+
+def _load_reranker(model_name: str) -> Optional[CrossEncoderService]:
+    # 검증기(verifier_ce)와 같은 프로세스 공유 CE 서비스 (모델 1회 로드, 요청 간 micro-batching)
+    service = get_ce_service(model_name)
+    return service if service.available() else None
 
 
 def rerank_pairs(query: str, docs: List[str], topn: int, model_name: str) -> List[int]:
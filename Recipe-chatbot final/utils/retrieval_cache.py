@@ -0,0 +1,97 @@
+"""Retrieval Cache - bounded LRU + TTL cache of final retrieve_node payloads
+
+Popular questions and near-identical CRAG re-retrievals repeat the whole
+retrieve path (hybrid search, filters, metadata extraction, domain cap). The
+payload is cached under a key built by the caller from the normalized query
+and every retrieval parameter. Each lookup also passes the current index
+version (collection + BM25 manifest); when it differs from the version the
+entries were stored under, the whole cache is dropped.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config.settings import RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL
+
+
+class RetrievalCache:
+    """Thread-safe LRU with per-entry TTL and version-based invalidation."""
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES, ttl: float = RETRIEVAL_CACHE_TTL):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+        self._invalidations = 0
+
+    def _sync_version(self, version: Hashable) -> None:
+        # caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Dict[str, Any]]:
+        """Copy of the cached payload, or None (miss / expired / index changed)."""
+        with self._lock:
+            self._sync_version(version)
+            item = self._entries.get(key)
+            if item is not None and self.ttl > 0 and time.monotonic() - item[0] > self.ttl:
+                del self._entries[key]
+                self._expired += 1
+                item = None
+            if item is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            payload = item[1]
+        return copy.deepcopy(payload)
+
+    def put(self, key: Hashable, version: Hashable, payload: Dict[str, Any]) -> None:
+        if not self.max_entries:
+            return
+        stored = copy.deepcopy(payload)
+        with self._lock:
+            self._sync_version(version)
+            self._entries[key] = (time.monotonic(), stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else None,
+                "evictions": self._evictions,
+                "expired": self._expired,
+                "invalidations": self._invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_cache() -> RetrievalCache:
+    """Process-wide retrieve_node cache."""
+    return RetrievalCache()
@@ -1,5 +1,7 @@
 """Vectorstore Utility - Cached Chroma Instance (with test-friendly fallback)"""
-from functools import lru_cache
+import threading
+import time
+from pathlib import Path
 from typing import Any
 
 from config.settings import (
@@ -8,8 +10,14 @@ from config.settings import (
     EMBEDDING_MODEL,
     OPENAI_API_KEY,
     USE_FAKE_LLM,
+    VECTOR_BACKEND,
+    NUMPY_STORE_REFRESH_INTERVAL,
+    DEBUG_RAW,
 )
 
+# export 기반 백엔드 (Chroma 변경 시 내보낸 파일을 다시 만들어야 함)
+_EXPORT_BACKENDS = ("numpy", "int8", "pq", "matryoshka")
+
 
 class _FakeCollection:
     def count(self) -> int:
@@ -25,14 +33,15 @@ class _FakeVectorStore:
 
 
 def _real_chroma():
-    from langchain_openai import OpenAIEmbeddings
     from langchain_chroma import Chroma
     from chromadb.config import Settings
+    from utils.embedding_cache import get_cached_embeddings
 
     return Chroma(
         collection_name=COLLECTION_NAME,
         persist_directory=VECTOR_DIR,
-        embedding_function=OpenAIEmbeddings(model=EMBEDDING_MODEL),
+        # Shared with the OOD guard so the same query text is embedded once
+        embedding_function=get_cached_embeddings(EMBEDDING_MODEL),
         client_settings=Settings(
             allow_reset=False,
             anonymized_telemetry=False,
@@ -40,19 +49,123 @@ def _real_chroma():
     )
 
 
-@lru_cache(maxsize=1)
+def _open_backend(chroma):
+    """Serve ``chroma`` through the configured VECTOR_BACKEND (exporting first when stale); Chroma itself on failure."""
+    if VECTOR_BACKEND == "numpy":
+        # Exact search over a memory-mapped export; Chroma stays the source of truth
+        try:
+            from utils.numpy_store import open_numpy_store
+            return open_numpy_store(chroma)
+        except Exception as e:
+            print(f"NumPy vector backend unavailable, using Chroma: {e}")
+    elif VECTOR_BACKEND in ("int8", "pq"):
+        # Quantized scan + float32 re-rank over the same export (less RAM per worker)
+        try:
+            from utils.quantized_store import open_quantized_store
+            return open_quantized_store(chroma, VECTOR_BACKEND)
+        except Exception as e:
+            print(f"Quantized vector backend unavailable, using Chroma: {e}")
+    elif VECTOR_BACKEND == "matryoshka":
+        # Prefix scan in RAM, full-dimension rescoring from the memory-mapped export
+        try:
+            from utils.matryoshka_store import open_matryoshka_store
+            return open_matryoshka_store(chroma)
+        except Exception as e:
+            print(f"Matryoshka vector backend unavailable, using Chroma: {e}")
+    return chroma
+
+
+_lock = threading.Lock()
+_current = None          # 서빙 중인 vectorstore
+_chroma = None           # export 백엔드의 원본 (재검증 시 재사용)
+_opened_stamp = None     # 현재 store를 열 때의 storage_stamp()
+_next_check = 0.0
+_reopen_thread = None
+
+
+def _reopen(stamp: tuple) -> None:
+    """Re-validate the export against the live collection (re-exporting if stale) and swap in a fresh store."""
+    global _current, _opened_stamp
+    try:
+        store = _open_backend(_chroma)
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"Vector backend refresh error: {e}")
+        return
+    with _lock:
+        _current = store
+        _opened_stamp = stamp
+    if DEBUG_RAW:
+        print(f"Vector backend refreshed ({VECTOR_BACKEND})")
+
+
+def _maybe_refresh() -> None:
+    """Chroma 저장소가 바뀌었으면 (add/update/delete) 백그라운드에서 export 재검증 후 교체 (그동안 기존 store로 서빙)"""
+    global _next_check, _reopen_thread
+    with _lock:
+        if time.monotonic() < _next_check:
+            return
+        _next_check = time.monotonic() + NUMPY_STORE_REFRESH_INTERVAL
+        if _reopen_thread is not None and _reopen_thread.is_alive():
+            return
+        stamp = storage_stamp()
+        if stamp == _opened_stamp:
+            return
+        _reopen_thread = threading.Thread(target=_reopen, args=(stamp,), name="dense-refresh", daemon=True)
+        _reopen_thread.start()
+
+
 def get_vectorstore():
     """
     Return a cached vectorstore. In USE_FAKE_LLM mode or when OPENAI_API_KEY is
     missing, return a no-op fake that yields empty results for deterministic tests.
+    VECTOR_BACKEND=numpy serves reads from utils.numpy_store (exact search),
+    int8 / pq from utils.quantized_store (quantized scan + float32 re-rank),
+    matryoshka from utils.matryoshka_store (prefix scan + full-dimension rescoring).
+    For these export backends, Chroma's storage stamp is checked every
+    NUMPY_STORE_REFRESH_INTERVAL seconds; when it changed, the export is
+    re-validated (and re-exported if stale) in a background thread and the new
+    store is swapped in, so a running worker follows ingests without a restart.
     """
+    global _current, _next_check
+    store = _current
+    if store is None:
+        with _lock:
+            if _current is None:
+                _current = _open_vectorstore()
+                _next_check = time.monotonic() + NUMPY_STORE_REFRESH_INTERVAL
+            store = _current
+    if _chroma is not None and NUMPY_STORE_REFRESH_INTERVAL > 0 and time.monotonic() >= _next_check:
+        _maybe_refresh()
+        store = _current
+    return store
+
+
+def _open_vectorstore():
+    global _chroma, _opened_stamp
     if USE_FAKE_LLM or not OPENAI_API_KEY:
         return _FakeVectorStore()
     try:
-        return _real_chroma()
+        chroma = _real_chroma()
     except Exception as e:
         print(f"Falling back to fake vectorstore due to error: {e}")
         return _FakeVectorStore()
+    if VECTOR_BACKEND in _EXPORT_BACKENDS:
+        _chroma = chroma
+        _opened_stamp = storage_stamp()
+    return _open_backend(chroma)
+
+
+def storage_stamp() -> tuple:
+    """(mtime_ns, size) of Chroma's SQLite file and WAL; changes on every add/update/delete, re-embeds included."""
+    stamp = []
+    for name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+        try:
+            st = (Path(VECTOR_DIR) / name).stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
 
 
 def get_collection_count() -> int:
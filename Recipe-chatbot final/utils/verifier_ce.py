@@ -1,34 +1,33 @@
 from __future__ import annotations
 
-from functools import lru_cache
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict, Optional
+import asyncio
 import re
 
+import numpy as np
+
 from config.settings import (
     CE_MODEL,
     CE_SENT_T,
     CE_SUPPORT_P,
     CE_MAX_DOCS,
     CE_SNIPPETS_PER_DOC,
+    CE_PRESELECT,
+    CE_PRESELECT_TOP_M,
+    CE_PRESELECT_NGRAM,
+    STREAM_VERIFY_FLOOR,
+    STREAM_VERIFY_MIN_SENTENCES,
     DEBUG_RAW,
     USE_FAKE_LLM,
 )
+from utils.ce_service import CrossEncoderService, get_ce_service
+from utils.hybrid_retriever import InvertedBM25
 
 
-@lru_cache(maxsize=1)
-def _load_reranker():
-    try:
-        from FlagEmbedding import FlagReranker  # type: ignore
-    except Exception as e:
-        if DEBUG_RAW:
-            print(f"verifier_ce: FlagEmbedding import failed: {e}")
-        return None
-    try:
-        return FlagReranker(CE_MODEL, use_fp16=False)
-    except Exception as e:
-        if DEBUG_RAW:
-            print(f"verifier_ce: load model failed: {e}")
-        return None
+def _load_reranker() -> Optional[CrossEncoderService]:
+    # rerank와 같은 프로세스 공유 CE 서비스 (모델 1회 로드, 요청 간 micro-batching)
+    service = get_ce_service(CE_MODEL)
+    return service if service.available() else None
 
 
 def _normalize_text(text: str) -> str:
@@ -82,6 +81,50 @@ def _extract_snippets(docs: List[str], max_docs: int, per_doc: int) -> List[str]
     return snippets
 
 
+def _doc_sentences(docs: List[str], max_docs: int) -> List[str]:
+    """Every sentence of the first ``max_docs`` docs (same 400-char cut as snippets), de-duplicated."""
+    out: List[str] = []
+    seen = set()
+    for d in (docs or [])[: max_docs]:
+        if not isinstance(d, str):
+            continue
+        for s in _split_sentences(d):
+            s2 = s[:400]
+            if s2 in seen:
+                continue
+            seen.add(s2)
+            out.append(s2)
+    return out
+
+
+def _char_ngrams(text: str, n: int = CE_PRESELECT_NGRAM) -> List[str]:
+    # 어절별 문자 n-gram: 조사/어미가 붙어도 어간 n-gram은 겹침 (형태소 분석 없이 요청마다 가볍게)
+    grams: List[str] = []
+    for word in re.sub(r"[^\w\s]", " ", _normalize_text(text)).split():
+        if len(word) <= n:
+            grams.append(word)
+        else:
+            grams.extend(word[i: i + n] for i in range(len(word) - n + 1))
+    return grams
+
+
+def _preselect_index(passages: List[str]) -> InvertedBM25:
+    index = InvertedBM25.from_corpus([_char_ngrams(p) for p in passages])
+    # 문장 몇 개짜리 코퍼스에선 Okapi idf가 절반 이상 문서에 나온 term마다 0 이하 → Lucene식 idf(항상 양수)로 교체
+    df = np.diff(index.indptr).astype(np.float64)
+    index.idf = np.log1p((index.corpus_size - df + 0.5) / (df + 0.5))
+    return index
+
+
+def _preselect(sents: List[str], passages: List[str], top_m: int) -> List[List[int]]:
+    """Top-``top_m`` passages per sentence by BM25 over character n-grams (tiny per-request index).
+
+    Sentences sharing no n-gram with any passage get no candidates.
+    """
+    index = _preselect_index(passages)
+    return [index.top_k(_char_ngrams(s), top_m)[0].tolist() for s in sents]
+
+
 def _is_neutral_sentence(sent: str) -> bool:
     """Filter only generic disclaimers, not substantive recipe content."""
     if not sent:
@@ -96,6 +139,49 @@ def _is_neutral_sentence(sent: str) -> bool:
     ]
     return any(cue in t for cue in neutral_cues)
 
+def _sentence_max_scores(
+    reranker,
+    sents: List[str],
+    snippets: List[str],
+    candidates: Optional[List[List[int]]] = None,
+) -> List[float]:
+    """Best snippet score per sentence, all pairs in one batched compute_score call.
+
+    ``candidates[i]`` restricts sentence i to those snippet indices (0.0 when
+    empty); without it every sentence is paired with every snippet.
+    """
+    queries = [_normalize_text(s) for s in sents]
+    passages = [_normalize_text(sn) for sn in snippets]
+    if candidates is None:
+        candidates = [list(range(len(passages)))] * len(queries)
+    rows = [i for i, cand in enumerate(candidates) for _ in cand]
+    pairs = [[queries[i], passages[j]] for i, cand in enumerate(candidates) for j in cand]
+    if not pairs:
+        return [0.0] * len(queries)
+    try:
+        scores = np.asarray(reranker.compute_score(pairs, normalize=True), dtype=np.float64).reshape(-1)
+        best = np.zeros(len(queries), dtype=np.float64)
+        np.maximum.at(best, rows, scores)
+        return best.tolist()
+    except Exception as e:
+        if DEBUG_RAW:
+            print(f"verifier_ce: batched score error, scoring per sentence: {e}")
+    # 배치 실패 시 문장별로 채점 (실패한 문장만 0점)
+    out: List[float] = []
+    for q, cand in zip(queries, candidates):
+        if not cand:
+            out.append(0.0)
+            continue
+        try:
+            scores = reranker.compute_score([[q, passages[j]] for j in cand], normalize=True)
+            out.append(float(np.max(scores)))
+        except Exception as e:
+            if DEBUG_RAW:
+                print(f"verifier_ce: score error: {e}")
+            out.append(0.0)
+    return out
+
+
 def verify_answer_with_ce(answer: str, docs: List[str]) -> Dict:
     """
     Cross-encoder ê¸°ë°˜ ë¬¸ìž¥-ìŠ¤ë‹ˆíŽ« ë§¤ì¹­ìœ¼ë¡œ grounded ì—¬ë¶€ë¥¼ íŒë‹¨.
@@ -159,19 +245,17 @@ def verify_answer_with_ce(answer: str, docs: List[str]) -> Dict:
             "total": len(target_sents)
         }
 
+    # 사전 선별: 문서 전체 문장 중 어휘가 겹치는 상위 m개만 CE로 채점
+    legacy_pairs = len(target_sents) * len(snippets)
+    if CE_PRESELECT:
+        passages = _doc_sentences(docs, CE_MAX_DOCS)
+        candidates = _preselect(target_sents, passages, CE_PRESELECT_TOP_M)
+        ce_pairs = sum(len(c) for c in candidates)
+    else:
+        passages, candidates, ce_pairs = snippets, None, legacy_pairs
+
     # Compute sentence max scores
-    max_scores: List[float] = []
-    for sent in target_sents:
-        q = _normalize_text(sent)
-        pairs = [[q, _normalize_text(sn)] for sn in snippets]
-        try:
-            scores = reranker.compute_score(pairs, normalize=True)
-            m = max(scores) if scores else 0.0
-        except Exception as e:
-            if DEBUG_RAW:
-                print(f"verifier_ce: score error: {e}")
-            m = 0.0
-        max_scores.append(float(m))
+    max_scores = _sentence_max_scores(reranker, target_sents, passages, candidates)
 
     # Aggregate
     supported = sum(1 for s in max_scores if s >= CE_SENT_T)
@@ -211,4 +295,132 @@ def verify_answer_with_ce(answer: str, docs: List[str]) -> Dict:
         "median": median,
         "supported": supported,
         "total": denom,
-    }
\ No newline at end of file
+        "ce_pairs": ce_pairs,
+        "ce_pairs_saved": legacy_pairs - ce_pairs,  # 스니펫 전수 채점 대비
+    }
+
+
+# 문장 끝: 종결 부호 + 공백, 또는 줄바꿈
+_SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+
+
+class StreamingGroundingCheck:
+    """Scores each completed answer sentence while tokens stream in; calls ``on_abort`` on a failing pass.
+
+    Every completed, non-neutral sentence is scored against its pre-selected
+    doc sentences on the shared CE service, without blocking the stream.
+    Once ``min_sentences`` sentences are scored and the running support rate
+    (best score >= ``CE_SENT_T``) is below ``floor``, ``on_abort`` is called once.
+    """
+
+    def __init__(
+        self,
+        reranker: CrossEncoderService,
+        passages: List[str],
+        on_abort: Callable[[], None],
+        floor: float = STREAM_VERIFY_FLOOR,
+        min_sentences: int = STREAM_VERIFY_MIN_SENTENCES,
+        top_m: int = CE_PRESELECT_TOP_M,
+    ):
+        self.reranker = reranker
+        self.passages = passages
+        self.normalized = [_normalize_text(p) for p in passages]
+        self.index = _preselect_index(passages)
+        self.on_abort = on_abort
+        self.floor = floor
+        self.min_sentences = max(1, int(min_sentences))
+        self.top_m = top_m
+        self.scores: List[float] = []
+        self.ce_pairs = 0
+        self.aborted = False
+        self.closed = False
+        self._buffer = ""
+        self._seen = set()
+        self._tasks: set = set()
+
+    def feed(self, piece: str) -> None:
+        """Add a streamed token piece; completed sentences are queued for scoring."""
+        if self.closed:
+            return
+        self._buffer += piece
+        ends = [m.end() for m in _SENTENCE_END.finditer(self._buffer)]
+        if not ends:
+            return
+        done, self._buffer = self._buffer[: ends[-1]], self._buffer[ends[-1]:]
+        for sent in _split_sentences(done):
+            key = sent[:80]
+            if key in self._seen or _is_neutral_sentence(sent):
+                continue
+            self._seen.add(key)
+            task = asyncio.get_running_loop().create_task(self._score(sent))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, sent: str) -> None:
+        cand = self.index.top_k(_char_ngrams(sent), self.top_m)[0].tolist()
+        best = 0.0
+        if cand:
+            q = _normalize_text(sent)
+            try:
+                scores = await self.reranker.acompute_score([[q, self.normalized[j]] for j in cand], normalize=True)
+            except Exception as e:
+                if DEBUG_RAW:
+                    print(f"verifier_ce: streaming score error: {e}")
+                return
+            if self.closed:
+                return
+            self.ce_pairs += len(cand)
+            best = float(np.max(scores))
+        self.scores.append(best)
+        if len(self.scores) < self.min_sentences:
+            return
+        if self.support_rate < self.floor:
+            self.aborted = True
+            self.close()
+            self.on_abort()
+
+    @property
+    def support_rate(self) -> float:
+        if not self.scores:
+            return 0.0
+        return sum(1 for s in self.scores if s >= CE_SENT_T) / len(self.scores)
+
+    def close(self) -> List[asyncio.Task]:
+        """Stop scoring (generation finished or was aborted); cancels and returns the pending score tasks."""
+        self.closed = True
+        pending = [t for t in self._tasks if not t.done() and t is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        return pending
+
+    async def aclose(self) -> None:
+        """close() and wait until the cancelled score tasks have finished."""
+        pending = self.close()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def metrics(self) -> Dict:
+        """Verifier-shaped metrics of the sentences scored so far (the verdict of an aborted pass)."""
+        supported = sum(1 for s in self.scores if s >= CE_SENT_T)
+        return {
+            "branch": "notGrounded",
+            "confidence_level": "none",
+            "support_rate": self.support_rate,
+            "supported": supported,
+            "total": len(self.scores),
+            "ce_pairs": self.ce_pairs,
+            "streaming_abort": True,
+        }
+
+
+def start_stream_check(docs: List[str], on_abort: Callable[[], None]) -> Optional[StreamingGroundingCheck]:
+    """Streaming check over ``docs`` (None in fake mode or without the cross-encoder). Loads the model: call off the loop."""
+    if USE_FAKE_LLM:
+        return None
+    passages = _doc_sentences(docs or [], CE_MAX_DOCS)
+    if not passages:
+        return None
+    reranker = _load_reranker()
+    if reranker is None:
+        return None
+    return StreamingGroundingCheck(reranker, passages, on_abort)
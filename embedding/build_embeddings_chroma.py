@@ -22,6 +22,8 @@ Key features
 - Batch-wise ingestion to control memory
 - Deterministic IDs (by URL or sha1(text))
 - Persists a Chroma collection to disk (--persist_dir)
+- Optionally records ingested chunk IDs (--bm25_ids_out) so the chatbot's BM25
+  index can re-tokenize re-upserted chunks as a small delta segment
 
 Usage
 ------
@@ -215,6 +217,7 @@ def main():
     ap.add_argument("--chunk_size", type=int, default=1500, help="Character-based chunk size (0 disables chunking)")
     ap.add_argument("--chunk_overlap", type=int, default=200, help="Character overlap between chunks")
     ap.add_argument("--embed_chunk_texts", type=int, default=64, help="Max number of texts per embeddings API request (mitigate 300k tokens/request limit)")
+    ap.add_argument("--bm25_ids_out", default="", help="Append ingested chunk IDs here (one per line) for an incremental BM25 update")
     args = ap.parse_args()
 
     os.makedirs(args.persist_dir, exist_ok=True)
@@ -269,6 +272,9 @@ def main():
 
         vectordb.add_documents(documents=docs_batch, ids=ids)
         total_docs += len(docs_batch)
+        if args.bm25_ids_out:
+            with open(args.bm25_ids_out, "a", encoding="utf-8") as fh:
+                fh.write("".join(f"{i}\n" for i in ids))
         print(f"[Ingest] +{len(docs_batch):,} (cum {total_docs:,}) -> persist...")
         
 
@@ -280,6 +286,10 @@ def main():
             print(f"[Ingest] +{len(docs_batch):,} (cum {total_docs:,}) -> auto-saved...")
 
     print(f"[Done] Total chunks ingested: {total_docs:,}. DB at: {args.persist_dir}")
+    if args.bm25_ids_out:
+        # New IDs are picked up automatically; the IDs file also covers re-upserts of existing IDs
+        print(f"[BM25] update the chatbot index with: python -m utils.bm25_build --collection {args.collection} "
+              f"--persist_dir {args.persist_dir} --ids-file {os.path.abspath(args.bm25_ids_out)}")
 
 if __name__ == "__main__":
     main()